@@ -1,6 +1,17 @@
-from alembic_dddl.src.models import DDL
+from alembic_dddl.src.models import DDL, DataScript
 
 from .dddl import register_ddl
+from .src.execution import execution_hooks
+from .src.file_format import register_file_format
 from .src.ops import Script
+from .src.tenants import register_tenants
 
-__all__ = ("DDL", "register_ddl", "Script")
+__all__ = (
+    "DDL",
+    "DataScript",
+    "register_ddl",
+    "Script",
+    "execution_hooks",
+    "register_file_format",
+    "register_tenants",
+)
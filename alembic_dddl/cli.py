@@ -0,0 +1,189 @@
+import argparse
+import logging
+import os
+import sys
+from typing import List, Optional
+
+from alembic.config import Config
+
+from alembic_dddl import commands
+from alembic_dddl.src.storage import LAYOUTS, ReadOnlyStorageError
+
+
+def _squash(config: Config, args: argparse.Namespace) -> None:
+    baseline = commands.squash(config, revision=args.revision)
+    print(  # noqa: T201
+        f"Squashed DDL history up to {baseline.revision}: {len(baseline.scripts)} DDLs, "
+        f"{len(baseline.replaced)} replaced and {len(baseline.superseded)} superseded scripts"
+    )
+
+
+def _gc(config: Config, args: argparse.Namespace) -> int:
+    try:
+        report = commands.gc(config, remove=args.remove)
+    except ReadOnlyStorageError as e:
+        print(f"error: {e}", file=sys.stderr)  # noqa: T201
+        return 1
+    for script_name in report.orphans:
+        print(script_name)  # noqa: T201
+    action = "Removed" if report.removed else "Found"
+    print(  # noqa: T201
+        f"{action} {len(report.orphans)} orphaned of {report.total_scripts} scripts, "
+        f"{report.orphaned_bytes} bytes, ~{report.orphaned_scan_time * 1000:.1f}ms of "
+        f"{report.scan_time * 1000:.1f}ms scan time"
+    )
+    return 0
+
+
+def _check(config: Config, args: argparse.Namespace) -> int:
+    report = commands.check(args.configs or [args.config], max_workers=args.workers)
+    for result in report.results:
+        if result.error is not None:
+            print(f"{result.config_path}: error: {result.error}")  # noqa: T201
+        elif result.has_drift:
+            print(f"{result.config_path}:")  # noqa: T201
+            for name in result.new:
+                print(f"  new DDL: {name}")  # noqa: T201
+            for name in result.changed:
+                print(f"  changed DDL: {name}")  # noqa: T201
+        else:
+            print(f"{result.config_path}: no changes")  # noqa: T201
+    return 1 if report.has_drift or report.has_errors else 0
+
+
+def _build_index(config: Config, args: argparse.Namespace) -> None:
+    count = commands.build_index(config)
+    print(f"Indexed {count} revisioned scripts")  # noqa: T201
+
+
+def _reshard(config: Config, args: argparse.Namespace) -> None:
+    moved = commands.reshard(config, layout=args.layout)
+    print(f"Moved {moved} revisioned scripts")  # noqa: T201
+
+
+def _state(config: Config, args: argparse.Namespace) -> None:
+    for name, script_name in commands.state_at(config, args.revision).items():
+        print(f"{name}: {script_name}")  # noqa: T201
+
+
+def _diff(config: Config, args: argparse.Namespace) -> None:
+    changes = commands.diff(config, args.rev_a, args.rev_b)
+    for change in changes:
+        print(  # noqa: T201
+            f"{change.status:<8} {change.name}: {change.before or '-'} -> {change.after or '-'}"
+        )
+    print(f"{len(changes)} DDLs differ between {args.rev_a} and {args.rev_b}")  # noqa: T201
+
+
+def _plan(config: Config, args: argparse.Namespace) -> None:
+    upgrade_plan = commands.plan(config, args.rev_a, args.rev_b)
+    print(  # noqa: T201
+        f"{len(upgrade_plan.scripts)} scripts between {args.rev_a} and {args.rev_b}, "
+        f"estimated {upgrade_plan.total:.3f}s"
+    )
+    slowest = upgrade_plan.slowest(args.top)
+    if slowest:
+        print("Slowest scripts:")  # noqa: T201
+    for estimate in slowest:
+        print(  # noqa: T201
+            f"  {estimate.duration:10.3f}s  {estimate.script_name} ({estimate.samples} runs)"
+        )
+    if upgrade_plan.missing:
+        print("No timing data:")  # noqa: T201
+    for script_name in upgrade_plan.missing:
+        print(f"  {script_name}")  # noqa: T201
+
+
+def _export(config: Config, args: argparse.Namespace) -> None:
+    report = commands.export(config, args.output, args.rev_a, args.rev_b)
+    print(  # noqa: T201
+        f"Exported {len(report.scripts)} scripts to {report.path} ({report.size} bytes), "
+        f"skipped {len(report.skipped)} superseded scripts"
+    )
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="alembic-dddl", description="Maintenance commands for Alembic DDDL"
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        default=os.environ.get("ALEMBIC_CONFIG", "alembic.ini"),
+        help='alternate config file, default "alembic.ini"',
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    squash = subparsers.add_parser(
+        "squash", help="squash the DDL history up to a revision into a baseline"
+    )
+    squash.add_argument("revision", help="the last revision of the baseline")
+    squash.set_defaults(func=_squash)
+
+    gc = subparsers.add_parser(
+        "gc", help="find revisioned scripts of revisions, which don't exist anymore"
+    )
+    gc.add_argument("--remove", action="store_true", help="remove the orphaned scripts")
+    gc.set_defaults(func=_gc)
+
+    check = subparsers.add_parser(
+        "check", help="check several alembic projects for DDL changes in one process"
+    )
+    check.add_argument("configs", nargs="*", help="config files, default is the -c option")
+    check.add_argument("-w", "--workers", type=int, default=4, help="number of worker threads")
+    check.set_defaults(func=_check)
+
+    build_index = subparsers.add_parser(
+        "build-index", help="index the revisioned scripts before shipping them in a package"
+    )
+    build_index.set_defaults(func=_build_index)
+
+    reshard = subparsers.add_parser(
+        "reshard", help="move the revisioned scripts into the subdirectories of a layout"
+    )
+    reshard.add_argument(
+        "layout",
+        nargs="?",
+        choices=LAYOUTS,
+        help="the target layout, default is the layout option",
+    )
+    reshard.set_defaults(func=_reshard)
+
+    state = subparsers.add_parser("state", help="show the script of each DDL at a revision")
+    state.add_argument("revision", nargs="?", default="heads", help='revision, default "heads"')
+    state.set_defaults(func=_state)
+
+    diff = subparsers.add_parser("diff", help="show the DDLs which differ between two revisions")
+    diff.add_argument("rev_a", help='the revision to compare, e.g. the production one or "base"')
+    diff.add_argument("rev_b", nargs="?", default="heads", help='revision, default "heads"')
+    diff.set_defaults(func=_diff)
+
+    plan = subparsers.add_parser(
+        "plan", help="estimate the DDL execution time of an upgrade from the timing history"
+    )
+    plan.add_argument("rev_a", help='the current revision of the database, or "base"')
+    plan.add_argument("rev_b", nargs="?", default="heads", help='revision, default "heads"')
+    plan.add_argument("--top", type=int, default=5, help="number of the slowest scripts to show")
+    plan.set_defaults(func=_plan)
+
+    export = subparsers.add_parser(
+        "export", help="compile an upgrade into a single SQL file, without superseded DDLs"
+    )
+    export.add_argument("output", help="path of the SQL file")
+    export.add_argument("--from", dest="rev_a", default="base", help='revision, default "base"')
+    export.add_argument("--to", dest="rev_b", default="heads", help='revision, default "heads"')
+    export.set_defaults(func=_export)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = get_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-5.5s [%(name)s] %(message)s")
+    config = Config(args.config)
+    exit_code = args.func(config, args)
+    if exit_code:
+        sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+import logging
+import os
+import statistics
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+from alembic_dddl.src.baseline import Baseline, get_baseline, get_baseline_path
+from alembic_dddl.src.batch import CheckReport, check_configs
+from alembic_dddl.src.comparator import DDLVersions
+from alembic_dddl.src.config import load_config
+from alembic_dddl.src.history import DDLChange, load_history
+from alembic_dddl.src.ops import COALESCED_SCRIPTS_ATTRIBUTE
+from alembic_dddl.src.prefetch import find_executed_scripts
+from alembic_dddl.src.revision_cache import RevisionCache
+from alembic_dddl.src.storage import (
+    DirectoryStorage,
+    get_storage,
+    reshard_directory,
+    write_index,
+)
+from alembic_dddl.src.timings import load_durations
+
+logger = logging.getLogger(__name__)
+
+
+def _get_revisions_down_from(config: Config, revision: str) -> List[str]:
+    """Get the revision and all its ancestors, ordered from the revision to base."""
+    script_directory = ScriptDirectory.from_config(config)
+    return [s.revision for s in script_directory.iterate_revisions(revision, "base")]
+
+
+def squash(config: Config, revision: str) -> Baseline:
+    """
+    Squash the DDL history up to the `revision` into a baseline. On upgrade, the first revisioned
+    script of each DDL is replaced with its final script at this revision, and the scripts in
+    between are skipped. So the DDL is still created at its original revision, before the
+    migrations which may use it. The scripts of later revisions are not affected.
+
+    The baseline manifest is saved next to the scripts location (see the `baseline_manifest`
+    option) and returned.
+    """
+
+    dddl_config = load_config(config)
+    storage = get_storage(dddl_config)
+    rev_order = _get_revisions_down_from(config, revision)
+    versions = DDLVersions(ddl_dir=dddl_config.scripts_location, storage=storage)
+    final = versions.get_latest_ddl_revisions(rev_order)
+    final_scripts = {name: os.path.split(script.filepath)[-1] for name, script in final.items()}
+
+    # the scripts of each DDL, ordered from base to the baseline revision
+    positions = {rev: i for i, rev in enumerate(reversed(rev_order))}
+    by_name: Dict[str, List[Tuple[int, str]]] = {}
+    for filepath, name, script_revision in storage.iter_scripts(revisions=positions):
+        if script_revision in positions:
+            script_name = os.path.split(filepath)[-1]
+            by_name.setdefault(name, []).append((positions[script_revision], script_name))
+
+    replaced: Dict[str, str] = {}
+    superseded: Set[str] = set()
+    for name, scripts in by_name.items():
+        scripts.sort()
+        final_script = final_scripts[name]
+        if scripts[0][1] != final_script:
+            replaced[scripts[0][1]] = final_script
+            superseded.update(s for _, s in scripts[1:] if s != final_script)
+
+    baseline = Baseline(
+        revision=rev_order[0],
+        scripts=final_scripts,
+        superseded=frozenset(superseded),
+        replaced=replaced,
+    )
+    path = get_baseline_path(dddl_config)
+    baseline.save(path)
+    logger.info(
+        f"Squashed the scripts of {len(final_scripts)} DDLs up to revision {baseline.revision}: "
+        f"{len(replaced)} replaced with the final scripts, {len(superseded)} superseded, saved "
+        f"the baseline to {path}"
+    )
+    return baseline
+
+
+@dataclass
+class GCReport:
+    """Result of the garbage collection of revisioned scripts"""
+
+    # names of the scripts, which revisions are not in the revision graph
+    orphans: List[str]
+    total_scripts: int
+    # total size of the orphaned scripts
+    orphaned_bytes: int
+    # time it took to list the scripts in the storage
+    scan_time: float
+    removed: bool
+
+    @property
+    def orphaned_scan_time(self) -> float:
+        """Estimated part of the scan time, spent on the orphaned scripts."""
+        if not self.total_scripts:
+            return 0.0
+        return self.scan_time * len(self.orphans) / self.total_scripts
+
+
+def _get_all_revisions(config: Config) -> Set[str]:
+    """Get all revision ids of the migrations, from the revision cache if it's enabled."""
+    dddl_config = load_config(config)
+    script_directory = ScriptDirectory.from_config(config)
+    if dddl_config.revision_cache:
+        cache = RevisionCache(
+            cache_path=dddl_config.revision_cache, script_directory=script_directory
+        )
+        return {r.revision for r in cache.get_revisions()}
+    return {s.revision for s in script_directory.walk_revisions()}
+
+
+def gc(config: Config, remove: bool = False) -> GCReport:
+    """
+    Find revisioned scripts, which revisions are not present in the revision graph anymore, e.g.
+    after a branch was abandoned or revisions were deleted. If `remove` is True, the orphaned
+    scripts are removed from the storage.
+
+    Raises:
+        ReadOnlyStorageError: if `remove` is True and the storage is read-only, e.g. the package
+            storage. Nothing is removed in this case.
+    """
+
+    dddl_config = load_config(config)
+    storage = get_storage(dddl_config)
+    revisions = _get_all_revisions(config)
+
+    start = perf_counter()
+    scripts = list(storage.iter_scripts())
+    scan_time = perf_counter() - start
+
+    orphans = sorted(
+        os.path.split(filepath)[-1]
+        for filepath, _, revision in scripts
+        if revision not in revisions
+    )
+    orphaned_bytes = sum(storage.get_size(script_name) for script_name in orphans)
+    if remove:
+        for script_name in orphans:
+            storage.delete(script_name)
+            logger.info(f"Removed orphaned script {script_name}")
+
+    return GCReport(
+        orphans=orphans,
+        total_scripts=len(scripts),
+        orphaned_bytes=orphaned_bytes,
+        scan_time=scan_time,
+        removed=remove,
+    )
+
+
+def check(config_paths: Sequence[str], max_workers: int = 4) -> CheckReport:
+    """
+    Check the DDL drift of several alembic projects in one process: for each config, find the
+    registered DDLs which are new or changed since their latest revisioned scripts. DDLs should be
+    registered in env.py, which is run in the offline mode without running migrations.
+    """
+
+    return check_configs(config_paths, max_workers=max_workers)
+
+
+def build_index(config: Config) -> int:
+    """
+    Save the index of the revisioned scripts into the scripts location, before shipping them in
+    a package or a zip archive for the package storage. Return the number of indexed scripts.
+    """
+
+    dddl_config = load_config(config)
+    return write_index(DirectoryStorage(dddl_config.scripts_location, layout=dddl_config.layout))
+
+
+def reshard(config: Config, layout: Optional[str] = None) -> int:
+    """
+    Move the revisioned scripts in the scripts location into the subdirectories of the `layout`,
+    by default the one set up in the `layout` option. Scripts are found in any layout, e.g. a flat
+    directory is converted after the option was changed. Return the number of moved scripts.
+    """
+
+    dddl_config = load_config(config)
+    if dddl_config.storage != "directory":
+        raise ValueError(f"Only the directory storage has layouts, not {dddl_config.storage!r}")
+    layout = layout or dddl_config.layout
+    moved = reshard_directory(dddl_config.scripts_location, layout)
+    logger.info(f"Moved {moved} scripts in {dddl_config.scripts_location} to the {layout} layout")
+    return moved
+
+
+def state_at(config: Config, revision: Optional[str] = "heads") -> Dict[str, str]:
+    """
+    Get the revisioned script, which defines each DDL at the revision: a dictionary of script
+    names by DDL name. The revision may be "heads", a revision id or its unique prefix.
+    """
+
+    return load_history(config).state_at(revision)
+
+
+def diff(config: Config, rev_a: Optional[str], rev_b: Optional[str] = "heads") -> List[DDLChange]:
+    """
+    Get the DDLs, which scripts differ between the two revisions, e.g. the DDLs which will be
+    re-executed when the database is upgraded from `rev_a` to `rev_b`.
+    """
+
+    return load_history(config).diff(rev_a, rev_b)
+
+
+@dataclass
+class ScriptEstimate:
+    """Expected execution time of a revisioned script"""
+
+    script_name: str
+    # median of the recorded durations in seconds, None if the script was never timed
+    duration: Optional[float]
+    samples: int
+
+
+@dataclass
+class UpgradePlan:
+    """Estimated DDL execution time of an upgrade"""
+
+    rev_a: Optional[str]
+    rev_b: Optional[str]
+    # the scripts in the order of execution
+    scripts: List[ScriptEstimate]
+
+    @property
+    def total(self) -> float:
+        """Total expected time of the scripts with timing data."""
+        return sum(s.duration for s in self.scripts if s.duration is not None)
+
+    @property
+    def missing(self) -> List[str]:
+        """Names of the scripts without timing data."""
+        return [s.script_name for s in self.scripts if s.duration is None]
+
+    def slowest(self, count: int = 5) -> List[ScriptEstimate]:
+        timed = [s for s in self.scripts if s.duration is not None]
+        return sorted(timed, key=lambda s: s.duration or 0.0, reverse=True)[:count]
+
+
+def _get_baseline_replacements(config: Config) -> Dict[str, Optional[str]]:
+    """
+    Get the scripts replaced in the baseline: the first scripts of the DDLs are mapped to their
+    final scripts, the superseded scripts to None.
+    """
+
+    baseline = get_baseline(load_config(config))
+    if baseline is None:
+        return {}
+    replacements: Dict[str, Optional[str]] = dict(baseline.replaced)
+    replacements.update((script_name, None) for script_name in baseline.superseded)
+    return replacements
+
+
+def _replace_scripts(
+    script_names: Iterable[str], replacements: Dict[str, Optional[str]]
+) -> Tuple[List[str], List[str]]:
+    """
+    Resolve the scripts run by an upgrade like `run_ddl_script` does: the replaced scripts are
+    run as their replacements (None if they are skipped), and the next run of a replacement is
+    skipped. Returns the executed and the replaced scripts, in the order of the upgrade.
+    """
+
+    executed = []
+    replaced = []
+    applied = set()
+    for script_name in script_names:
+        if script_name in applied:
+            applied.discard(script_name)
+        elif script_name in replacements:
+            replaced.append(script_name)
+            replacement = replacements[script_name]
+            if replacement is not None:
+                executed.append(replacement)
+                applied.add(replacement)
+        else:
+            executed.append(script_name)
+    return executed, replaced
+
+
+def plan(config: Config, rev_a: Optional[str], rev_b: Optional[str] = "heads") -> UpgradePlan:
+    """
+    Estimate how long the revisioned scripts will take when the database is upgraded from `rev_a`
+    to `rev_b`, using the durations recorded in the timing history (see the `timing_history`
+    option). Like on upgrade, the scripts replaced in the baseline are counted as their final
+    scripts, and the skipped scripts are not counted.
+
+    The scripts are taken from the calls in the `upgrade` functions of the revisions, so the
+    scripts re-run by rebuilds of dependent DDLs are counted once per run. The durations are
+    recorded per script name, so a script run with a subset of its statements (incremental
+    migrations) is estimated by its past runs.
+    """
+
+    dddl_config = load_config(config)
+    durations = load_durations(dddl_config, config.get_main_option("sqlalchemy.url"))
+
+    script_directory = ScriptDirectory.from_config(config)
+    revisions = script_directory.iterate_revisions(rev_b or "heads", rev_a or "base")
+    script_names = [
+        script_name
+        for revision in reversed(list(revisions))
+        for script_name in find_executed_scripts(revision.path)
+    ]
+
+    scripts = []
+    for script_name in _replace_scripts(script_names, _get_baseline_replacements(config))[0]:
+        samples = durations.get(script_name, [])
+        scripts.append(
+            ScriptEstimate(
+                script_name=script_name,
+                duration=statistics.median(samples) if samples else None,
+                samples=len(samples),
+            )
+        )
+    return UpgradePlan(rev_a=rev_a, rev_b=rev_b, scripts=scripts)
+
+
+@dataclass
+class ExportReport:
+    """Result of the coalesced offline export of an upgrade"""
+
+    path: str
+    # the revisioned scripts in the export, in the order of execution
+    scripts: List[str]
+    # the scripts superseded by a later script of the same DDL in the exported range
+    skipped: List[str]
+    # size of the exported SQL file in bytes
+    size: int
+
+
+def export(
+    config: Config, output: str, rev_a: Optional[str] = "base", rev_b: Optional[str] = "heads"
+) -> ExportReport:
+    """
+    Compile the upgrade from `rev_a` to `rev_b` into a single SQL file in the offline mode, e.g.
+    to hand it over to a DBA. Of the revisioned scripts of each DDL in this range, only the last
+    one is included, in place of the first one, so that the migrations in between can use the
+    DDL. The scripts in between are skipped, like in the squashed DDL history. The statements are
+    written to the `output` file as the migrations are rendered.
+    """
+
+    history = load_history(config)
+    coalesced = history.get_replacements_between(rev_a, rev_b)
+
+    with open(output, "w") as f:
+        export_config = Config(
+            file_=config.config_file_name,
+            ini_section=config.config_ini_section,
+            output_buffer=f,
+            cmd_opts=config.cmd_opts,
+        )
+        export_config.attributes.update(config.attributes)
+        export_config.attributes[COALESCED_SCRIPTS_ATTRIBUTE] = coalesced
+        target = rev_b or "heads"
+        if rev_a not in ("base", None):
+            target = f"{rev_a}:{target}"
+        command.upgrade(export_config, target, sql=True)
+
+    # the baseline takes precedence over the exported range, like on upgrade
+    replacements = {**coalesced, **_get_baseline_replacements(config)}
+    scripts, skipped = _replace_scripts(history.get_scripts_between(rev_a, rev_b), replacements)
+    report = ExportReport(
+        path=output, scripts=scripts, skipped=skipped, size=os.path.getsize(output)
+    )
+    logger.info(
+        f"Exported {len(report.scripts)} scripts to {output}, skipped {len(report.skipped)} "
+        f"superseded scripts"
+    )
+    return report
@@ -1,61 +1,170 @@
 import collections.abc
 import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
-from typing import List, Sequence, Union
+from typing import Dict, Iterator, List, Optional, Sequence, Union
 
 from alembic.autogenerate import comparators
 from alembic.autogenerate.api import AutogenContext
+from alembic.config import Config
+from alembic.operations.ops import DropTableOp
+from alembic.runtime.migration import MigrationContext
 
-from alembic_dddl.src.comparator import CustomDDLComparator
 from alembic_dddl.src.config import load_config
+from alembic_dddl.src.graph import DDLGraph
 from alembic_dddl.src.models import DDL, RevisionedScript
-from alembic_dddl.src.ops import SyncDDLOp
+from alembic_dddl.src.ops import GraphOp, RebuildDDLOp, SyncDDLGraphOp, SyncDDLOp
 
 logger = logging.getLogger(__name__)
 
 
 class DDLRegistry:
-    """The registry keeps track of all DDL scripts"""
+    """The registry keeps track of all DDL scripts, it may be used from several threads"""
 
     def __init__(self) -> None:
         self.ddls: List[DDL] = []
+        self._lock = threading.Lock()
 
     def register(self, dddl: Union[DDL, Sequence[DDL]]) -> None:
         """Add one or more DDLs to the registry."""
-        if isinstance(dddl, collections.abc.Sequence):
-            self.ddls.extend(dddl)
-        else:
-            self.ddls.append(dddl)
+        with self._lock:
+            if isinstance(dddl, collections.abc.Sequence):
+                self.ddls.extend(dddl)
+            else:
+                self.ddls.append(dddl)
+
+    def get_graph(self) -> DDLGraph:
+        """Build the dependency graph of the registered DDLs, raises DDLGraphError if invalid."""
+        with self._lock:
+            ddls = list(self.ddls)
+        return DDLGraph(ddls)
 
 
 ddl_registry = DDLRegistry()
 
+# alembic config attribute with the registry scoped to this config
+REGISTRY_ATTRIBUTE = "alembic_dddl_registry"
+
+# registry of the current context, see `use_registry`
+_current_registry: ContextVar[Optional[DDLRegistry]] = ContextVar(
+    "alembic_dddl_registry", default=None
+)
+_attributes_lock = threading.Lock()
+
+Scope = Union[Config, MigrationContext, None]
+
+
+def get_registry(scope: Scope = None, create: bool = False) -> DDLRegistry:
+    """
+    Get the registry for the alembic config or migration context: the one scoped to the config
+    (see `register_ddl`), the registry of the current context (see `use_registry`), or the
+    global registry, in this order. If `create` is True, a registry scoped to the config is
+    created if it doesn't exist.
+
+    Raises:
+        ValueError: if `create` is True and the scope is a migration context without a config,
+            e.g. one created by `MigrationContext.configure` outside of env.py. There is nothing
+            to scope the registry to.
+    """
+
+    config = scope.config if isinstance(scope, MigrationContext) else scope
+    if create and config is None and scope is not None:
+        raise ValueError(
+            "Can't scope DDLs to a migration context without an alembic config, pass the config "
+            "instead"
+        )
+    if config is not None:
+        if create:
+            with _attributes_lock:
+                return config.attributes.setdefault(REGISTRY_ATTRIBUTE, DDLRegistry())
+        registry = config.attributes.get(REGISTRY_ATTRIBUTE)
+        if isinstance(registry, DDLRegistry):
+            return registry
+    return _current_registry.get() or ddl_registry
+
+
+@contextmanager
+def use_registry(registry: Optional[DDLRegistry] = None) -> Iterator[DDLRegistry]:
+    """
+    Make DDLs registered without a scope go into a separate registry (a new one by default)
+    within the current thread or asyncio task, instead of the global registry.
+    """
+
+    registry = registry or DDLRegistry()
+    token = _current_registry.set(registry)
+    try:
+        yield registry
+    finally:
+        _current_registry.reset(token)
+
+
+def register_ddl(dddl: Union[DDL, Sequence[DDL]], scope: Scope = None) -> None:
+    """
+    Register one or more DDLs. If the alembic config or migration context is passed as `scope`
+    (e.g. `context.config` in env.py), the DDLs are registered only for this config. Otherwise
+    they go to the registry of the current context, or to the global registry.
+    """
 
-def register_ddl(dddl: Union[DDL, Sequence[DDL]]) -> None:
-    """Register one or more DDLs in the global registry object."""
-    ddl_registry.register(dddl)
+    get_registry(scope, create=scope is not None).register(dddl)
 
 
 @comparators.dispatch_for("schema")
 def compare_custom_ddl(autogen_context: AutogenContext, upgrade_ops, _) -> None:
     """
     Autogenerate comparator, detects changes in registered DDL scripts and initiates sync
-    operations for the changed ones.
+    operations for the changed ones. If DDLs have dependencies, the operations are ordered
+    topologically and the unchanged dependents of the changed DDLs are rebuilt.
     """
 
-    config = load_config(autogen_context.opts["template_args"]["config"])
+    # the comparator is imported here to keep env.py imports light for non-autogenerate commands
+    from alembic_dddl.src.comparator import CustomDDLComparator
+    from alembic_dddl.src.scope import DDLScope
+    from alembic_dddl.src.storage import get_storage
+    from alembic_dddl.src.timings import TABLE
+
+    alembic_config = autogen_context.opts["template_args"]["config"]
+    config = load_config(alembic_config)
+
+    # the ledger and timing history tables are not a part of the metadata, but they shouldn't be
+    # dropped
+    own_tables = set()
+    if config.use_ledger:
+        own_tables.add(config.ledger_table)
+    if config.timing_history == TABLE:
+        own_tables.add(config.timing_history_table)
+    if own_tables:
+        upgrade_ops.ops[:] = [
+            o
+            for o in upgrade_ops.ops
+            if not (isinstance(o, DropTableOp) and o.table_name in own_tables)
+        ]
+
+    registry = get_registry(alembic_config)
+    graph = registry.get_graph()
+    ddls = [graph.ddls[name] for name in graph.order]
+    scope = DDLScope.from_config(alembic_config)
+    if scope.is_limited:
+        ddls = [d for d in ddls if scope.matches(d)]
+        logger.info(f"Comparing {len(ddls)} of {len(graph.ddls)} DDLs in scope")
 
     comparator = CustomDDLComparator(
         ddl_dir=config.scripts_location,
-        ddls=ddl_registry.ddls,
+        ddls=ddls,
         autogen_context=autogen_context,
         ignore_comments=config.ignore_comments,
+        revision_cache=config.revision_cache,
+        storage=get_storage(config),
+        extra_names=graph.get_dependents([d.name for d in ddls]),
+        streaming=config.streaming_comparison,
     )
 
     changed = comparator.get_changed_ddls()
 
     time = datetime.now()
     down_script: Union[RevisionedScript, str]
+    sync_ops: Dict[str, GraphOp] = {}
     for dddl, rev_script in changed:
         if rev_script:
             logger.info(f'Detected change in DDL "{dddl.name}"')
@@ -63,4 +172,21 @@ def compare_custom_ddl(autogen_context: AutogenContext, upgrade_ops, _) -> None:
         else:
             logger.info(f'Detected new DDL "{dddl.name}"')
             down_script = dddl.down_sql
-        upgrade_ops.ops.append(SyncDDLOp(up_script=dddl, down_script=down_script, time=time))
+        sync_ops[dddl.name] = SyncDDLOp(up_script=dddl, down_script=down_script, time=time)
+
+    if not graph.has_dependencies or not sync_ops:
+        upgrade_ops.ops.extend(sync_ops.values())
+        return
+
+    rebuild_ops: Dict[str, GraphOp] = {}
+    for name in graph.get_dependents(sync_ops.keys()):
+        script = comparator.latest_revisions.get(name)
+        if script is None:
+            logger.warning(f'Dependent DDL "{name}" has no revisions yet and won\'t be rebuilt')
+            continue
+        logger.info(f'DDL "{name}" will be rebuilt, because its dependencies have changed')
+        rebuild_ops[name] = RebuildDDLOp(script=script, ddl=graph.ddls[name])
+
+    graph_ops = {**sync_ops, **rebuild_ops}
+    batches = [[graph_ops[name] for name in batch] for batch in graph.get_batches(graph_ops)]
+    upgrade_ops.ops.append(SyncDDLGraphOp(batches=batches))
@@ -0,0 +1,100 @@
+"""
+Pytest plugin with fixtures for testing migrations with DDL scripts. The migrations are applied
+once per session to a template SQLite database, and each test gets its own copy of it.
+
+Enabled automatically when alembic-dddl is installed. Override the `dddl_alembic_config` fixture
+or use the `--dddl-alembic-config` option to point to the project's alembic.ini.
+"""
+
+import shutil
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Union
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from alembic_dddl.src.models import DDL
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--dddl-alembic-config",
+        default="alembic.ini",
+        help="alembic config for the alembic-dddl fixtures, default alembic.ini",
+    )
+
+
+@pytest.fixture(scope="session")
+def dddl_alembic_config(pytestconfig: pytest.Config) -> Config:
+    """The alembic config of the tested project. Override it to customize the config."""
+    return Config(pytestconfig.getoption("--dddl-alembic-config"))
+
+
+def _copy_config(config: Config, url: str) -> Config:
+    """Copy the alembic config, pointing it to another database."""
+    result = Config(
+        file_=config.config_file_name,
+        ini_section=config.config_ini_section,
+        cmd_opts=config.cmd_opts,
+    )
+    result.attributes.update(config.attributes)
+    result.set_main_option("sqlalchemy.url", url)
+    return result
+
+
+@pytest.fixture(scope="session")
+def dddl_template_database(
+    dddl_alembic_config: Config, tmp_path_factory: pytest.TempPathFactory
+) -> Path:
+    """SQLite database upgraded to head. Created once per session, don't modify it in tests."""
+    path = tmp_path_factory.mktemp("dddl") / "template.db"
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    try:
+        config = _copy_config(dddl_alembic_config, url)
+        config.attributes["connection"] = engine
+        command.upgrade(config, "head")
+    finally:
+        engine.dispose()
+    return path
+
+
+@pytest.fixture
+def dddl_database(dddl_template_database: Path, tmp_path: Path) -> Path:
+    """A copy of the template database for one test."""
+    path = tmp_path / "dddl.db"
+    shutil.copyfile(dddl_template_database, path)
+    return path
+
+
+@pytest.fixture
+def dddl_engine(dddl_database: Path) -> Iterator[Engine]:
+    """Engine connected to the test copy of the template database."""
+    engine = create_engine(f"sqlite:///{dddl_database}")
+    yield engine
+    engine.dispose()
+
+
+def assert_no_ddl_drift(config: Union[Config, str], ddls: Optional[Sequence[DDL]] = None) -> None:
+    """
+    Assert that the DDLs don't have changes, which require a new revision. The comparison runs in
+    memory, without a database.
+
+    Args:
+        config: alembic config or path to it.
+        ddls: DDLs to compare. By default, the DDLs registered in env.py are used.
+    """
+
+    from alembic_dddl.src.batch import compare_config, prepare_config
+
+    result = compare_config(prepare_config(config, ddls=ddls))
+    if result.has_drift:
+        lines = [f"new DDL: {name}" for name in result.new]
+        lines += [f"changed DDL: {name}" for name in result.changed]
+        raise AssertionError(
+            "DDLs have changes without revisions, run alembic revision --autogenerate:\n"
+            + "\n".join(lines)
+        )
@@ -0,0 +1,83 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional
+
+from alembic_dddl.src.config import DDDLConfig
+from alembic_dddl.src.utils import ensure_dir
+
+logger = logging.getLogger(__name__)
+
+BASELINE_FORMAT_VERSION = 2
+
+
+@dataclass(frozen=True)
+class Baseline:
+    """
+    The manifest of squashed DDL history. It lists the final revisioned script of each DDL at the
+    baseline revision. The first script of each DDL with several scripts is replaced with the
+    final one, so that the DDL exists from its original revision on, and the scripts in between
+    are superseded and are not executed anymore.
+    """
+
+    revision: str
+    scripts: Dict[str, str] = field(default_factory=dict)
+    superseded: FrozenSet[str] = frozenset()
+    # the first script of the DDL: the final script of the DDL, run in its place
+    replaced: Dict[str, str] = field(default_factory=dict)
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            ensure_dir(directory)
+        data = {
+            "version": BASELINE_FORMAT_VERSION,
+            "revision": self.revision,
+            "scripts": self.scripts,
+            "superseded": sorted(self.superseded),
+            "replaced": self.replaced,
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["Baseline"]:
+        """Load the baseline manifest, None if the history was not squashed."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if data.get("version") != BASELINE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported baseline manifest format: {path}")
+        return cls(
+            revision=data["revision"],
+            scripts=data["scripts"],
+            superseded=frozenset(data["superseded"]),
+            replaced=data["replaced"],
+        )
+
+
+def get_baseline_path(config: DDDLConfig) -> str:
+    """Get the path of the baseline manifest, e.g. migrations/versions/ddl_baseline.json."""
+    if config.baseline_manifest:
+        return config.baseline_manifest
+    root, _ = os.path.splitext(config.scripts_location.rstrip("/\\"))
+    return f"{root}_baseline.json"
+
+
+@lru_cache(maxsize=8)
+def _load_cached(path: str, mtime_ns: int) -> Optional[Baseline]:
+    return Baseline.load(path)
+
+
+def get_baseline(config: DDDLConfig) -> Optional[Baseline]:
+    """Get the baseline manifest, it's only read again when the file changes."""
+    path = get_baseline_path(config)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _load_cached(path, mtime_ns)
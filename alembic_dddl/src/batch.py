@@ -0,0 +1,212 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Sequence, Union
+
+from alembic.config import Config
+from alembic.runtime.environment import EnvironmentContext
+from alembic.script import ScriptDirectory
+
+from alembic_dddl.src.comparator import CustomDDLComparator, RevisionManager
+from alembic_dddl.src.config import DDDLConfig, load_config
+from alembic_dddl.src.models import DDL
+from alembic_dddl.src.revision_cache import RevisionScripts
+from alembic_dddl.src.sql import normalize_cache
+from alembic_dddl.src.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+# env.py files are run through alembic's module-level context proxy, so they are loaded one at a
+# time
+_env_lock = threading.Lock()
+
+
+@dataclass
+class ConfigResult:
+    """Result of the DDL comparison for one alembic config"""
+
+    config_path: str
+    new: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def has_drift(self) -> bool:
+        return bool(self.new or self.changed)
+
+
+@dataclass
+class CheckReport:
+    """Combined result of the DDL comparison for several alembic configs"""
+
+    results: List[ConfigResult]
+
+    @property
+    def has_drift(self) -> bool:
+        return any(r.has_drift for r in self.results)
+
+    @property
+    def has_errors(self) -> bool:
+        return any(r.error is not None for r in self.results)
+
+
+@dataclass
+class PreparedConfig:
+    """Everything needed to compare the DDLs of one config, with absolute paths"""
+
+    config_path: str
+    dddl_config: DDDLConfig
+    ddls: List[DDL]
+    rev_order: List[str]
+    # the scripts of each revision, if they are cached by the revision cache
+    scripts_by_revision: Optional[Dict[str, RevisionScripts]] = None
+
+
+def _resolve_path(path: str, base_dir: str) -> str:
+    """Resolve the relative path against `base_dir`. Empty paths are kept empty."""
+    return os.path.join(base_dir, path) if path else path
+
+
+def _resolve_alembic_paths(config: Config, base_dir: str) -> None:
+    """
+    Make the relative paths in the alembic section of the config absolute, resolving them
+    against `base_dir`. Package resources like `myapp:migrations` are kept as they are.
+    """
+
+    def resolve(paths: List[str]) -> str:
+        joined = os.pathsep.join(_resolve_path(p, base_dir) for p in paths)
+        # set_main_option interpolates the values
+        return joined.replace("%", "%%")
+
+    script_location = config.get_main_option("script_location")
+    if script_location and not os.path.isabs(script_location) and ":" not in script_location:
+        config.set_main_option("script_location", resolve([script_location]))
+
+    version_locations = config.get_version_locations_list()
+    prepend_sys_path = config.get_prepend_sys_paths_list()
+    if version_locations or prepend_sys_path:
+        config.set_main_option("path_separator", "os")
+    if version_locations:
+        config.set_main_option("version_locations", resolve(version_locations))
+    if prepend_sys_path:
+        config.set_main_option("prepend_sys_path", resolve(prepend_sys_path))
+
+
+def load_registered_ddls(config: Config, script_directory: ScriptDirectory) -> List[DDL]:
+    """
+    Run env.py of the config in the offline mode, without running any migrations, and return the
+    DDLs it registered. The DDLs and tenants are collected in separate registries, so the global
+    registries are not affected.
+    """
+
+    from alembic_dddl.dddl import get_registry, use_registry
+    from alembic_dddl.src.tenants import use_tenants
+
+    with use_registry(), use_tenants():
+        with EnvironmentContext(
+            config,
+            script_directory,
+            fn=lambda rev, context: [],
+            as_sql=True,
+            output_buffer=io.StringIO(),
+            destination_rev="heads",
+        ):
+            script_directory.run_env()
+        return list(get_registry(config).ddls)
+
+
+def prepare_config(
+    config: Union[Config, str], ddls: Optional[Sequence[DDL]] = None
+) -> PreparedConfig:
+    """
+    Load the config, its registered DDLs and revisions. If the config is passed as a path,
+    relative paths in the config are resolved against the config directory, like when alembic is
+    run from there. The working directory itself is not changed, as it is shared by all threads.
+    If `ddls` are passed, env.py is not run.
+    """
+
+    if isinstance(config, str):
+        config_path = os.path.abspath(config)
+        base_dir = os.path.dirname(config_path)
+        config = Config(config_path)
+        _resolve_alembic_paths(config, base_dir)
+    else:
+        config_path = os.path.abspath(config.config_file_name or "")
+        base_dir = os.getcwd()
+
+    with _env_lock:
+        script_directory = ScriptDirectory.from_config(config)
+        if ddls is None:
+            ddls = load_registered_ddls(config, script_directory)
+        dddl_config = load_config(config)
+        dddl_config = replace(
+            dddl_config,
+            scripts_location=(
+                dddl_config.scripts_location
+                if dddl_config.storage == "package"
+                else _resolve_path(dddl_config.scripts_location, base_dir)
+            ),
+            revision_cache=_resolve_path(dddl_config.revision_cache, base_dir),
+        )
+        rev_manager = RevisionManager.from_script_directory(
+            script_directory,
+            revision_cache=dddl_config.revision_cache,
+            storage=get_storage(dddl_config),
+        )
+        rev_order = rev_manager.get_ordered_revisions()
+    return PreparedConfig(
+        config_path=config_path,
+        dddl_config=dddl_config,
+        ddls=list(ddls),
+        rev_order=rev_order,
+        scripts_by_revision=rev_manager.scripts_by_revision,
+    )
+
+
+def compare_config(prepared: PreparedConfig) -> ConfigResult:
+    """Compare the registered DDLs of the config with their latest revisioned scripts."""
+    comparator = CustomDDLComparator(
+        ddl_dir=prepared.dddl_config.scripts_location,
+        ddls=prepared.ddls,
+        autogen_context=None,
+        ignore_comments=prepared.dddl_config.ignore_comments,
+        storage=get_storage(prepared.dddl_config),
+        rev_order=prepared.rev_order,
+        streaming=prepared.dddl_config.streaming_comparison,
+        scripts_by_revision=prepared.scripts_by_revision,
+    )
+    result = ConfigResult(config_path=prepared.config_path)
+    for ddl, script in comparator.get_changed_ddls():
+        if script is None:
+            result.new.append(ddl.name)
+        else:
+            result.changed.append(ddl.name)
+    return result
+
+
+def _check_one(config_path: str) -> ConfigResult:
+    try:
+        return compare_config(prepare_config(config_path))
+    except Exception as e:
+        logger.exception(f"Failed to check {config_path}")
+        return ConfigResult(config_path=os.path.abspath(config_path), error=repr(e))
+
+
+def check_configs(config_paths: Sequence[str], max_workers: int = 4) -> CheckReport:
+    """
+    Compare the registered DDLs with their latest revisioned scripts for each of the alembic
+    configs in one process. The configs are checked by a pool of worker threads; loading env.py
+    files is serialized, while the comparisons run concurrently and share the normalized SQL
+    cache, which is dropped after the run.
+    """
+
+    with normalize_cache(), ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="dddl-check"
+    ) as pool:
+        futures = [pool.submit(copy_context().run, _check_one, path) for path in config_paths]
+        results = [f.result() for f in futures]
+    return CheckReport(results=results)
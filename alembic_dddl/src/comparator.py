@@ -1,21 +1,74 @@
-import os
-from glob import glob
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence, Tuple, Union
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-import sqlparse
 from alembic.autogenerate.api import AutogenContext
+from alembic.script import ScriptDirectory
 
-from alembic_dddl.src.file_format import DateTimeFileFormat, TimestampedFileFormat
-from alembic_dddl.src.models import DDL, RevisionedScript
+from alembic_dddl.src.models import DDL, DataScript, RevisionedScript
+from alembic_dddl.src.revision_cache import (
+    RevisionCache,
+    RevisionScripts,
+    get_heads,
+    get_scripts_by_revision,
+)
+from alembic_dddl.src.sql import normalize, normalized_differ
+from alembic_dddl.src.storage import DirectoryStorage, ScriptStorage
 
 
 class RevisionManager:
-    def __init__(self, autogen_context: AutogenContext) -> None:
-        self.revisions = autogen_context.opts["script"].walk_revisions()
-        self.heads = autogen_context.opts["script"].get_heads()
+    def __init__(
+        self,
+        autogen_context: AutogenContext,
+        revision_cache: str = "",
+        storage: Optional[ScriptStorage] = None,
+    ) -> None:
+        self._load_revisions(autogen_context.opts["script"], revision_cache, storage)
         self.cur_head = autogen_context.opts["revision_context"].generated_revisions[0].head
 
+    @classmethod
+    def from_script_directory(
+        cls,
+        script_directory: ScriptDirectory,
+        revision_cache: str = "",
+        storage: Optional[ScriptStorage] = None,
+    ) -> "RevisionManager":
+        """Create the manager for all heads of the script directory, outside of autogenerate."""
+        manager = cls.__new__(cls)
+        manager._load_revisions(script_directory, revision_cache, storage)
+        manager.cur_head = "heads"
+        return manager
+
+    def _load_revisions(
+        self,
+        script_directory: ScriptDirectory,
+        revision_cache: str,
+        storage: Optional[ScriptStorage],
+    ) -> None:
+        self.revisions: Iterable[Any]
+        # the revisioned scripts of each revision, if they are cached together with the revisions
+        self.scripts_by_revision: Optional[Dict[str, RevisionScripts]] = None
+        if revision_cache:
+            cache = RevisionCache(
+                cache_path=revision_cache, script_directory=script_directory, storage=storage
+            )
+            revisions = cache.get_revisions()
+            self.revisions = revisions
+            self.heads = get_heads(revisions)
+            self.scripts_by_revision = get_scripts_by_revision(revisions)
+        else:
+            self.revisions = script_directory.walk_revisions()
+            self.heads = script_directory.get_heads()
+
     def get_ordered_revisions(self) -> List[str]:
         """
         Get the list of revisions ordered from head to base.
@@ -42,74 +95,104 @@ class RevisionManager:
 
 
 class DDLVersions:
-    def __init__(self, ddl_dir: Union[Path, str]) -> None:
+    def __init__(self, ddl_dir: Union[Path, str], storage: Optional[ScriptStorage] = None) -> None:
         self.ddl_dir = ddl_dir
+        self.storage = storage or DirectoryStorage(str(ddl_dir))
 
-    def _get_all_scripts(self) -> List[RevisionedScript]:
-        """
-        Find all .sql files in the ddl_dir and convert them into RevisionedScript objects
-        if they match the supported filename formats.
-        """
-
-        result = []
-        file_formats = [TimestampedFileFormat, DateTimeFileFormat]
-        for file in glob(os.path.join(self.ddl_dir, "*.sql")):
-            for format in file_formats:
-                script = format.get_script_if_matches(file)
-                if script:
-                    result.append(script)
-                    break
-        return result
-
-    def _group_by_revision(
-        self, scripts: List[RevisionedScript]
-    ) -> Dict[str, List[RevisionedScript]]:
-        """Group a list of RevisionedScripts into a dictionary by revisions."""
-        result: Dict[str, List[RevisionedScript]] = {}
-
-        for script in scripts:
-            result.setdefault(script.revision, []).append(script)
-
-        return result
-
-    def get_latest_ddl_revisions(self, rev_order: List[str]) -> Dict[str, RevisionedScript]:
+    def get_latest_ddl_revisions(
+        self,
+        rev_order: List[str],
+        names: Optional[Collection[str]] = None,
+        scripts_by_revision: Optional[Dict[str, RevisionScripts]] = None,
+    ) -> Dict[str, RevisionedScript]:
         """
         Use the list of revisions ordered from head to base in `rev_order` parameter to create a
         dictionary of the latest versions of each script in ddl dir by name.
 
+        The scripts are processed in a single pass, only the closest to the head entry is kept
+        for each name, and RevisionedScript objects are created only for the winning entries.
+
         Args:
             rev_order: list of revision strings, ordered from current head to base.
+            names: if specified, the scripts with other names are skipped.
+            scripts_by_revision: the scripts of each revision from the revision cache. If
+                specified, the storage is not listed, and the revisions are only walked until
+                the scripts of all `names` are found.
 
         Returns:
             A dictionary of the most recent scripts for the current head where key is script name
             and value is RevisionedScript object,
         """
 
-        scripts = self._get_all_scripts()
-        ddl_by_revision = self._group_by_revision(scripts)
+        if scripts_by_revision is not None:
+            return self._get_cached_latest(rev_order, names, scripts_by_revision)
+
+        rank = {rev: i for i, rev in enumerate(rev_order)}
+        latest: Dict[str, Tuple[int, str, str]] = {}
+        for filepath, name, revision in self.storage.iter_scripts(
+            revisions=rank.keys(), names=names
+        ):
+            rev_rank = rank.get(revision)
+            if rev_rank is None or (names is not None and name not in names):
+                continue
+            current = latest.get(name)
+            if current is None or rev_rank <= current[0]:
+                latest[name] = (rev_rank, filepath, revision)
+
         return {
-            s.name: s
-            for r in reversed(rev_order)
-            if r in ddl_by_revision
-            for s in ddl_by_revision[r]
+            name: self.storage.get_script(filepath=filepath, name=name, revision=revision)
+            for name, (_, filepath, revision) in latest.items()
         }
 
+    def _get_cached_latest(
+        self,
+        rev_order: List[str],
+        names: Optional[Collection[str]],
+        scripts_by_revision: Dict[str, RevisionScripts],
+    ) -> Dict[str, RevisionedScript]:
+        latest: Dict[str, RevisionedScript] = {}
+        for revision in rev_order:
+            for filepath, name in scripts_by_revision.get(revision, ()):
+                if name not in latest and (names is None or name in names):
+                    latest[name] = self.storage.get_script(
+                        filepath=filepath, name=name, revision=revision
+                    )
+            if names is not None and len(latest) == len(names):
+                break
+        return latest
+
 
 class CustomDDLComparator:
     def __init__(
         self,
         ddl_dir: Union[Path, str],
         ddls: Sequence[DDL],
-        autogen_context: AutogenContext,
+        autogen_context: Optional[AutogenContext],
         ignore_comments: bool,
+        revision_cache: str = "",
+        storage: Optional[ScriptStorage] = None,
+        extra_names: Collection[str] = (),
+        rev_order: Optional[List[str]] = None,
+        streaming: bool = False,
+        scripts_by_revision: Optional[Dict[str, RevisionScripts]] = None,
     ) -> None:
         self.ddls = {d.name: d for d in ddls}
+        self.revision_cache = revision_cache
+        self.storage = storage
+        # names of other DDLs, which latest revisions are needed, but which are not compared
+        self.extra_names = extra_names
+        # revisions from head to base, if they are already known, autogen_context is not used
+        self.rev_order = rev_order
+        # the scripts of each revision from the revision cache, if they are known
+        self.scripts_by_revision = scripts_by_revision
         self.latest_revisions = self._get_latest_revisions(ddl_dir, autogen_context)
 
         self.ignore_comments = ignore_comments
+        # compare the scripts token by token, stopping at the first difference
+        self.streaming = streaming
 
     def _get_latest_revisions(
-        self, ddl_dir: Union[Path, str], autogen_context: AutogenContext
+        self, ddl_dir: Union[Path, str], autogen_context: Optional[AutogenContext]
     ) -> Dict[str, RevisionedScript]:
         """
         Generate a collection of RevisionedScript, representing the latest revisions of every
@@ -124,11 +207,25 @@ class CustomDDLComparator:
             a RevisionedScript instance.
         """
 
-        rev_manager = RevisionManager(autogen_context=autogen_context)
-        rev_order = rev_manager.get_ordered_revisions()
-
-        versions = DDLVersions(ddl_dir=ddl_dir)
-        return versions.get_latest_ddl_revisions(rev_order)
+        storage = self.storage or DirectoryStorage(str(ddl_dir))
+        rev_order = self.rev_order
+        scripts_by_revision = self.scripts_by_revision
+        if rev_order is None:
+            assert autogen_context is not None, "autogen_context is required to get revisions"
+            rev_manager = RevisionManager(
+                autogen_context=autogen_context,
+                revision_cache=self.revision_cache,
+                storage=storage,
+            )
+            rev_order = rev_manager.get_ordered_revisions()
+            scripts_by_revision = rev_manager.scripts_by_revision
+
+        versions = DDLVersions(ddl_dir=ddl_dir, storage=storage)
+        return versions.get_latest_ddl_revisions(
+            rev_order,
+            names={*self.ddls, *self.extra_names},
+            scripts_by_revision=scripts_by_revision,
+        )
 
     def get_changed_ddls(self) -> List[Tuple[DDL, Optional[RevisionedScript]]]:
         """
@@ -144,7 +241,13 @@ class CustomDDLComparator:
         for name, ddl in self.ddls.items():
             latest_ddl_revision = self.latest_revisions.get(name)
             if latest_ddl_revision is not None:
-                if self._scripts_differ(one=ddl.sql, two=latest_ddl_revision.read()):
+                previous = latest_ddl_revision.read()
+                if isinstance(ddl, DataScript):
+                    # data is not SQL, any change matters
+                    changed = ddl.sql != previous
+                else:
+                    changed = self._scripts_differ(one=ddl.sql, two=previous)
+                if changed:
                     result.append((ddl, latest_ddl_revision))
             else:
                 result.append((ddl, None))
@@ -161,14 +264,11 @@ class CustomDDLComparator:
         Returns:
             True if the scripts differ, False if the scripts are the same
         """
-        kwargs = {
-            "reindent_aligned": True,
-            "strip_comments": self.ignore_comments,
-            "keyword_case": "upper",
-            "identifier_case": "lower",
-            "use_space_around_operators": True,
-        }
-        one_norm = sqlparse.format(one.strip(), **kwargs)
-        two_norm = sqlparse.format(two.strip(), **kwargs)
+
+        if self.streaming:
+            return normalized_differ(one, two, strip_comments=self.ignore_comments)
+
+        one_norm = normalize(one, strip_comments=self.ignore_comments)
+        two_norm = normalize(two, strip_comments=self.ignore_comments)
 
         return one_norm != two_norm
@@ -12,6 +12,29 @@ class DDDLConfig:
     scripts_location: str = "migrations/versions/ddl"
     use_timestamps: bool = False
     ignore_comments: bool = False
+    revision_cache: str = ""
+    slow_statement_threshold: float = 0.0
+    storage: str = "directory"
+    # subdirectories of the directory storage: "flat" (none), "by_name" or "by_year"
+    layout: str = "flat"
+    prefetch: bool = False
+    # in characters of the script source code
+    prefetch_buffer_size: int = 16 * 1024 * 1024
+    # max number of rebuilds of independent DDLs run concurrently, 0 to run them one by one
+    parallel_batches: int = 0
+    # skip revisioned scripts which content was already applied, according to the ledger table
+    use_ledger: bool = False
+    ledger_table: str = "alembic_dddl_ledger"
+    # path to the manifest of squashed DDL history, empty for the default location next to the
+    # scripts location
+    baseline_manifest: str = ""
+    # compare scripts token by token, stopping at the first difference, instead of formatting them
+    streaming_comparison: bool = False
+    # where the execution durations of the scripts are recorded: "file", "table" or empty to
+    # disable recording
+    timing_history: str = ""
+    timing_history_file: str = "migrations/dddl_timings.json"
+    timing_history_table: str = "alembic_dddl_timings"
 
     @classmethod
     def _process_bools(cls, alembic_config_dict: Dict[str, Any]) -> Dict[str, Any]:
@@ -33,6 +56,29 @@ class DDDLConfig:
                 result[bool_field] = asbool(result[bool_field])
         return result
 
+    @classmethod
+    def _process_numbers(cls, alembic_config_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        For each field that should be interpreted as an int or a float, convert its actual value in
+        the `alembic_config_dict` into a number of this type. Empty values are removed, so that
+        the defaults are used.
+
+        Args:
+            alembic_config_dict: a dictionary with DDDL options, got from alembic config
+
+        Returns:
+            A copy of the input dictionary with processed numeric values
+        """
+
+        result = dict(alembic_config_dict)
+        number_fields = ((f.name, f.type) for f in fields(cls) if f.type in (int, float))
+        for number_field, number_type in number_fields:
+            if result.get(number_field):
+                result[number_field] = number_type(result[number_field])
+            elif number_field in result:
+                del result[number_field]
+        return result
+
     @classmethod
     def from_config(cls, alembic_config: Config) -> "DDDLConfig":
         """
@@ -44,6 +90,7 @@ class DDDLConfig:
         config_dict = {k: v for k, v in config_dict.items() if k in config_fields}
         if config_dict:
             config_dict = cls._process_bools(config_dict)
+            config_dict = cls._process_numbers(config_dict)
         return DDDLConfig(**config_dict)
 
 
@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, bindparam, exists, inspect, literal, select, tuple_
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Delete, Insert, Update, column
+from sqlalchemy.sql.elements import BindParameter
+from sqlalchemy.sql.expression import ColumnClause, TableClause
+
+from alembic_dddl.src.models import CSV
+
+Row = Dict[str, Any]
+
+
+def parse_rows(data: str, format: str) -> Tuple[List[str], List[Row]]:
+    """
+    Parse the content of a data script into column names and rows. Empty CSV values are loaded as
+    NULLs, other CSV values are passed to the database as strings. JSON data must be a list of
+    objects, missing keys are loaded as NULLs.
+    """
+
+    rows: List[Row]
+    if format == CSV:
+        reader = csv.DictReader(io.StringIO(data))
+        rows = [{k: (v if v != "" else None) for k, v in row.items()} for row in reader]
+        columns = list(reader.fieldnames or [])
+    else:
+        rows = json.loads(data)
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            raise ValueError("JSON data script must contain a list of objects")
+        columns = list(dict.fromkeys(k for row in rows for k in row))
+        rows = [{c: row.get(c) for c in columns} for row in rows]
+    return columns, rows
+
+
+def iter_chunks(rows: Sequence[Row], chunk_size: int) -> Iterator[Sequence[Row]]:
+    """Split the rows into chunks of at most `chunk_size` rows."""
+    for start in range(0, len(rows), chunk_size):
+        yield rows[start : start + chunk_size]
+
+
+def get_columns(columns: Sequence[str], rows: Sequence[Row]) -> List[ColumnClause]:
+    """
+    Get the column objects for the insert. Their types are inferred from the first non-NULL value,
+    so that the values can be rendered as literals in the offline mode.
+    """
+
+    result = []
+    for name in columns:
+        value = next((row[name] for row in rows if row.get(name) is not None), None)
+        result.append(column(name, literal(value).type if value is not None else None))
+    return result
+
+
+def get_primary_key(connection: Connection, table_name: str, schema: Optional[str]) -> List[str]:
+    """Get the primary key columns of the table, an empty list if it has no primary key."""
+    constraint = inspect(connection).get_pk_constraint(table_name, schema=schema)
+    return list(constraint.get("constrained_columns") or [])
+
+
+def get_referencing_tables(
+    connection: Connection, table_name: str, schema: Optional[str]
+) -> List[str]:
+    """Get the names of the tables in the schema, which have foreign keys to the table."""
+    inspector = inspect(connection)
+    result = []
+    for name in inspector.get_table_names(schema=schema):
+        for foreign_key in inspector.get_foreign_keys(name, schema=schema):
+            referred_schema = foreign_key.get("referred_schema")
+            if foreign_key["referred_table"] == table_name and referred_schema in (None, schema):
+                result.append(name)
+                break
+    return result
+
+
+def _param(name: str) -> str:
+    # the names of the columns themselves are reserved for the values of UPDATE and INSERT
+    return f"data_{name}"
+
+
+def _value(target: TableClause, name: str, row: Optional[Row]) -> BindParameter:
+    """Parameter for the value of the column, bound to the value from the row if it's passed."""
+    if row is None:
+        return bindparam(_param(name), type_=target.c[name].type)
+    return bindparam(_param(name), row[name], type_=target.c[name].type)
+
+
+def get_params(rows: Sequence[Row]) -> List[Row]:
+    """Get the parameters of the statements below for `executemany`."""
+    return [{_param(name): value for name, value in row.items()} for row in rows]
+
+
+def delete_missing(target: TableClause, key: Sequence[str], rows: Sequence[Row]) -> Delete:
+    """Delete the rows of the table, which keys are not present in the data."""
+    if len(key) == 1:
+        present = target.c[key[0]].in_([row[key[0]] for row in rows])
+    else:
+        present = tuple_(*(target.c[k] for k in key)).in_(
+            [tuple(row[k] for k in key) for row in rows]
+        )
+    return target.delete().where(~present)
+
+
+def update_by_key(
+    target: TableClause, columns: Sequence[str], key: Sequence[str], row: Optional[Row] = None
+) -> Optional[Update]:
+    """
+    Update the row with the key of the row. The values are taken from `row`, or from the
+    parameters of `executemany` (see `get_params`). None if all the columns belong to the key, so
+    there is nothing to update.
+    """
+
+    values = {c: _value(target, c, row) for c in columns if c not in key}
+    if not values:
+        return None
+    where = and_(*(target.c[k] == _value(target, k, row) for k in key))
+    return target.update().where(where).values(values)
+
+
+def insert_missing(
+    target: TableClause, columns: Sequence[str], key: Sequence[str], row: Optional[Row] = None
+) -> Insert:
+    """
+    Insert the row, if its key is not present in the table yet. The values are taken from `row`,
+    or from the parameters of `executemany` (see `get_params`).
+    """
+
+    existing = target.alias("existing")
+    where = and_(*(existing.c[k] == _value(target, k, row) for k in key))
+    values = select(*(_value(target, c, row) for c in columns)).where(
+        ~exists().select_from(existing).where(where)
+    )
+    return target.insert().from_select(list(columns), values)
@@ -0,0 +1,141 @@
+import logging
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(f"alembic.{__name__}")
+
+# execution modes of revisioned scripts
+TRANSACTION = "transaction"
+AUTOCOMMIT = "autocommit"
+PER_STATEMENT = "per_statement"
+PER_SCRIPT = "per_script"
+EXECUTION_MODES = (TRANSACTION, AUTOCOMMIT, PER_STATEMENT, PER_SCRIPT)
+
+
+@dataclass
+class StatementEvent:
+    """A statement of the revisioned script, passed to the statement hooks"""
+
+    script_name: str
+    index: int
+    statement: str
+    # only set for the "after statement" hooks
+    duration: Optional[float] = None
+
+
+@dataclass
+class ScriptSummary:
+    """Execution summary of a revisioned script, passed to the "after script" hooks"""
+
+    script_name: str
+    statements: int
+    duration: float
+    slowest_index: Optional[int] = None
+    slowest_duration: float = 0.0
+
+
+StatementHook = Callable[[StatementEvent], Any]
+ScriptHook = Callable[[ScriptSummary], Any]
+
+
+class ExecutionHooks:
+    """
+    Callbacks which are invoked by `run_ddl_script` around each executed statement and after each
+    script. The methods return the hook, so they can be used as decorators.
+    """
+
+    def __init__(self) -> None:
+        self.before_statement: List[StatementHook] = []
+        self.after_statement: List[StatementHook] = []
+        self.after_script: List[ScriptHook] = []
+
+    def on_before_statement(self, hook: StatementHook) -> StatementHook:
+        """Subscribe to the event fired before each statement is executed."""
+        self.before_statement.append(hook)
+        return hook
+
+    def on_after_statement(self, hook: StatementHook) -> StatementHook:
+        """Subscribe to the event fired after each statement is executed, with its duration."""
+        self.after_statement.append(hook)
+        return hook
+
+    def on_after_script(self, hook: ScriptHook) -> ScriptHook:
+        """Subscribe to the event fired after the whole script is executed."""
+        self.after_script.append(hook)
+        return hook
+
+    def clear(self) -> None:
+        """Remove all subscribed hooks."""
+        self.before_statement.clear()
+        self.after_statement.clear()
+        self.after_script.clear()
+
+
+execution_hooks = ExecutionHooks()
+
+
+def _shorten(statement: str, length: int = 80) -> str:
+    """Get the first line of the statement, truncated to `length` characters, for logging."""
+    first_line = statement.strip().split("\n", 1)[0]
+    if len(first_line) > length:
+        return first_line[: length - 3] + "..."
+    return first_line
+
+
+def execute_statements(
+    execute: Callable[[str], Any],
+    script_name: str,
+    statements: Sequence[str],
+    slow_statement_threshold: float = 0.0,
+    hooks: ExecutionHooks = execution_hooks,
+    indexes: Optional[Sequence[int]] = None,
+) -> ScriptSummary:
+    """
+    Execute the statements of a revisioned script one by one, measuring the time each of them
+    takes.
+
+    Args:
+        execute: a callable which executes a single statement, e.g. `operations.execute`.
+        script_name: name of the revisioned script, used in logs and hook events.
+        statements: the statements to execute.
+        slow_statement_threshold: statements which take longer than this number of seconds are
+            logged as warnings. 0 disables the reporting.
+        hooks: the hooks to notify.
+        indexes: positions of the statements in the script, if only a part of the script is
+            executed. Used in logs and hook events.
+
+    Returns:
+        The execution summary of the script.
+    """
+
+    summary = ScriptSummary(script_name=script_name, statements=len(statements), duration=0.0)
+    script_start = perf_counter()
+    for position, statement in enumerate(statements):
+        index = indexes[position] if indexes is not None else position
+        event = StatementEvent(script_name=script_name, index=index, statement=statement)
+        for before_hook in hooks.before_statement:
+            before_hook(event)
+
+        start = perf_counter()
+        execute(statement)
+        duration = event.duration = perf_counter() - start
+
+        for after_hook in hooks.after_statement:
+            after_hook(event)
+
+        if duration > summary.slowest_duration or summary.slowest_index is None:
+            summary.slowest_index, summary.slowest_duration = index, duration
+        if slow_statement_threshold and duration >= slow_statement_threshold:
+            logger.warning(
+                f'Slow statement #{index} in "{script_name}" took {duration:.3f}s: '
+                f"{_shorten(statement)}"
+            )
+
+    summary.duration = perf_counter() - script_start
+    logger.info(
+        f'Executed "{script_name}": {summary.statements} statements in {summary.duration:.3f}s'
+    )
+    for script_hook in hooks.after_script:
+        script_hook(summary)
+    return summary
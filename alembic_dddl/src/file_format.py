@@ -1,9 +1,10 @@
 import os
 import re
+import sys
 from abc import ABC, abstractmethod
-from datetime import datetime
+from datetime import datetime, timezone
 from re import Pattern
-from typing import Union
+from typing import List, Optional, Tuple, Type, Union
 
 from alembic_dddl.src.models import RevisionedScript
 
@@ -27,11 +28,33 @@ class FileFormatBase(ABC):
             cls.pattern.groupindex
         ), 'filename pattern must contain "name" and "revision" groups'
 
-        filename = os.path.split(filepath)[-1]
+        match = cls.match_filename(os.path.split(filepath)[-1])
+        if not match:
+            return None
+        name, revision = match
+        return RevisionedScript(filepath=filepath, name=name, revision=revision)
+
+    @classmethod
+    def match_filename(cls, filename: str) -> Optional[Tuple[str, str]]:
+        """
+        Match the filename against the file format pattern and return a (name, revision) tuple if
+        it matches, otherwise None. The strings are interned, because there are usually many
+        files with the same name or revision.
+        """
+
         match = cls.pattern.match(filename)
         if not match:
             return None
-        return RevisionedScript(filepath=filepath, name=match["name"], revision=match["revision"])
+        return sys.intern(match["name"]), sys.intern(match["revision"])
+
+    @classmethod
+    def parse_time(cls, filename: str) -> Optional[datetime]:
+        """
+        Get the time of the script from the filename, which matches the format. Formats without
+        the time in the filename return None.
+        """
+
+        return None
 
 
 class TimestampedFileFormat(FileFormatBase):
@@ -46,6 +69,12 @@ class TimestampedFileFormat(FileFormatBase):
         """Generate filename string for this file format out from the supplied components."""
         return f"{int(time.timestamp())}_{name}_{revision}.sql"
 
+    @classmethod
+    def parse_time(cls, filename: str) -> Optional[datetime]:
+        """The time in UTC, so that it doesn't depend on the time zone of the machine."""
+        match = cls.pattern.match(filename)
+        return datetime.fromtimestamp(int(match["timestamp"]), tz=timezone.utc) if match else None
+
 
 class DateTimeFileFormat(FileFormatBase):
     """
@@ -61,3 +90,72 @@ class DateTimeFileFormat(FileFormatBase):
     def generate_filename(name: str, revision: str, time: datetime) -> str:
         """Generate filename string for this file format out from the supplied components."""
         return f"{time.strftime('%Y_%m_%d_%H%M')}_{name}_{revision}.sql"
+
+    @classmethod
+    def parse_time(cls, filename: str) -> Optional[datetime]:
+        match = cls.pattern.match(filename)
+        if not match:
+            return None
+        year, month, day, hours, minutes = (
+            int(match[g]) for g in ("year", "month", "day", "hours", "minutes")
+        )
+        return datetime(year, month, day, hours, minutes)
+
+
+FILE_FORMATS: List[Type[FileFormatBase]] = [TimestampedFileFormat, DateTimeFileFormat]
+
+_GROUP_REFERENCE = re.compile(r"\(\?P([<=])(\w+)([>)])")
+
+# combined pattern of all registered file formats, compiled on first use
+_combined_pattern: Optional[Pattern] = None
+
+
+def register_file_format(file_format: Type[FileFormatBase]) -> None:
+    """
+    Register a custom file format for revisioned scripts. Its pattern must contain "name" and
+    "revision" groups. Registered formats are tried after the built-in ones, in the order of
+    registration.
+    """
+
+    global _combined_pattern
+    if not {"name", "revision"}.issubset(file_format.pattern.groupindex):
+        raise ValueError(
+            f'Filename pattern of {file_format.__name__} must contain "name" and "revision" groups'
+        )
+    if file_format not in FILE_FORMATS:
+        FILE_FORMATS.append(file_format)
+    _combined_pattern = None
+
+
+def _get_combined_pattern() -> Pattern:
+    """
+    Join the patterns of all file formats into one alternation, so that a file name is matched
+    in a single call. The groups of the format number i are prefixed with "f<i>_", and the whole
+    branch is wrapped into the "f<i>" group, which is the `lastgroup` of a match.
+    """
+
+    global _combined_pattern
+    if _combined_pattern is None:
+        branches = []
+        for i, file_format in enumerate(FILE_FORMATS):
+            source = _GROUP_REFERENCE.sub(rf"(?P\1f{i}_\2\3", file_format.pattern.pattern)
+            branches.append(f"(?P<f{i}>{source})")
+        _combined_pattern = re.compile("|".join(branches))
+    return _combined_pattern
+
+
+def parse_filename(filename: str) -> Optional[Tuple[str, str]]:
+    """Get (name, revision) of a revisioned script file in any of the registered formats."""
+    match = _get_combined_pattern().match(filename)
+    if not match:
+        return None
+    prefix = match.lastgroup
+    return sys.intern(match[f"{prefix}_name"]), sys.intern(match[f"{prefix}_revision"])
+
+
+def parse_time(filename: str) -> Optional[datetime]:
+    """Get the time of a revisioned script from its file name, None if it's not there."""
+    for file_format in FILE_FORMATS:
+        if file_format.pattern.match(filename):
+            return file_format.parse_time(filename)
+    return None
@@ -0,0 +1,91 @@
+import heapq
+from typing import Collection, Dict, List, Sequence, Set
+
+from alembic_dddl.src.models import DDL
+
+
+class DDLGraphError(ValueError):
+    """Raised when DDL dependencies are not valid"""
+
+
+class DDLGraph:
+    """
+    Dependency graph of the DDLs, built from their `depends_on` attributes. The graph is validated
+    on creation: all dependencies must be registered and there should be no cycles. When the order
+    is not defined by the dependencies, the DDLs keep the order of registration.
+    """
+
+    def __init__(self, ddls: Sequence[DDL]) -> None:
+        self.ddls: Dict[str, DDL] = {d.name: d for d in ddls}
+        self.dependents: Dict[str, List[str]] = {name: [] for name in self.ddls}
+        for ddl in self.ddls.values():
+            for dependency in ddl.depends_on:
+                if dependency not in self.ddls:
+                    raise DDLGraphError(f'DDL "{ddl.name}" depends on unknown DDL "{dependency}"')
+                self.dependents[dependency].append(ddl.name)
+        self.order: List[str] = self._sort()
+        self._positions = {name: i for i, name in enumerate(self.order)}
+
+    @property
+    def has_dependencies(self) -> bool:
+        return any(d.depends_on for d in self.ddls.values())
+
+    def _sort(self) -> List[str]:
+        """Sort the DDL names topologically, preferring the order of registration."""
+        registration = {name: i for i, name in enumerate(self.ddls)}
+        in_degree = {name: len(set(d.depends_on)) for name, d in self.ddls.items()}
+        ready = [(registration[n], n) for n, degree in in_degree.items() if degree == 0]
+        heapq.heapify(ready)
+
+        result = []
+        while ready:
+            _, name = heapq.heappop(ready)
+            result.append(name)
+            for dependent in dict.fromkeys(self.dependents[name]):
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    heapq.heappush(ready, (registration[dependent], dependent))
+
+        if len(result) != len(self.ddls):
+            cycle = ", ".join(n for n in self.ddls if n not in set(result))
+            raise DDLGraphError(f"Circular dependency between DDLs: {cycle}")
+        return result
+
+    def sort(self, names: Collection[str]) -> List[str]:
+        """Sort a subset of DDL names topologically."""
+        return sorted(names, key=self._positions.__getitem__)
+
+    def get_levels(self) -> Dict[str, int]:
+        """
+        Get the level of each DDL: 0 for DDLs without dependencies, otherwise one more than the
+        highest level of the dependencies. DDLs of the same level don't depend on each other.
+        """
+
+        levels: Dict[str, int] = {}
+        for name in self.order:
+            depends_on = self.ddls[name].depends_on
+            levels[name] = max((levels[d] + 1 for d in depends_on), default=0)
+        return levels
+
+    def get_batches(self, names: Collection[str]) -> List[List[str]]:
+        """Split a subset of DDL names into batches of independent DDLs, in topological order."""
+        levels = self.get_levels()
+        batches: Dict[int, List[str]] = {}
+        for name in self.sort(names):
+            batches.setdefault(levels[name], []).append(name)
+        return [batches[level] for level in sorted(batches)]
+
+    def get_dependents(self, names: Collection[str]) -> List[str]:
+        """
+        Get all transitive dependents of the DDLs, excluding the DDLs themselves, in topological
+        order.
+        """
+
+        found: Set[str] = set()
+        stack = list(names)
+        while stack:
+            for dependent in self.dependents[stack.pop()]:
+                if dependent not in found:
+                    found.add(dependent)
+                    stack.append(dependent)
+        return self.sort(found - set(names))
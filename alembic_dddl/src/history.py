@@ -0,0 +1,166 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+from alembic_dddl.src.config import load_config
+from alembic_dddl.src.revision_cache import CachedRevision, RevisionCache, get_heads
+from alembic_dddl.src.storage import ScriptEntry, get_storage
+
+HEADS = ("head", "heads")
+
+
+@dataclass(frozen=True)
+class DDLChange:
+    """Difference of a DDL between two revisions, `before` and `after` are script names"""
+
+    name: str
+    before: Optional[str]
+    after: Optional[str]
+
+    @property
+    def status(self) -> str:
+        if self.before is None:
+            return "added"
+        if self.after is None:
+            return "removed"
+        return "changed"
+
+
+class DDLHistory:
+    """
+    In-memory index of the revisioned scripts by revision, together with the revision graph. It
+    answers which script of each DDL is current at a given revision, without importing the
+    migration modules or reading the scripts.
+    """
+
+    def __init__(
+        self, revisions: Sequence[CachedRevision], scripts: Iterable[ScriptEntry]
+    ) -> None:
+        # ordered from heads to base, like alembic's walk_revisions
+        self.revisions = list(revisions)
+        self.heads = get_heads(self.revisions)
+        self.scripts_by_revision: Dict[str, List[Tuple[str, str]]] = {}
+        for filepath, name, revision in scripts:
+            script_name = os.path.split(filepath)[-1]
+            self.scripts_by_revision.setdefault(revision, []).append((name, script_name))
+
+    def resolve(self, revision: Optional[str]) -> List[str]:
+        """
+        Get the full revision ids for "head", "heads", "base" (or None), a revision id, or
+        a unique prefix of it.
+        """
+
+        if revision in HEADS:
+            return list(self.heads)
+        if revision in ("base", None):
+            return []
+        candidates = [r.revision for r in self.revisions if r.revision.startswith(revision)]
+        if revision in candidates:
+            return [revision]
+        if len(candidates) != 1:
+            problem = "ambiguous" if candidates else "unknown"
+            raise ValueError(f'Revision "{revision}" is {problem}')
+        return candidates
+
+    def get_ordered_revisions(self, revision: Optional[str]) -> List[str]:
+        """Get the revision and all its ancestors, ordered from the revision to base."""
+        next_ = set(self.resolve(revision))
+        result = []
+        for rev in self.revisions:
+            if rev.revision in next_:
+                result.append(rev.revision)
+                next_.discard(rev.revision)
+                if isinstance(rev.down_revision, tuple):
+                    next_.update(rev.down_revision)
+                elif rev.down_revision is not None:
+                    next_.add(rev.down_revision)
+        return result
+
+    def state_at(self, revision: Optional[str]) -> Dict[str, str]:
+        """Get the current revisioned script name of each DDL at the revision, by DDL name."""
+        state: Dict[str, str] = {}
+        for rev in self.get_ordered_revisions(revision):
+            for name, script_name in self.scripts_by_revision.get(rev, ()):
+                state.setdefault(name, script_name)
+        return dict(sorted(state.items()))
+
+    def get_scripts_between(self, rev_a: Optional[str], rev_b: Optional[str]) -> List[str]:
+        """
+        Get the names of the scripts of the revisions, which are applied when upgrading from
+        `rev_a` to `rev_b`, in the order of the upgrade.
+        """
+
+        return [script_name for _, script_name in self._iter_scripts_between(rev_a, rev_b)]
+
+    def get_replacements_between(
+        self, rev_a: Optional[str], rev_b: Optional[str]
+    ) -> Dict[str, Optional[str]]:
+        """
+        Get the scripts between the revisions, which are superseded by a later script of the same
+        DDL in this range. The first script of each DDL is mapped to the last script, which
+        replaces it when upgrading from `rev_a` to `rev_b`, the scripts in between are mapped to
+        None, because they are not needed.
+        """
+
+        scripts: Dict[str, List[str]] = {}
+        for name, script_name in self._iter_scripts_between(rev_a, rev_b):
+            scripts.setdefault(name, []).append(script_name)
+        replacements: Dict[str, Optional[str]] = {}
+        for first, *rest in scripts.values():
+            if rest:
+                replacements[first] = rest[-1]
+                replacements.update((script_name, None) for script_name in rest[:-1])
+        return replacements
+
+    def _iter_scripts_between(
+        self, rev_a: Optional[str], rev_b: Optional[str]
+    ) -> Iterator[Tuple[str, str]]:
+        applied = set(self.get_ordered_revisions(rev_a))
+        for rev in reversed(self.get_ordered_revisions(rev_b)):
+            if rev not in applied:
+                yield from sorted(self.scripts_by_revision.get(rev, ()))
+
+    def diff(self, rev_a: Optional[str], rev_b: Optional[str]) -> List[DDLChange]:
+        """
+        Get the DDLs, which current scripts differ between the revisions. When upgrading from
+        `rev_a` to `rev_b`, these are the DDLs which will be (re-)executed or dropped.
+        """
+
+        before = self.state_at(rev_a)
+        after = self.state_at(rev_b)
+        return [
+            DDLChange(name=name, before=before.get(name), after=after.get(name))
+            for name in sorted(before.keys() | after.keys())
+            if before.get(name) != after.get(name)
+        ]
+
+
+def load_history(config: Config) -> DDLHistory:
+    """
+    Load the DDL history of the alembic project. The revision graph is taken from the revision
+    cache, if it is enabled, so that the migration modules are not imported.
+    """
+
+    dddl_config = load_config(config)
+    script_directory = ScriptDirectory.from_config(config)
+    if dddl_config.revision_cache:
+        cache = RevisionCache(
+            cache_path=dddl_config.revision_cache, script_directory=script_directory
+        )
+        revisions = cache.get_revisions()
+    else:
+        revisions = [
+            CachedRevision(
+                revision=s.revision,
+                down_revision=(
+                    tuple(s.down_revision)
+                    if isinstance(s.down_revision, list)
+                    else s.down_revision
+                ),
+            )
+            for s in script_directory.walk_revisions()
+        ]
+    return DDLHistory(revisions=revisions, scripts=get_storage(dddl_config).iter_scripts())
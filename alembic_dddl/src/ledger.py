@@ -0,0 +1,85 @@
+import hashlib
+import logging
+import weakref
+from datetime import datetime
+from typing import Optional, Sequence
+
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select
+from sqlalchemy.engine import Connection
+
+from alembic_dddl.src.file_format import parse_filename
+
+logger = logging.getLogger(f"alembic.{__name__}")
+
+_ledgers: "weakref.WeakKeyDictionary[MigrationContext, Ledger]" = weakref.WeakKeyDictionary()
+
+
+def content_hash(statements: Sequence[str]) -> str:
+    """Calculate the hash of the script content from its statements."""
+    digest = hashlib.sha256()
+    for statement in statements:
+        digest.update(statement.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_ddl_name(script_name: str) -> str:
+    """Get the DDL name from the revisioned script file name."""
+    match = parse_filename(script_name)
+    return match[0] if match else script_name
+
+
+class Ledger:
+    """
+    A table in the migrated database, which records the hash of the latest executed script for
+    each DDL. It allows to skip the scripts, which content was already applied.
+    """
+
+    def __init__(self, connection: Connection, table_name: str) -> None:
+        self.connection = connection
+        self.table = Table(
+            table_name,
+            MetaData(),
+            Column("name", String(255), primary_key=True),
+            Column("content_hash", String(64), nullable=False),
+            Column("script_name", String(255), nullable=False),
+            Column("applied_at", DateTime, nullable=False),
+        )
+
+    def create_table(self) -> None:
+        self.table.create(self.connection, checkfirst=True)
+
+    def get_hash(self, name: str) -> Optional[str]:
+        """Get the hash of the latest applied content of the DDL, None if it's not recorded."""
+        query = select(self.table.c.content_hash).where(self.table.c.name == name)
+        return self.connection.execute(query).scalar()
+
+    def record(self, name: str, script_name: str, hash: str) -> None:
+        """Save the hash of the applied content of the DDL."""
+        values = {"content_hash": hash, "script_name": script_name, "applied_at": datetime.now()}
+        updated = self.connection.execute(
+            self.table.update().where(self.table.c.name == name).values(**values)
+        )
+        if updated.rowcount == 0:
+            self.connection.execute(self.table.insert().values(name=name, **values))
+
+    def forget(self, name: str) -> None:
+        """Remove the record of the DDL, e.g. when the DDL objects were dropped."""
+        self.connection.execute(self.table.delete().where(self.table.c.name == name))
+
+
+def get_ledger(migration_context: MigrationContext, table_name: str) -> Optional[Ledger]:
+    """
+    Get the ledger for the migration context, creating the table on the first call. Returns None
+    in the offline mode, where the scripts are always rendered.
+    """
+
+    if migration_context.as_sql or migration_context.connection is None:
+        return None
+    ledger = _ledgers.get(migration_context)
+    if ledger is None:
+        ledger = Ledger(connection=migration_context.connection, table_name=table_name)
+        ledger.create_table()
+        _ledgers[migration_context] = ledger
+    return ledger
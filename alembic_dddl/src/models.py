@@ -1,4 +1,11 @@
+import os
 from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from alembic_dddl.src.execution import EXECUTION_MODES, TRANSACTION
+
+if TYPE_CHECKING:
+    from alembic_dddl.src.storage import ScriptStorage
 
 
 @dataclass
@@ -8,17 +15,70 @@ class DDL:
     name: str
     sql: str
     down_sql: str
+    # re-execute only the changed statements when the script changes
+    incremental: bool = False
+    # used to limit autogenerate to a subset of DDLs
+    tags: Tuple[str, ...] = ()
+    # names of the DDLs, which should be created before this one
+    depends_on: Tuple[str, ...] = ()
+    # how the revisioned scripts are executed: "transaction" inside the migration transaction,
+    # "autocommit" without a transaction, "per_statement" or "per_script" in their own
+    # transactions, committed separately from the migration
+    execution_mode: str = TRANSACTION
+
+    def __post_init__(self) -> None:
+        if self.execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"Unsupported execution mode: {self.execution_mode!r}")
+
+
+CSV = "csv"
+JSON = "json"
+
+
+@dataclass
+class DataScript(DDL):
+    """
+    Reference data for a table, kept in a CSV or JSON file. `sql` holds the data: CSV with a
+    header row, or a JSON list of objects. When the data changes, the table content is replaced
+    with the rows of the new revisioned script, loaded in chunks of `chunk_size` rows. The rows
+    are matched by the `key` columns, the primary key of the table by default.
+    """
+
+    table: str = ""
+    format: str = CSV
+    chunk_size: int = 1000
+    # columns identifying the rows, empty to use the primary key of the table
+    key: Tuple[str, ...] = ()
+
+    def __post_init__(self) -> None:
+        super().__post_init__()
+        if not self.table:
+            raise ValueError(f'Table is not set for data script "{self.name}"')
+        if self.format not in (CSV, JSON):
+            raise ValueError(f"Unsupported data format: {self.format!r}")
+        if self.chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        if self.incremental or self.execution_mode != TRANSACTION:
+            raise ValueError("Data scripts are always loaded in the migration transaction")
 
 
 class RevisionedScript:
     """A class representing a single autogenerated DDL file in the revisions directory"""
 
-    def __init__(self, filepath: str, name: str, revision: str) -> None:
+    __slots__ = ("filepath", "name", "revision", "storage")
+
+    def __init__(
+        self, filepath: str, name: str, revision: str, storage: Optional["ScriptStorage"] = None
+    ) -> None:
         self.filepath = filepath
         self.name = name
         self.revision = revision
+        # if storage is not set, the script is read directly from the file
+        self.storage = storage
 
     def read(self) -> str:
+        if self.storage is not None:
+            return self.storage.read(os.path.split(self.filepath)[-1])
         with open(self.filepath) as f:
             contents = f.read()
         return contents
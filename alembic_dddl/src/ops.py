@@ -1,28 +1,74 @@
 import logging
 import os
+import weakref
 from datetime import datetime
-from typing import Union
+from time import perf_counter
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
-import sqlparse
 from alembic.autogenerate import renderers
 from alembic.operations import MigrateOperation, Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy.sql import table
 
-from alembic_dddl.src.config import load_config
-from alembic_dddl.src.models import DDL, RevisionedScript
-from alembic_dddl.src.renderer import (
-    BaseRenderer,
-    DDLRenderer,
-    RevisionedScriptRenderer,
-    SQLRenderer,
+from alembic_dddl.src.config import DDDLConfig, load_config
+from alembic_dddl.src.execution import (
+    AUTOCOMMIT,
+    EXECUTION_MODES,
+    PER_STATEMENT,
+    TRANSACTION,
+    execute_statements,
 )
+from alembic_dddl.src.models import CSV, DDL, DataScript, RevisionedScript
+
+# The operations are registered when env.py imports alembic_dddl, while the modules they use (the
+# storages, the ledger, the timing history, the renderers, etc.) are only needed when the
+# operations run or autogenerate renders them, so they're imported in the functions.
+if TYPE_CHECKING:
+    from sqlalchemy.sql.expression import TableClause
+
+    from alembic_dddl.src.ledger import Ledger
+    from alembic_dddl.src.renderer import BaseRenderer
+    from alembic_dddl.src.storage import ScriptStorage
 
 logger = logging.getLogger(f"alembic.{__name__}")
 
+# alembic config attribute with the scripts replaced in a coalesced export: the first script of a
+# DDL in the exported range is mapped to the last script, the scripts in between to None
+COALESCED_SCRIPTS_ATTRIBUTE = "alembic_dddl_coalesced_scripts"
+
+# final scripts of the squashed DDL history, which ran in place of the first scripts of their DDLs
+# in the migration, so their own next run is skipped
+_replacements: "weakref.WeakKeyDictionary[MigrationContext, Set[str]]" = (
+    weakref.WeakKeyDictionary()
+)
+
 
 @Operations.register_operation("run_ddl_script")
 class RunDDLScriptOp(MigrateOperation):
-    def __init__(self, script_name: str):
+    def __init__(
+        self,
+        script_name: str,
+        statements: Optional[Sequence[int]] = None,
+        mode: str = TRANSACTION,
+        skip_applied: bool = False,
+    ):
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unsupported execution mode: {mode!r}")
         self.script_name = script_name
+        self.statements = statements
+        self.mode = mode
+        self.skip_applied = skip_applied
 
     @classmethod
     def run_ddl_script(cls, operations, script_name, **kw):
@@ -30,6 +76,62 @@ class RunDDLScriptOp(MigrateOperation):
         return operations.invoke(op)
 
 
+@Operations.register_operation("run_ddl_batch")
+class RunDDLBatchOp(MigrateOperation):
+    def __init__(self, script_names: Sequence[str], max_workers: int = 4):
+        self.script_names = script_names
+        self.max_workers = max_workers
+
+    @classmethod
+    def run_ddl_batch(cls, operations, script_names, **kw):
+        op = RunDDLBatchOp(script_names=script_names, **kw)
+        return operations.invoke(op)
+
+
+@Operations.register_operation("load_data_script")
+class LoadDataScriptOp(MigrateOperation):
+    def __init__(
+        self,
+        script_name: str,
+        table: str,
+        format: str = CSV,
+        chunk_size: int = 1000,
+        skip_applied: bool = False,
+        key: Optional[Sequence[str]] = None,
+    ):
+        self.script_name = script_name
+        self.table = table
+        self.format = format
+        self.chunk_size = chunk_size
+        self.skip_applied = skip_applied
+        self.key = key
+
+    @classmethod
+    def load_data_script(cls, operations, script_name, table, **kw):
+        op = LoadDataScriptOp(script_name=script_name, table=table, **kw)
+        return operations.invoke(op)
+
+
+@Operations.register_operation("forget_ddl_script")
+class ForgetDDLScriptOp(MigrateOperation):
+    def __init__(self, ddl_name: str):
+        self.ddl_name = ddl_name
+
+    @classmethod
+    def forget_ddl_script(cls, operations, ddl_name, **kw):
+        op = ForgetDDLScriptOp(ddl_name=ddl_name, **kw)
+        return operations.invoke(op)
+
+
+class DDLBatchError(Exception):
+    """Raised when some of the scripts in a batch failed"""
+
+    def __init__(self, failures: List[Tuple[str, BaseException]]) -> None:
+        self.failures = failures
+        names = ", ".join(name for name, _ in failures)
+        super().__init__(f"{len(failures)} scripts of the batch failed: {names}")
+
+
 Script = Union[DDL, RevisionedScript, str]
 
 
@@ -48,43 +150,669 @@ class SyncDDLOp(MigrateOperation):
         return SyncDDLOp(up_script=self.down_script, down_script=self.up_script, time=self.time)
 
 
+class RebuildDDLOp(MigrateOperation):
+    """
+    Autogenerate operation which re-runs the latest revisioned script of an unchanged DDL, because
+    the DDLs it depends on have changed.
+    """
+
+    def __init__(self, script: RevisionedScript, ddl: Optional[DDL] = None):
+        self.script = script
+        # the DDL of the script, defines how the script is run
+        self.ddl = ddl
+
+    def reverse(self) -> "RebuildDDLOp":
+        return RebuildDDLOp(script=self.script, ddl=self.ddl)
+
+
+GraphOp = Union[SyncDDLOp, RebuildDDLOp]
+
+
+class SyncDDLGraphOp(MigrateOperation):
+    """
+    Autogenerate operation for DDLs with dependencies. It keeps the sync operations of the changed
+    DDLs and the rebuild operations of their dependents, split into batches of independent
+    operations in topological order.
+    """
+
+    def __init__(self, batches: List[List[GraphOp]]):
+        self.batches = batches
+
+    def reverse(self) -> "SyncDDLGraphOp":
+        """
+        The changed DDLs are downgraded in reverse topological order, then the dependents are
+        rebuilt again in topological order.
+        """
+
+        changed: List[List[GraphOp]] = [
+            [op.reverse() for op in batch if isinstance(op, SyncDDLOp)]
+            for batch in reversed(self.batches)
+        ]
+        rebuilds: List[List[GraphOp]] = [
+            [op.reverse() for op in batch if isinstance(op, RebuildDDLOp)]
+            for batch in self.batches
+        ]
+        return SyncDDLGraphOp(batches=[b for b in changed + rebuilds if b])
+
+
+def _load_statements(
+    operations: Operations,
+    config: DDDLConfig,
+    storage: "ScriptStorage",
+    script_name: str,
+    prefetch: bool = True,
+) -> List[str]:
+    """Get the statements of the revisioned script, prefetched if possible."""
+    from alembic_dddl.src.prefetch import get_prefetcher
+    from alembic_dddl.src.sql import split_statements
+
+    statements = None
+    if config.prefetch and prefetch:
+        prefetcher = get_prefetcher(operations.get_context(), storage, config.prefetch_buffer_size)
+        if prefetcher is not None:
+            statements = prefetcher.get(script_name)
+    if statements is None:
+        statements = split_statements(storage.read(script_name))
+    return statements
+
+
+def _load_data(
+    operations: Operations,
+    config: DDDLConfig,
+    storage: "ScriptStorage",
+    script_name: str,
+    prefetch: bool = True,
+) -> str:
+    """Get the source code of the revisioned data script, prefetched if possible."""
+    from alembic_dddl.src.prefetch import get_prefetcher
+
+    data = None
+    if config.prefetch and prefetch:
+        prefetcher = get_prefetcher(operations.get_context(), storage, config.prefetch_buffer_size)
+        if prefetcher is not None:
+            data = prefetcher.get_source(script_name)
+    if data is None:
+        data = storage.read(script_name)
+    return data
+
+
+def _resolve_script(operations: Operations, config: DDDLConfig, script_name: str) -> Optional[str]:
+    """
+    Get the name of the script to run in place of the script, None if it's skipped. In the
+    squashed DDL history and in the range of a coalesced export, the first script of a DDL is
+    replaced with its final script on upgrade, and the scripts in between are skipped, as well as
+    the next run of the final script, which has already been applied in place of the first one.
+
+    Only upgrades resolve the scripts: on downgrade the database is reverted to the state of each
+    revision. If the direction of the migration can't be determined, the script is run as is.
+    """
+
+    from alembic_dddl.src.baseline import get_baseline
+    from alembic_dddl.src.utils import is_upgrade
+
+    migration_context = operations.get_context()
+    if not is_upgrade(migration_context):
+        return script_name
+    applied = _replacements.setdefault(migration_context, set())
+    if script_name in applied:
+        applied.discard(script_name)
+        logger.info(f'Skipping "{script_name}", it already ran in place of its first version')
+        return None
+    baseline = get_baseline(config)
+    coalesced = _get_coalesced_scripts(operations)
+    if baseline is not None and script_name in baseline.superseded:
+        logger.info(f'Skipping "{script_name}", superseded in baseline {baseline.revision}')
+        return None
+    replacement: Optional[str]
+    if baseline is not None and script_name in baseline.replaced:
+        replacement = baseline.replaced[script_name]
+        source = f"baseline {baseline.revision}"
+    elif script_name in coalesced:
+        replacement = coalesced[script_name]
+        source = "the exported range"
+    else:
+        return script_name
+    if replacement is None:
+        logger.info(f'Skipping "{script_name}", superseded in {source}')
+        return None
+    logger.info(
+        f'Running "{replacement}" in place of "{script_name}", its final version in {source}'
+    )
+    applied.add(replacement)
+    return replacement
+
+
+def _get_coalesced_scripts(operations: Operations) -> Dict[str, Optional[str]]:
+    """Get the scripts replaced in a coalesced export, empty otherwise."""
+    alembic_config = operations.get_context().config
+    if alembic_config is None:
+        return {}
+    return alembic_config.attributes.get(COALESCED_SCRIPTS_ATTRIBUTE, {})
+
+
+def _is_predecessor_superseded(
+    operations: Operations, config: DDDLConfig, script_name: str
+) -> bool:
+    """
+    Check if the previous scripts of the DDL were skipped, because the script supersedes them in
+    the baseline or in the range of a coalesced export. Then the changes of the previous scripts
+    were not applied, and the script must be run in full, even if the operation only runs its
+    changed statements.
+    """
+
+    from alembic_dddl.src.baseline import get_baseline
+    from alembic_dddl.src.ledger import get_ddl_name
+    from alembic_dddl.src.utils import is_upgrade
+
+    if not is_upgrade(operations.get_context()):
+        return False
+    ddl_name = get_ddl_name(script_name)
+    baseline = get_baseline(config)
+    if baseline is not None and baseline.scripts.get(ddl_name) == script_name:
+        if any(get_ddl_name(name) == ddl_name for name in baseline.replaced):
+            return True
+    # the exported range only includes the last script of each DDL, it supersedes the others
+    return any(get_ddl_name(name) == ddl_name for name in _get_coalesced_scripts(operations))
+
+
+def _execute_in_mode(
+    operations: Operations,
+    mode: str,
+    script_name: str,
+    statements: Sequence[str],
+    slow_statement_threshold: float,
+    indexes: Optional[Sequence[int]] = None,
+) -> None:
+    """
+    Execute the statements according to the execution mode. In all modes except "transaction" the
+    migration transaction is committed first and the statements run in alembic's autocommit
+    block. In "per_statement" and "per_script" modes they run in their own transactions on a
+    separate connection. In the offline mode these transactions are rendered as BEGIN/COMMIT.
+    """
+
+    def run(execute: Callable[[str], Any]) -> None:
+        execute_statements(
+            execute=execute,
+            script_name=script_name,
+            statements=statements,
+            slow_statement_threshold=slow_statement_threshold,
+            indexes=indexes,
+        )
+
+    if mode == TRANSACTION:
+        run(operations.execute)
+        return
+
+    migration_context = operations.get_context()
+    with migration_context.autocommit_block():
+        if mode == AUTOCOMMIT:
+            run(operations.execute)
+        elif migration_context.as_sql:
+            impl = migration_context.impl
+
+            def execute_in_transaction(statement: str) -> None:
+                impl.emit_begin()
+                operations.execute(statement)
+                impl.emit_commit()
+
+            if mode == PER_STATEMENT:
+                run(execute_in_transaction)
+            else:
+                impl.emit_begin()
+                run(operations.execute)
+                impl.emit_commit()
+        else:
+            with operations.get_bind().engine.connect() as connection:
+
+                def commit_statement(statement: str) -> None:
+                    with connection.begin():
+                        connection.exec_driver_sql(statement)
+
+                if mode == PER_STATEMENT:
+                    run(commit_statement)
+                else:
+                    with connection.begin():
+                        run(connection.exec_driver_sql)
+
+
+def _update_ledger(
+    ledger: "Ledger", ddl_name: str, script_name: str, script_hash: str, skip_applied: bool
+) -> None:
+    """
+    Record the executed script in the ledger. The scripts run by operations without
+    `skip_applied` are not trusted to be tracked until the DDL is dropped, so their DDL is
+    forgotten instead.
+    """
+
+    if skip_applied:
+        ledger.record(name=ddl_name, script_name=script_name, hash=script_hash)
+    else:
+        ledger.forget(ddl_name)
+
+
 @Operations.implementation_for(RunDDLScriptOp)
 def run_ddl_script(operations: Operations, operation: RunDDLScriptOp) -> None:
     """
     Load the revisioned script source code by name and eexecute each statement from it against the
-    database one by one.
+    database one by one. If the operation lists statement indexes, only these statements are
+    executed. If tenants are registered for its DDL, the script is run once for each tenant
+    schema.
+
+    If the ledger is enabled and the operation has `skip_applied` set, the script is skipped when
+    the same content was already applied for this DDL, otherwise its hash is recorded in the
+    ledger after execution. Only the migrations generated with the ledger enabled set
+    `skip_applied`: they also forget the DDL whenever they drop it. Other operations, e.g. the
+    rebuilds of dependents or the migrations generated before the ledger was enabled, always run
+    the script and forget the DDL, because their migrations may drop it without updating the
+    ledger. On upgrade, the scripts of the squashed DDL history are replaced with the final script
+    of their DDL or skipped (see `_resolve_script`), and the final script is run in full.
+
+    The operation mode defines the transactions the statements run in, see `_execute_in_mode`.
+    If the timing history is enabled, the duration of the script is recorded in it.
+    """
+
+    from alembic_dddl.src.ledger import content_hash, get_ddl_name, get_ledger
+    from alembic_dddl.src.storage import get_storage
+    from alembic_dddl.src.tenants import get_fan_out, run_for_tenants
+    from alembic_dddl.src.timings import get_timing_history
+
+    migration_context = operations.get_context()
+    config = load_config(migration_context.config)
+    storage = get_storage(config)
+    script_name = _resolve_script(operations, config, operation.script_name)
+    if script_name is None:
+        return
+
+    replaced = script_name != operation.script_name
+    statements = _load_statements(operations, config, storage, script_name, prefetch=not replaced)
+    ledger = get_ledger(migration_context, config.ledger_table) if config.use_ledger else None
+    if ledger is not None:
+        ddl_name = get_ddl_name(script_name)
+        script_hash = content_hash(statements)
+        if operation.skip_applied and ledger.get_hash(ddl_name) == script_hash:
+            logger.info(f'Skipping "{script_name}", its content is already applied')
+            return
+    indexes = None
+    if operation.statements is not None and not replaced:
+        if _is_predecessor_superseded(operations, config, script_name):
+            logger.info(f'Running "{script_name}" in full, its predecessor was skipped')
+        else:
+            indexes = operation.statements
+            statements = [statements[i] for i in indexes]
+
+    timing_history = get_timing_history(migration_context, config)
+    start = perf_counter()
+    fan_out = get_fan_out(migration_context, script_name)
+    if fan_out is not None:
+        run_for_tenants(
+            operations=operations,
+            fan_out=fan_out,
+            script_name=script_name,
+            statements=statements,
+            slow_statement_threshold=config.slow_statement_threshold,
+            mode=operation.mode,
+            indexes=indexes,
+        )
+    else:
+        _execute_in_mode(
+            operations=operations,
+            mode=operation.mode,
+            script_name=script_name,
+            statements=statements,
+            slow_statement_threshold=config.slow_statement_threshold,
+            indexes=indexes,
+        )
+
+    if timing_history is not None:
+        timing_history.record(script_name, perf_counter() - start)
+    if ledger is not None:
+        _update_ledger(ledger, ddl_name, script_name, script_hash, operation.skip_applied)
+
+
+@Operations.implementation_for(RunDDLBatchOp)
+def run_ddl_batch(operations: Operations, operation: RunDDLBatchOp) -> None:
+    """
+    Run revisioned scripts of independent DDLs concurrently. Each script is executed by a worker
+    thread on a separate connection in its own transaction. The migration transaction is
+    committed first, like in the non-transactional execution modes, so that the workers don't wait
+    for its locks. In the offline mode, or when tenants are registered for any of the DDLs, the
+    scripts are run one by one.
+
+    The batches are rendered for the rebuilds of dependents, so the scripts are always executed
+    and the ledger forgets their DDLs, like `run_ddl_script` without `skip_applied`.
+    """
+
+    from alembic_dddl.src.ledger import get_ddl_name, get_ledger
+    from alembic_dddl.src.storage import get_storage
+    from alembic_dddl.src.tenants import get_fan_out
+    from alembic_dddl.src.timings import get_timing_history
+    from alembic_dddl.src.workers import run_with_connections
+
+    migration_context = operations.get_context()
+    script_names = list(operation.script_names)
+    if (
+        migration_context.as_sql
+        or any(get_fan_out(migration_context, name) is not None for name in script_names)
+        or operation.max_workers < 2
+        or len(script_names) < 2
+    ):
+        for script_name in script_names:
+            operations.invoke(RunDDLScriptOp(script_name=script_name))
+        return
+
+    config = load_config(migration_context.config)
+    storage = get_storage(config)
+    resolved = (_resolve_script(operations, config, name) for name in script_names)
+    script_names = [name for name in resolved if name is not None]
+    scripts = {name: _load_statements(operations, config, storage, name) for name in script_names}
+
+    durations: Dict[str, float] = {}
+
+    def run(connection, script_name: str) -> None:
+        durations[script_name] = execute_statements(
+            execute=connection.exec_driver_sql,
+            script_name=script_name,
+            statements=scripts[script_name],
+            slow_statement_threshold=config.slow_statement_threshold,
+        ).duration
+
+    with migration_context.autocommit_block():
+        failures = run_with_connections(
+            engine=operations.get_bind().engine,
+            items=script_names,
+            max_workers=operation.max_workers,
+            work=run,
+            thread_name="dddl-batch",
+        )
+    for script_name, error in failures:
+        logger.error(f'Script "{script_name}" failed: {error}')
+    if failures:
+        raise DDLBatchError(failures=failures)
+
+    timing_history = get_timing_history(migration_context, config)
+    if timing_history is not None:
+        for script_name in script_names:
+            timing_history.record(script_name, durations[script_name])
+
+    ledger = get_ledger(migration_context, config.ledger_table) if config.use_ledger else None
+    if ledger is not None:
+        for script_name in script_names:
+            ledger.forget(get_ddl_name(script_name))
+
+
+@Operations.implementation_for(LoadDataScriptOp)
+def load_data_script(operations: Operations, operation: LoadDataScriptOp) -> None:
+    """
+    Replace the content of the table with the rows of the revisioned data script. The rows are
+    matched by the `key` columns, or by the primary key of the table: the rows missing from the
+    script are deleted, the other rows are updated or inserted with `executemany` in chunks of
+    `chunk_size` rows. In the offline mode they are rendered one by one.
+
+    Without a key (a table without a primary key, or the offline mode without `key`) all rows are
+    deleted and the rows of the script are inserted. Online, this is refused if other tables have
+    foreign keys to the table.
+
+    Like `run_ddl_script`, the script is replaced or skipped in the squashed DDL history, and, with
+    `skip_applied`, skipped if its content is already applied according to the ledger.
     """
 
-    config = load_config(operations.get_context().config)
-    with open(os.path.join(config.scripts_location, operation.script_name)) as f:
-        source = f.read()
+    from alembic_dddl.src.data import (
+        get_columns,
+        get_primary_key,
+        get_referencing_tables,
+        iter_chunks,
+        parse_rows,
+    )
+    from alembic_dddl.src.ledger import content_hash, get_ddl_name, get_ledger
+    from alembic_dddl.src.storage import get_storage
+    from alembic_dddl.src.timings import get_timing_history
 
-    for statement in sqlparse.split(source):
-        operations.execute(statement)
+    migration_context = operations.get_context()
+    config = load_config(migration_context.config)
+    storage = get_storage(config)
+    script_name = _resolve_script(operations, config, operation.script_name)
+    if script_name is None:
+        return
+
+    replaced = script_name != operation.script_name
+    data = _load_data(operations, config, storage, script_name, prefetch=not replaced)
+    ledger = get_ledger(migration_context, config.ledger_table) if config.use_ledger else None
+    if ledger is not None:
+        ddl_name = get_ddl_name(script_name)
+        script_hash = content_hash([data])
+        if operation.skip_applied and ledger.get_hash(ddl_name) == script_hash:
+            logger.info(f'Skipping "{script_name}", its content is already applied')
+            return
+
+    columns, rows = parse_rows(data, operation.format)
+    schema, _, name = operation.table.rpartition(".")
+    target = table(name, *get_columns(columns, rows), schema=schema or None)
+    if operation.key:
+        key = list(operation.key)
+    elif migration_context.as_sql:
+        key = []
+    else:
+        key = get_primary_key(operations.get_bind(), name, schema or None)
+
+    start = perf_counter()
+    if key:
+        _load_by_key(operations, target, script_name, columns, key, rows, operation.chunk_size)
+    else:
+        if not migration_context.as_sql:
+            referencing = get_referencing_tables(operations.get_bind(), name, schema or None)
+            if referencing:
+                raise ValueError(
+                    f'Can\'t load "{script_name}": {operation.table} has no primary key, but is '
+                    f"referenced by {', '.join(referencing)}, set the key columns of the data"
+                )
+        operations.execute(target.delete())
+        for chunk in iter_chunks(rows, operation.chunk_size):
+            operations.bulk_insert(target, list(chunk))
+    duration = perf_counter() - start
+    logger.info(
+        f'Loaded "{script_name}": {len(rows)} rows into {operation.table} ' f"in {duration:.3f}s"
+    )
+
+    timing_history = get_timing_history(migration_context, config)
+    if timing_history is not None:
+        timing_history.record(script_name, duration)
+    if ledger is not None:
+        _update_ledger(ledger, ddl_name, script_name, script_hash, operation.skip_applied)
+
+
+def _load_by_key(
+    operations: Operations,
+    target: "TableClause",
+    script_name: str,
+    columns: Sequence[str],
+    key: Sequence[str],
+    rows: Sequence[Dict[str, Any]],
+    chunk_size: int,
+) -> None:
+    """
+    Delete the rows of the table missing from the data, then update the rows with the keys of the
+    data and insert the new ones.
+    """
+
+    from alembic_dddl.src.data import (
+        delete_missing,
+        get_params,
+        insert_missing,
+        iter_chunks,
+        update_by_key,
+    )
+
+    missing = [k for k in key if k not in columns]
+    if missing:
+        raise ValueError(f'Data script "{script_name}" has no key columns: {", ".join(missing)}')
+
+    operations.execute(delete_missing(target, key, rows))
+    if operations.get_context().as_sql:
+        for row in rows:
+            update = update_by_key(target, columns, key, row)
+            if update is not None:
+                operations.execute(update)
+            operations.execute(insert_missing(target, columns, key, row))
+        return
+
+    update = update_by_key(target, columns, key)
+    statements = [s for s in (update, insert_missing(target, columns, key)) if s is not None]
+    connection = operations.get_bind()
+    for chunk in iter_chunks(rows, chunk_size):
+        params = get_params(chunk)
+        for statement in statements:
+            connection.execute(statement, params)
+
+
+def _get_script_renderer(
+    script: RevisionedScript, ddl: Optional[DDL], skip_applied: bool = False
+) -> "BaseRenderer":
+    """Get the renderer which runs the revisioned script the way its DDL requires."""
+    from alembic_dddl.src.renderer import (
+        RevisionedDataScriptRenderer,
+        RevisionedScriptRenderer,
+    )
+
+    if isinstance(ddl, DataScript):
+        return RevisionedDataScriptRenderer(
+            script=script, data_script=ddl, skip_applied=skip_applied
+        )
+    if ddl is not None:
+        return RevisionedScriptRenderer(
+            script=script, mode=ddl.execution_mode, skip_applied=skip_applied
+        )
+    return RevisionedScriptRenderer(script=script, skip_applied=skip_applied)
+
+
+@Operations.implementation_for(ForgetDDLScriptOp)
+def forget_ddl_script(operations: Operations, operation: ForgetDDLScriptOp) -> None:
+    """Remove the DDL from the ledger, so that its next script is executed in any case."""
+    from alembic_dddl.src.ledger import get_ledger
+
+    migration_context = operations.get_context()
+    config = load_config(migration_context.config)
+    ledger = get_ledger(migration_context, config.ledger_table) if config.use_ledger else None
+    if ledger is not None:
+        ledger.forget(operation.ddl_name)
 
 
 @renderers.dispatch_for(SyncDDLOp)
 def render_create_ddl(autogen_context, op: SyncDDLOp):
     """
     Render the code of upgrade/downgrade operations for the migration script for the given `op`.
+    With the ledger enabled, the operations skip the scripts which content is already applied.
     """
 
-    renderer: BaseRenderer
+    from alembic_dddl.src.renderer import (
+        DataScriptRenderer,
+        DDLRenderer,
+        IncrementalDDLRenderer,
+        IncrementalRevisionedScriptRenderer,
+        SQLRenderer,
+    )
+    from alembic_dddl.src.storage import get_storage
+
+    renderer: "BaseRenderer"
+    config = load_config(autogen_context.opts["template_args"]["config"])
 
     if isinstance(op.up_script, RevisionedScript):
-        renderer = RevisionedScriptRenderer(script=op.up_script)
+        if isinstance(op.down_script, DDL) and op.down_script.incremental:
+            renderer = IncrementalRevisionedScriptRenderer(
+                script=op.up_script,
+                ddl=op.down_script,
+                ignore_comments=config.ignore_comments,
+                skip_applied=config.use_ledger,
+            )
+        else:
+            renderer = _get_script_renderer(
+                op.up_script,
+                op.down_script if isinstance(op.down_script, DDL) else None,
+                skip_applied=config.use_ledger,
+            )
     elif isinstance(op.up_script, DDL):
-        config = load_config(autogen_context.opts["template_args"]["config"])
         revision = autogen_context.opts["revision_context"].generated_revisions[0].rev_id
-        renderer = DDLRenderer(
-            ddl=op.up_script,
-            scripts_location=config.scripts_location,
-            revision_id=revision,
-            time=op.time,
-            use_timestamps=config.use_timestamps,
-        )
+        if op.up_script.incremental and isinstance(op.down_script, RevisionedScript):
+            renderer = IncrementalDDLRenderer(
+                ddl=op.up_script,
+                previous=op.down_script,
+                scripts_location=config.scripts_location,
+                revision_id=revision,
+                time=op.time,
+                use_timestamps=config.use_timestamps,
+                ignore_comments=config.ignore_comments,
+                storage=get_storage(config),
+                skip_applied=config.use_ledger,
+            )
+        elif isinstance(op.up_script, DataScript):
+            renderer = DataScriptRenderer(
+                ddl=op.up_script,
+                scripts_location=config.scripts_location,
+                revision_id=revision,
+                time=op.time,
+                use_timestamps=config.use_timestamps,
+                storage=get_storage(config),
+                skip_applied=config.use_ledger,
+            )
+        else:
+            renderer = DDLRenderer(
+                ddl=op.up_script,
+                scripts_location=config.scripts_location,
+                revision_id=revision,
+                time=op.time,
+                use_timestamps=config.use_timestamps,
+                storage=get_storage(config),
+                skip_applied=config.use_ledger,
+            )
     elif isinstance(op.up_script, str):
         renderer = SQLRenderer(sql=op.up_script)
+        if isinstance(op.down_script, DDL):
+            # the DDL objects are dropped, the ledger record is not valid anymore. It's rendered
+            # even if the ledger is disabled, in case it's enabled later
+            return f"{renderer.render()}\nop.forget_ddl_script('{op.down_script.name}')"
     else:
         raise ValueError(f"Unsupported up_script: {op.up_script!r}")
     return renderer.render()
+
+
+@renderers.dispatch_for(RebuildDDLOp)
+def render_rebuild_ddl(autogen_context, op: RebuildDDLOp):
+    """
+    Render the code to re-run the latest revisioned script of a dependent DDL. The script may have
+    been dropped with the DDLs it depends on, so it's always executed, regardless of the ledger.
+    """
+
+    return _get_script_renderer(op.script, op.ddl).render()
+
+
+def _is_plain_rebuild(op: RebuildDDLOp) -> bool:
+    """Check if the rebuild runs the script in the migration transaction, so it can be batched."""
+    return op.ddl is None or (
+        not isinstance(op.ddl, DataScript) and op.ddl.execution_mode == TRANSACTION
+    )
+
+
+@renderers.dispatch_for(SyncDDLGraphOp)
+def render_ddl_graph(autogen_context, op: SyncDDLGraphOp):
+    """
+    Render the operations of each batch. If `parallel_batches` is set in the config, the plain
+    rebuilds of the dependents in a batch are merged into a single `run_ddl_batch` operation. The
+    changed DDLs are always rendered as separate operations, in the migration transaction.
+    """
+
+    config = load_config(autogen_context.opts["template_args"]["config"])
+    lines: List[str] = []
+    for batch in op.batches:
+        rebuilds: List[RebuildDDLOp] = []
+        if config.parallel_batches > 1:
+            rebuilds = [o for o in batch if isinstance(o, RebuildDDLOp) and _is_plain_rebuild(o)]
+        if len(rebuilds) < 2:
+            rebuilds = []
+        for batch_op in batch:
+            if batch_op not in rebuilds:
+                lines.append(renderers.dispatch(batch_op)(autogen_context, batch_op))
+        if rebuilds:
+            script_names = [os.path.split(rebuild.script.filepath)[-1] for rebuild in rebuilds]
+            lines.append(
+                f"op.run_ddl_batch({script_names!r}, max_workers={config.parallel_batches})"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,251 @@
+import logging
+import re
+import threading
+import weakref
+from typing import Collection, Dict, List, Optional, Sequence, Tuple, Union
+
+from alembic.runtime.migration import MigrationContext
+
+from alembic_dddl.src.sql import split_statements
+from alembic_dddl.src.storage import ScriptStorage
+from alembic_dddl.src.utils import is_upgrade
+
+logger = logging.getLogger(f"alembic.{__name__}")
+
+_UPGRADE_FUNCTION = re.compile(r"^def upgrade\(.*?(?=^def |\Z)", re.MULTILINE | re.DOTALL)
+_LOAD_DATA_SCRIPT = re.compile(r"""load_data_script\(\s*['"]([^'"]+)['"]""")
+# run_ddl_script and load_data_script calls (group 1), run_ddl_batch calls (group 2)
+_EXECUTED_SCRIPTS = re.compile(
+    r"""(?:run_ddl_script|load_data_script)\(\s*['"]([^'"]+)['"]"""
+    r"""|run_ddl_batch\(\s*[\[(]([^\])]*)[\])]"""
+)
+_SCRIPT_NAME = re.compile(r"""['"]([^'"]+)['"]""")
+
+_prefetchers: "weakref.WeakKeyDictionary[MigrationContext, Optional[ScriptPrefetcher]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class ScriptPrefetcher:
+    """
+    Reads and splits revisioned scripts in a background thread, in the order they are going to be
+    executed. Data scripts (`data_scripts`) are read, but not split into statements. The
+    prefetched scripts are kept in a buffer until they are requested. When the total size of the
+    buffered scripts reaches `max_buffer_size` characters, the thread waits for the scripts to be
+    consumed.
+    """
+
+    def __init__(
+        self,
+        storage: ScriptStorage,
+        script_names: Sequence[str],
+        max_buffer_size: int,
+        data_scripts: Collection[str] = (),
+    ) -> None:
+        self.storage = storage
+        self.script_names = list(script_names)
+        self.max_buffer_size = max_buffer_size
+        self.data_scripts = set(data_scripts)
+
+        self._positions: Dict[str, int] = {}
+        for position, name in enumerate(self.script_names):
+            self._positions.setdefault(name, position)
+
+        # statements of the scripts, or the source code of the data scripts
+        self._buffer: Dict[str, Union[str, List[str]]] = {}
+        self._sizes: Dict[str, int] = {}
+        self._buffer_size = 0
+        # position of the script the thread is going to read next
+        self._producer_position = 0
+        # scripts before this position are not needed anymore
+        self._consumer_position = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="dddl-prefetch", daemon=True)
+
+    def start(self) -> "ScriptPrefetcher":
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Stop the background thread and drop the buffered scripts."""
+        with self._condition:
+            self._closed = True
+            self._buffer.clear()
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+        for position, name in enumerate(self.script_names):
+            with self._condition:
+                while (
+                    not self._closed and self._buffer and self._buffer_size >= self.max_buffer_size
+                ):
+                    self._condition.wait()
+                if self._closed:
+                    return
+                self._producer_position = position
+                if position < self._consumer_position:
+                    continue
+
+            content: Union[str, List[str], None]
+            try:
+                source = self.storage.read(name)
+                content = source if name in self.data_scripts else split_statements(source)
+            except Exception as e:
+                # the script will be loaded again synchronously and the error will surface there
+                logger.debug(f'Failed to prefetch "{name}": {e}')
+                source, content = "", None
+
+            with self._condition:
+                if content is not None and position >= self._consumer_position:
+                    self._buffer[name] = content
+                    self._sizes[name] = len(source)
+                    self._buffer_size += len(source)
+                self._producer_position = position + 1
+                self._condition.notify_all()
+
+        with self._condition:
+            self._producer_position = len(self.script_names)
+            self._condition.notify_all()
+
+    def _drop(self, name: str) -> Union[str, List[str], None]:
+        """Remove the script from the buffer and return its content."""
+        content = self._buffer.pop(name, None)
+        self._buffer_size -= self._sizes.pop(name, 0)
+        return content
+
+    def get(self, script_name: str) -> Optional[List[str]]:
+        """
+        Get the statements of the script, waiting for the background thread to read it if needed.
+        Returns None if the script is not going to be prefetched, so it should be loaded directly.
+        """
+
+        content = self._take(script_name)
+        return content if isinstance(content, list) else None
+
+    def get_source(self, script_name: str) -> Optional[str]:
+        """
+        Get the source code of the data script, waiting for the background thread to read it if
+        needed. Returns None if the script is not going to be prefetched.
+        """
+
+        content = self._take(script_name)
+        return content if isinstance(content, str) else None
+
+    def _take(self, script_name: str) -> Union[str, List[str], None]:
+        """Take the content of the script from the buffer, waiting for it if needed."""
+
+        position = self._positions.get(script_name)
+        if position is None:
+            return None
+
+        with self._condition:
+            # the scripts planned before this one were skipped, they won't be needed
+            for skipped in self.script_names[self._consumer_position : position]:
+                self._drop(skipped)
+            self._consumer_position = max(self._consumer_position, position)
+            self._condition.notify_all()
+
+            while (
+                not self._closed
+                and script_name not in self._buffer
+                and self._producer_position <= position
+            ):
+                self._condition.wait()
+            self._consumer_position = max(self._consumer_position, position + 1)
+            return self._drop(script_name)
+
+
+def _read_upgrade_function(revision_path: str) -> Optional[str]:
+    try:
+        with open(revision_path) as f:
+            source = f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+    match = _UPGRADE_FUNCTION.search(source)
+    return match.group(0) if match else None
+
+
+def find_executed_scripts(revision_path: str) -> List[str]:
+    """
+    Find the names of all revisioned scripts executed by the `upgrade` function of the revision
+    file, in the order of execution: scripts run on their own or in batches, and data scripts.
+    """
+
+    upgrade = _read_upgrade_function(revision_path)
+    if upgrade is None:
+        return []
+    result = []
+    for match in _EXECUTED_SCRIPTS.finditer(upgrade):
+        if match.group(1) is not None:
+            result.append(match.group(1))
+        else:
+            result.extend(_SCRIPT_NAME.findall(match.group(2)))
+    return result
+
+
+def find_data_scripts(revision_path: str) -> List[str]:
+    """Find the names of data scripts loaded by the `upgrade` function of the revision file."""
+    upgrade = _read_upgrade_function(revision_path)
+    if upgrade is None:
+        return []
+    return _LOAD_DATA_SCRIPT.findall(upgrade)
+
+
+def plan_upgrade_scripts(migration_context: MigrationContext) -> List[Tuple[str, bool]]:
+    """
+    Get the revisioned scripts which will be executed by the current upgrade, in the order of
+    execution: scripts run on their own or in batches, and data scripts. Each script is returned
+    as a tuple of its name and whether it's a data script. Returns an empty list for downgrades,
+    or if the direction of the migration can't be determined.
+    """
+
+    script_directory = migration_context.script
+    environment_context = migration_context.environment_context
+    if script_directory is None or environment_context is None:
+        return []
+    if not is_upgrade(migration_context):
+        return []
+
+    destination = environment_context.get_revision_argument()
+    current = migration_context.get_current_heads() or None
+    revisions = list(script_directory.iterate_revisions(destination, current))
+
+    result: List[Tuple[str, bool]] = []
+    for revision in reversed(revisions):
+        data_scripts = set(find_data_scripts(revision.path))
+        result.extend(
+            (name, name in data_scripts) for name in find_executed_scripts(revision.path)
+        )
+    return result
+
+
+def get_prefetcher(
+    migration_context: MigrationContext, storage: ScriptStorage, max_buffer_size: int
+) -> Optional[ScriptPrefetcher]:
+    """
+    Get the prefetcher for the migration context, starting it on the first call. Returns None if
+    the scripts can't be prefetched for this migration.
+    """
+
+    if migration_context in _prefetchers:
+        return _prefetchers[migration_context]
+
+    prefetcher = None
+    try:
+        planned = plan_upgrade_scripts(migration_context)
+    except Exception as e:
+        logger.debug(f"Revisioned scripts won't be prefetched: {e}")
+        planned = []
+
+    if planned:
+        logger.debug(f"Prefetching {len(planned)} revisioned scripts")
+        prefetcher = ScriptPrefetcher(
+            storage=storage,
+            script_names=[name for name, _ in planned],
+            max_buffer_size=max_buffer_size,
+            data_scripts=[name for name, is_data in planned if is_data],
+        ).start()
+        weakref.finalize(migration_context, prefetcher.close)
+    _prefetchers[migration_context] = prefetcher
+    return prefetcher
@@ -1,12 +1,14 @@
 import os
 from abc import ABC, abstractmethod
 from datetime import datetime
+from typing import List, Optional, Sequence
 
-import sqlparse
-
+from alembic_dddl.src.execution import TRANSACTION
 from alembic_dddl.src.file_format import DateTimeFileFormat, TimestampedFileFormat
-from alembic_dddl.src.models import DDL, RevisionedScript
-from alembic_dddl.src.utils import ensure_dir, escape_quotes
+from alembic_dddl.src.models import DDL, DataScript, RevisionedScript
+from alembic_dddl.src.sql import StatementsDiff, diff_statements, split_statements
+from alembic_dddl.src.storage import DirectoryStorage, ScriptStorage
+from alembic_dddl.src.utils import escape_quotes
 
 
 class BaseRenderer(ABC):
@@ -17,16 +19,65 @@ class BaseRenderer(ABC):
         """Generate the code for the migration script"""
 
 
+def render_run_ddl_script(
+    script_name: str,
+    statements: Optional[Sequence[int]] = None,
+    mode: str = TRANSACTION,
+    skip_applied: bool = False,
+) -> str:
+    """Generate the `run_ddl_script` operation, omitting the default arguments."""
+    args = [f"'{script_name}'"]
+    if statements is not None:
+        args.append(f"statements={list(statements)!r}")
+    if mode != TRANSACTION:
+        args.append(f"mode={mode!r}")
+    if skip_applied:
+        args.append("skip_applied=True")
+    return f"op.run_ddl_script({', '.join(args)})"
+
+
+def render_load_data_script(
+    script_name: str, data_script: DataScript, skip_applied: bool = False
+) -> str:
+    """Generate the `load_data_script` operation with the loading settings of the data script."""
+    return (
+        f"op.load_data_script('{script_name}', table={data_script.table!r}, "
+        f"format={data_script.format!r}, chunk_size={data_script.chunk_size}"
+        f"{f', key={list(data_script.key)!r}' if data_script.key else ''}"
+        f"{', skip_applied=True' if skip_applied else ''})"
+    )
+
+
 class RevisionedScriptRenderer(BaseRenderer):
     """Renderer for RevisionedScript. This will be used to generate downgrade commands."""
 
-    def __init__(self, script: RevisionedScript) -> None:
+    def __init__(
+        self, script: RevisionedScript, mode: str = TRANSACTION, skip_applied: bool = False
+    ) -> None:
         self.script = script
+        self.mode = mode
+        self.skip_applied = skip_applied
 
     def render(self) -> str:
         """Generate code to run the revisioned script"""
         script_name = os.path.split(self.script.filepath)[-1]
-        return f"op.run_ddl_script('{script_name}')"
+        return render_run_ddl_script(script_name, mode=self.mode, skip_applied=self.skip_applied)
+
+
+def render_incremental(
+    script_name: str, diff: StatementsDiff, mode: str = TRANSACTION, skip_applied: bool = False
+) -> str:
+    """Generate code to drop the removed objects and run only the changed statements."""
+    lines: List[str] = []
+    if diff.drops:
+        lines.append(SQLRenderer(sql="\n".join(diff.drops)).render())
+    if diff.changed:
+        lines.append(
+            render_run_ddl_script(
+                script_name, statements=diff.changed, mode=mode, skip_applied=skip_applied
+            )
+        )
+    return "\n".join(lines) or "pass"
 
 
 class SQLRenderer(BaseRenderer):
@@ -46,7 +97,7 @@ class SQLRenderer(BaseRenderer):
         """
 
         statements = []
-        for script in sqlparse.split(self.sql):
+        for script in split_statements(self.sql):
             if "\n" in script:
                 quoted_script = f"'''{script}'''"
             else:
@@ -68,12 +119,35 @@ class DDLRenderer(BaseRenderer):
         revision_id: str,
         time: datetime,
         use_timestamps: bool,
+        storage: Optional[ScriptStorage] = None,
+        skip_applied: bool = False,
     ) -> None:
         self.scripts_location = scripts_location
         self.ddl = ddl
         self.revision_id = revision_id
         self.time = time
         self.file_formatter = TimestampedFileFormat if use_timestamps else DateTimeFileFormat
+        self.storage = storage or DirectoryStorage(scripts_location)
+        # render the operations which skip the script if its content is already applied
+        self.skip_applied = skip_applied
+
+    def save_script(self) -> str:
+        """
+        Create a script file for this revision of DDL and save it in the scripts storage. Return
+        the name of the created file.
+        """
+
+        out_filename = self.file_formatter.generate_filename(
+            name=self.ddl.name, revision=self.revision_id, time=self.time
+        )
+        self.storage.write(
+            script_name=out_filename,
+            name=self.ddl.name,
+            revision=self.revision_id,
+            time=self.time,
+            sql=self.ddl.sql,
+        )
+        return out_filename
 
     def render(self) -> str:
         """
@@ -81,12 +155,138 @@ class DDLRenderer(BaseRenderer):
         the `run_ddl_script` operation for the created script file.
         """
 
-        ensure_dir(self.scripts_location)
-        out_filename = self.file_formatter.generate_filename(
-            name=self.ddl.name, revision=self.revision_id, time=self.time
+        out_filename = self.save_script()
+        return render_run_ddl_script(
+            out_filename, mode=self.ddl.execution_mode, skip_applied=self.skip_applied
         )
-        out_path = os.path.join(self.scripts_location, out_filename)
-        with open(out_path, "w") as f:
-            f.write(self.ddl.sql)
 
-        return f"op.run_ddl_script('{out_filename}')"
+
+class IncrementalDDLRenderer(DDLRenderer):
+    """
+    Renderer for changed incremental DDL objects. Like DDLRenderer, it creates the revisioned
+    script file, but the upgrade commands only execute the statements which were changed since the
+    previous revision and drop the objects which were removed.
+    """
+
+    def __init__(
+        self,
+        ddl: DDL,
+        previous: RevisionedScript,
+        scripts_location: str,
+        revision_id: str,
+        time: datetime,
+        use_timestamps: bool,
+        ignore_comments: bool,
+        storage: Optional[ScriptStorage] = None,
+        skip_applied: bool = False,
+    ) -> None:
+        super().__init__(
+            ddl=ddl,
+            scripts_location=scripts_location,
+            revision_id=revision_id,
+            time=time,
+            use_timestamps=use_timestamps,
+            storage=storage,
+            skip_applied=skip_applied,
+        )
+        self.previous = previous
+        self.ignore_comments = ignore_comments
+
+    def render(self) -> str:
+        """
+        Create a script file for this revision of DDL and render the commands to apply the
+        difference with the previous revision. If the difference can't be applied statement by
+        statement, the whole script is executed.
+        """
+
+        out_filename = self.save_script()
+        diff: Optional[StatementsDiff] = diff_statements(
+            old=self.previous.read(), new=self.ddl.sql, strip_comments=self.ignore_comments
+        )
+        if diff is None:
+            return render_run_ddl_script(
+                out_filename, mode=self.ddl.execution_mode, skip_applied=self.skip_applied
+            )
+        return render_incremental(
+            out_filename, diff, mode=self.ddl.execution_mode, skip_applied=self.skip_applied
+        )
+
+
+class IncrementalRevisionedScriptRenderer(RevisionedScriptRenderer):
+    """
+    Renderer for RevisionedScript of an incremental DDL. Used to generate downgrade commands which
+    only re-execute the statements which were changed in the upgrade.
+    """
+
+    def __init__(
+        self,
+        script: RevisionedScript,
+        ddl: DDL,
+        ignore_comments: bool,
+        skip_applied: bool = False,
+    ) -> None:
+        super().__init__(script=script, mode=ddl.execution_mode, skip_applied=skip_applied)
+        self.ddl = ddl
+        self.ignore_comments = ignore_comments
+
+    def render(self) -> str:
+        """Generate code to revert the difference between the DDL and the revisioned script."""
+        diff = diff_statements(
+            old=self.ddl.sql, new=self.script.read(), strip_comments=self.ignore_comments
+        )
+        if diff is None:
+            return super().render()
+        return render_incremental(
+            os.path.split(self.script.filepath)[-1],
+            diff,
+            mode=self.ddl.execution_mode,
+            skip_applied=self.skip_applied,
+        )
+
+
+class DataScriptRenderer(DDLRenderer):
+    """
+    Renderer for data scripts. Like DDLRenderer, it creates the revisioned script file, but the
+    upgrade commands load its rows into the table.
+    """
+
+    def __init__(
+        self,
+        ddl: DataScript,
+        scripts_location: str,
+        revision_id: str,
+        time: datetime,
+        use_timestamps: bool,
+        storage: Optional[ScriptStorage] = None,
+        skip_applied: bool = False,
+    ) -> None:
+        super().__init__(
+            ddl=ddl,
+            scripts_location=scripts_location,
+            revision_id=revision_id,
+            time=time,
+            use_timestamps=use_timestamps,
+            storage=storage,
+            skip_applied=skip_applied,
+        )
+        self.data_script = ddl
+
+    def render(self) -> str:
+        """Create a script file for this revision of data and render the command to load it."""
+        out_filename = self.save_script()
+        return render_load_data_script(out_filename, self.data_script, self.skip_applied)
+
+
+class RevisionedDataScriptRenderer(RevisionedScriptRenderer):
+    """Renderer for RevisionedScript of a data script. Used to reload the previous data."""
+
+    def __init__(
+        self, script: RevisionedScript, data_script: DataScript, skip_applied: bool = False
+    ) -> None:
+        super().__init__(script=script, skip_applied=skip_applied)
+        self.data_script = data_script
+
+    def render(self) -> str:
+        """Generate code to load the revisioned data script"""
+        script_name = os.path.split(self.script.filepath)[-1]
+        return render_load_data_script(script_name, self.data_script, self.skip_applied)
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import os
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from alembic.script import ScriptDirectory
+
+from alembic_dddl.src.utils import ensure_dir
+
+if TYPE_CHECKING:
+    from alembic_dddl.src.storage import ScriptStorage
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 2
+
+DownRevision = Union[str, Tuple[str, ...], None]
+# (filepath, name) of the revisioned scripts introduced in a revision
+RevisionScripts = Tuple[Tuple[str, str], ...]
+
+
+class CachedRevision(NamedTuple):
+    """
+    A lightweight copy of alembic's Script, holding the revision graph edges and the revisioned
+    scripts introduced in the revision, None if the scripts are not cached.
+    """
+
+    revision: str
+    down_revision: DownRevision
+    scripts: Optional[RevisionScripts] = None
+
+
+def _as_down_revision(down_revision: Union[DownRevision, List[str]]) -> DownRevision:
+    """Merge points may be stored as lists (e.g. in JSON), convert them into tuples."""
+    if isinstance(down_revision, list):
+        return tuple(down_revision)
+    return down_revision
+
+
+class RevisionCache:
+    """
+    A persisted copy of the revision graph. The cache is stored as a JSON file and is invalidated
+    when the listing of the versions directories (file names, sizes or mtimes) changes, so on
+    a cache hit the migration modules are not imported at all.
+
+    If the `storage` is passed, the revisioned scripts of each revision are cached too, so that
+    the storage doesn't need to be listed. Then the cache is also invalidated when the storage
+    fingerprint changes, the scripts are not cached if the storage doesn't have a fingerprint.
+    """
+
+    def __init__(
+        self,
+        cache_path: str,
+        script_directory: ScriptDirectory,
+        storage: Optional["ScriptStorage"] = None,
+    ) -> None:
+        self.cache_path = cache_path
+        self.script_directory = script_directory
+        self.storage = storage
+
+    def _get_version_locations(self) -> List[str]:
+        """Get the list of directories, where alembic looks for the revision files."""
+        locations = getattr(self.script_directory, "version_locations", None)
+        if locations:
+            return [str(loc) for loc in locations]
+        return [os.path.join(self.script_directory.dir, "versions")]
+
+    def _iter_version_files(self, location: str) -> Iterator[os.DirEntry]:
+        """Yield entries for all files in the version location, respecting recursive option."""
+        recursive = getattr(self.script_directory, "recursive_version_locations", False)
+        if not os.path.isdir(location):
+            return
+        with os.scandir(location) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    yield entry
+                elif recursive and entry.is_dir() and not entry.name.startswith("__pycache__"):
+                    yield from self._iter_version_files(entry.path)
+
+    def fingerprint(self) -> str:
+        """
+        Calculate a fingerprint of the versions directories listing and of the scripts storage.
+        Only file metadata is used, the files are not read.
+        """
+
+        listing = []
+        for location in self._get_version_locations():
+            for entry in self._iter_version_files(location):
+                stat = entry.stat()
+                listing.append(f"{entry.path}:{stat.st_size}:{stat.st_mtime_ns}")
+        listing.sort()
+        storage_fingerprint = self._get_storage_fingerprint()
+        if storage_fingerprint is not None:
+            listing.append(f"scripts:{storage_fingerprint}")
+        return hashlib.sha1("\n".join(listing).encode()).hexdigest()
+
+    def _get_storage_fingerprint(self) -> Optional[str]:
+        return self.storage.fingerprint() if self.storage is not None else None
+
+    def load(self, fingerprint: str) -> Optional[List[CachedRevision]]:
+        """Load the revision graph from the cache file if it is still valid, otherwise None."""
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("version") != CACHE_FORMAT_VERSION or data.get("fingerprint") != fingerprint:
+            logger.debug("Revision cache is outdated")
+            return None
+
+        return [
+            CachedRevision(
+                revision=rev,
+                down_revision=_as_down_revision(down),
+                scripts=tuple(tuple(s) for s in scripts) if scripts is not None else None,
+            )
+            for rev, down, scripts in data["revisions"]
+        ]
+
+    def save(self, fingerprint: str, revisions: List[CachedRevision]) -> None:
+        """Save the revision graph into the cache file."""
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir:
+            ensure_dir(cache_dir)
+        data = {
+            "version": CACHE_FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "revisions": [[r.revision, r.down_revision, r.scripts] for r in revisions],
+        }
+        with open(self.cache_path, "w") as f:
+            json.dump(data, f)
+
+    def _get_scripts(self) -> Optional[Dict[str, RevisionScripts]]:
+        """Get the revisioned scripts of each revision from the storage, if they can be cached."""
+        if self.storage is None or self._get_storage_fingerprint() is None:
+            return None
+        scripts: Dict[str, List[Tuple[str, str]]] = {}
+        for filepath, name, revision in self.storage.iter_scripts():
+            scripts.setdefault(revision, []).append((filepath, name))
+        return {revision: tuple(sorted(entries)) for revision, entries in scripts.items()}
+
+    def get_revisions(self) -> List[CachedRevision]:
+        """
+        Get the list of revisions ordered from heads to base, the same way alembic's
+        `walk_revisions` does. The cached version is used if it's still valid, otherwise the
+        revisions are loaded by alembic and the cache is updated.
+        """
+
+        fingerprint = self.fingerprint()
+        revisions = self.load(fingerprint)
+        if revisions is not None:
+            logger.debug(f"Loaded {len(revisions)} revisions from cache")
+            return revisions
+
+        scripts = self._get_scripts()
+        revisions = [
+            CachedRevision(
+                revision=s.revision,
+                down_revision=_as_down_revision(s.down_revision),
+                scripts=scripts.get(s.revision, ()) if scripts is not None else None,
+            )
+            for s in self.script_directory.walk_revisions()
+        ]
+        self.save(fingerprint, revisions)
+        return revisions
+
+
+def get_scripts_by_revision(
+    revisions: List[CachedRevision],
+) -> Optional[Dict[str, RevisionScripts]]:
+    """Get the cached revisioned scripts of each revision, None if they are not cached."""
+    if any(r.scripts is None for r in revisions):
+        return None
+    return {r.revision: r.scripts for r in revisions if r.scripts}
+
+
+def get_heads(revisions: List[CachedRevision]) -> List[str]:
+    """Get the revisions which are not a down revision of any other revision."""
+    parents: Set[str] = set()
+    for rev in revisions:
+        if isinstance(rev.down_revision, tuple):
+            parents.update(rev.down_revision)
+        elif rev.down_revision is not None:
+            parents.add(rev.down_revision)
+    return [r.revision for r in revisions if r.revision not in parents]
@@ -0,0 +1,67 @@
+import os
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from typing import Dict, Optional, Tuple
+
+from alembic.config import Config
+
+from alembic_dddl.src.models import DDL
+
+SCOPE_ARGUMENT = "dddl_scope"
+TAGS_ARGUMENT = "dddl_tags"
+SCOPE_ENV_VAR = "ALEMBIC_DDDL_SCOPE"
+TAGS_ENV_VAR = "ALEMBIC_DDDL_TAGS"
+
+
+def _split(value: Optional[str]) -> Tuple[str, ...]:
+    """Split a comma-separated list of values."""
+    if not value:
+        return ()
+    return tuple(v.strip() for v in value.split(",") if v.strip())
+
+
+def _get_x_arguments(alembic_config: Config) -> Dict[str, str]:
+    """Get the `-x key=value` arguments of the alembic command as a dictionary."""
+    cmd_opts = getattr(alembic_config, "cmd_opts", None)
+    x_args = getattr(cmd_opts, "x", None) or []
+    result = {}
+    for arg in x_args:
+        if "=" in arg:
+            key, value = arg.split("=", 1)
+            result[key.strip()] = value
+    return result
+
+
+@dataclass(frozen=True)
+class DDLScope:
+    """
+    Limits autogenerate to a subset of registered DDLs, selected by name glob patterns and/or by
+    tags. If both are set, the DDL must match a pattern and have one of the tags.
+    """
+
+    patterns: Tuple[str, ...] = ()
+    tags: Tuple[str, ...] = ()
+
+    @property
+    def is_limited(self) -> bool:
+        return bool(self.patterns or self.tags)
+
+    def matches(self, ddl: DDL) -> bool:
+        """Check if the DDL is inside the scope."""
+        if self.patterns and not any(fnmatchcase(ddl.name, p) for p in self.patterns):
+            return False
+        if self.tags and not set(self.tags).intersection(ddl.tags):
+            return False
+        return True
+
+    @classmethod
+    def from_config(cls, alembic_config: Config) -> "DDLScope":
+        """
+        Get the scope from `-x dddl_scope=...` and `-x dddl_tags=...` arguments of the alembic
+        command, or from ALEMBIC_DDDL_SCOPE and ALEMBIC_DDDL_TAGS environment variables.
+        """
+
+        x_args = _get_x_arguments(alembic_config)
+        patterns = x_args.get(SCOPE_ARGUMENT, os.environ.get(SCOPE_ENV_VAR))
+        tags = x_args.get(TAGS_ARGUMENT, os.environ.get(TAGS_ENV_VAR))
+        return cls(patterns=_split(patterns), tags=_split(tags))
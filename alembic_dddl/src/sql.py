@@ -0,0 +1,208 @@
+"""
+Helpers for parsing SQL scripts. sqlparse is imported lazily, so that it is only loaded when
+scripts are actually compared or executed, not on each `env.py` import.
+"""
+
+import hashlib
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split the SQL script into separate statements."""
+    import sqlparse
+
+    return sqlparse.split(sql)
+
+
+_FORMAT_OPTIONS: Dict[str, Any] = dict(
+    reindent_aligned=True,
+    keyword_case="upper",
+    identifier_case="lower",
+    use_space_around_operators=True,
+)
+
+
+# normalized scripts keyed on the script hash, while a `normalize_cache` block is active
+_normalize_cache: ContextVar[Optional[Dict[Tuple[bytes, bool], str]]] = ContextVar(
+    "alembic_dddl_normalize_cache", default=None
+)
+
+
+@contextmanager
+def normalize_cache() -> Iterator[None]:
+    """
+    Cache the results of `normalize` inside the block, e.g. for one check run, where the same
+    scripts are often compared several times. The cache is dropped when the block exits. Threads
+    share the cache only if they run in a copy of the current context.
+    """
+
+    token = _normalize_cache.set({})
+    try:
+        yield
+    finally:
+        _normalize_cache.reset(token)
+
+
+def normalize(sql: str, strip_comments: bool) -> str:
+    """
+    Reformat the SQL script so that formatting differences don't affect comparison. Inside a
+    `normalize_cache` block the results are cached.
+    """
+    import sqlparse
+
+    cache = _normalize_cache.get()
+    if cache is None:
+        return sqlparse.format(sql.strip(), strip_comments=strip_comments, **_FORMAT_OPTIONS)
+
+    key = (hashlib.sha1(sql.encode()).digest(), strip_comments)
+    normalized = cache.get(key)
+    if normalized is None:
+        normalized = sqlparse.format(sql.strip(), strip_comments=strip_comments, **_FORMAT_OPTIONS)
+        cache[key] = normalized
+    return normalized
+
+
+def iter_normalized_statements(sql: str, strip_comments: bool) -> Iterator[str]:
+    """
+    Lazily reformat the SQL script statement by statement. The statements are formatted the same
+    way as `normalize` does, and joined together they are exactly the result of `normalize`.
+    """
+
+    from sqlparse import engine, filters, formatter
+
+    options = formatter.validate_options({"strip_comments": strip_comments, **_FORMAT_OPTIONS})
+    stack = formatter.build_filter_stack(engine.FilterStack(), options)
+    stack.postprocess.append(filters.SerializerUnicode())
+    yield from stack.run(sql.strip())
+
+
+def normalized_differ(one: str, two: str, strip_comments: bool) -> bool:
+    """
+    Compare two scripts the same way as their `normalize` results are compared, but lazily: the
+    scripts are reformatted one statement at a time and the comparison stops at the first
+    difference.
+    """
+
+    ones = iter_normalized_statements(one, strip_comments)
+    twos = iter_normalized_statements(two, strip_comments)
+    # the parts of the formatted scripts, which are not compared yet
+    head_one = head_two = ""
+    while True:
+        statements = ones if len(head_one) <= len(head_two) else twos
+        statement = next(statements, None)
+        if statement is None:
+            break
+        if statements is ones:
+            head_one += statement
+        else:
+            head_two += statement
+        common = min(len(head_one), len(head_two))
+        if head_one[:common] != head_two[:common]:
+            return True
+        head_one, head_two = head_one[common:], head_two[common:]
+    return bool(head_one or head_two) or any(ones) or any(twos)
+
+
+_LEADING_COMMENTS = re.compile(r"^(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/)*", re.DOTALL)
+
+_CREATE_PATTERN = re.compile(
+    r"CREATE\s+(?P<replace>OR\s+REPLACE\s+)?(?P<kind>(?:MATERIALIZED\s+)?VIEW|FUNCTION|PROCEDURE)"
+    r"\s+(?:IF\s+NOT\s+EXISTS\s+)?(?P<name>(?:\"[^\"]+\"|[\w$]+)(?:\.(?:\"[^\"]+\"|[\w$]+))?)",
+    re.IGNORECASE,
+)
+
+
+def _get_arguments(sql: str) -> Optional[str]:
+    """Get the parenthesized argument list from the beginning of `sql`, or None."""
+    if not sql.startswith("("):
+        return None
+    depth = 0
+    for pos, char in enumerate(sql):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return sql[: pos + 1]
+    return None
+
+
+def get_drop_statement(statement: str) -> Optional[str]:
+    """
+    Generate the statement which drops the object created by `statement`. Only views,
+    materialized views, functions and procedures are supported. If the object can't be
+    recognized, None is returned.
+    """
+
+    sql = _LEADING_COMMENTS.sub("", statement, count=1)
+    match = _CREATE_PATTERN.match(sql)
+    if not match:
+        return None
+    kind = " ".join(match["kind"].upper().split())
+    name = match["name"]
+    if kind in ("FUNCTION", "PROCEDURE"):
+        arguments = _get_arguments(sql[match.end() :].lstrip())
+        if arguments is None:
+            return None
+        name += arguments
+    return f"DROP {kind} IF EXISTS {name};"
+
+
+def _is_replaceable(statement: str) -> bool:
+    """Check if the statement is `CREATE OR REPLACE` and can be safely re-executed."""
+    match = _CREATE_PATTERN.match(_LEADING_COMMENTS.sub("", statement, count=1))
+    return bool(match and match["replace"])
+
+
+@dataclass
+class StatementsDiff:
+    """Statement level difference between two versions of a script"""
+
+    # indexes of the new script statements which were added or changed
+    changed: List[int]
+    # statements which drop the objects, removed in the new script
+    drops: List[str]
+
+
+def diff_statements(old: str, new: str, strip_comments: bool) -> Optional[StatementsDiff]:
+    """
+    Compare two versions of a script statement by statement, ignoring formatting.
+
+    A statement from the old script, which is not present in the new one, is considered changed
+    if the new script creates the same object, otherwise it is considered removed and its object
+    has to be dropped.
+
+    Returns:
+        The difference between the scripts, or None if the whole new script should be executed
+        instead: when some of the removed statements can't be undone by a drop statement, or some
+        of the changed statements can't be re-executed on their own.
+    """
+
+    new_norm = [normalize(s, strip_comments) for s in split_statements(new)]
+    new_set = set(new_norm)
+    new_objects = {get_drop_statement(n) for n in new_norm} - {None}
+
+    old_set = set()
+    old_removed: Dict[str, str] = {}
+    for statement in split_statements(old):
+        norm = normalize(statement, strip_comments)
+        old_set.add(norm)
+        if norm not in new_set:
+            old_removed[norm] = statement
+
+    drops = []
+    for norm, statement in old_removed.items():
+        drop = get_drop_statement(statement)
+        if drop is None:
+            return None
+        if get_drop_statement(norm) not in new_objects:
+            drops.append(drop)
+
+    changed = [i for i, n in enumerate(new_norm) if n not in old_set]
+    if not all(_is_replaceable(new_norm[i]) for i in changed):
+        return None
+    return StatementsDiff(changed=changed, drops=drops)
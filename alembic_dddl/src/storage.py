@@ -0,0 +1,475 @@
+import hashlib
+import json
+import os
+import sqlite3
+import zipfile
+from abc import ABC, abstractmethod
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Collection, Iterable, Iterator, List, Optional, Tuple
+
+from alembic_dddl.src.config import DDDLConfig
+from alembic_dddl.src.file_format import parse_filename, parse_time
+from alembic_dddl.src.models import RevisionedScript
+from alembic_dddl.src.utils import ensure_dir
+
+# (filepath, name, revision)
+ScriptEntry = Tuple[str, str, str]
+
+# index of the revisioned scripts, saved in the scripts directory before packaging
+INDEX_FILENAME = "index.json"
+INDEX_FORMAT_VERSION = 1
+
+# layouts of the directory storage
+FLAT = "flat"
+BY_NAME = "by_name"
+BY_YEAR = "by_year"
+LAYOUTS = (FLAT, BY_NAME, BY_YEAR)
+
+
+class ReadOnlyStorageError(Exception):
+    """Raised when trying to write or delete revisioned scripts in a read-only storage"""
+
+
+def get_shard(script_name: str, layout: str) -> str:
+    """
+    Get the subdirectory of the scripts location for the revisioned script in the layout, an
+    empty string for the flat layout.
+    """
+
+    if layout == FLAT:
+        return ""
+    if layout == BY_NAME:
+        match = parse_filename(script_name)
+        if match:
+            return match[0]
+    elif layout == BY_YEAR:
+        time = parse_time(script_name)
+        if time is not None:
+            return str(time.year)
+    raise ValueError(f"Can't get the {layout} subdirectory of {script_name}")
+
+
+class ScriptStorage(ABC):
+    """Storage backends keep the revisioned DDL scripts"""
+
+    @abstractmethod
+    def iter_scripts(
+        self, revisions: Optional[Collection[str]] = None, names: Optional[Collection[str]] = None
+    ) -> Iterator[ScriptEntry]:
+        """
+        Yield (filepath, name, revision) tuples for the stored revisioned scripts.
+
+        Args:
+            revisions: if specified, the storage may skip the scripts of other revisions. The
+                caller is still responsible for filtering the results.
+            names: if specified, the storage may skip the scripts of other DDLs, with the same
+                responsibility of the caller.
+        """
+
+    @abstractmethod
+    def read(self, script_name: str) -> str:
+        """Get the source code of the revisioned script by its name."""
+
+    @abstractmethod
+    def write(self, script_name: str, name: str, revision: str, time: datetime, sql: str) -> None:
+        """Save a new revisioned script."""
+
+    @abstractmethod
+    def delete(self, script_name: str) -> None:
+        """Remove the revisioned script by its name."""
+
+    @abstractmethod
+    def get_size(self, script_name: str) -> int:
+        """Get the size of the stored revisioned script in bytes."""
+
+    def get_script(self, filepath: str, name: str, revision: str) -> RevisionedScript:
+        """Create a RevisionedScript object for the script entry, which reads from this storage."""
+        return RevisionedScript(filepath=filepath, name=name, revision=revision, storage=self)
+
+    def fingerprint(self) -> Optional[str]:
+        """
+        Get a fingerprint, which changes when scripts are added, removed or moved in the storage,
+        without listing the scripts. None if the storage can't provide it, then the listing of
+        the scripts can't be cached.
+        """
+        return None
+
+
+class DirectoryStorage(ScriptStorage):
+    """
+    Revisioned scripts are stored as separate files in the scripts location directory. With a
+    sharded layout, the files are kept in its subdirectories, one for each DDL name ("by_name")
+    or for each year of the script time ("by_year").
+    """
+
+    def __init__(self, location: str, layout: str = FLAT) -> None:
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unsupported layout: {layout!r}, expected one of {LAYOUTS}")
+        self.location = location
+        self.layout = layout
+
+    def iter_scripts(
+        self, revisions: Optional[Collection[str]] = None, names: Optional[Collection[str]] = None
+    ) -> Iterator[ScriptEntry]:
+        """
+        Find all .sql files in the location which match the registered filename formats and yield
+        (filepath, name, revision) tuples for them. Each directory is listed in a single pass. In
+        the "by_name" layout only the directories of the `names` are listed, if they are
+        specified.
+        """
+
+        if self.layout == FLAT:
+            directories: Iterable[str] = [self.location]
+        elif self.layout == BY_NAME and names is not None:
+            directories = (os.path.join(self.location, name) for name in names)
+        else:
+            directories = self._iter_shards()
+        for directory in directories:
+            for filename in self._iter_filenames(directory):
+                if filename.endswith(".sql"):
+                    match = parse_filename(filename)
+                    if match:
+                        yield (os.path.join(directory, filename), *match)
+
+    def _iter_shards(self) -> Iterator[str]:
+        """Yield the paths of the subdirectories of the location."""
+        try:
+            with os.scandir(self.location) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        yield entry.path
+        except FileNotFoundError:
+            return
+
+    def _iter_filenames(self, directory: str) -> Iterator[str]:
+        """Yield the names of the files in the directory, nothing if it doesn't exist."""
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        yield entry.name
+        except FileNotFoundError:
+            return
+
+    def get_path(self, script_name: str) -> str:
+        """Get the path of the revisioned script file in the layout of this storage."""
+        return os.path.join(self.location, get_shard(script_name, self.layout), script_name)
+
+    def _find_path(self, script_name: str) -> str:
+        """
+        Get the path of an existing revisioned script file. If it's not in its shard, e.g. it was
+        put into another one by hand or by an older version, the other shards are searched.
+        """
+
+        path = self.get_path(script_name)
+        if self.layout == FLAT or os.path.exists(path):
+            return path
+        for directory in self._iter_shards():
+            candidate = os.path.join(directory, script_name)
+            if os.path.exists(candidate):
+                return candidate
+        return path
+
+    def read(self, script_name: str) -> str:
+        """Get the source code of the revisioned script by its file name."""
+        with open(self._find_path(script_name)) as f:
+            return f.read()
+
+    def write(self, script_name: str, name: str, revision: str, time: datetime, sql: str) -> None:
+        """Save a new revisioned script file in the location directory."""
+        path = self.get_path(script_name)
+        ensure_dir(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(sql)
+
+    def delete(self, script_name: str) -> None:
+        """Remove the revisioned script file."""
+        os.remove(self._find_path(script_name))
+
+    def get_size(self, script_name: str) -> int:
+        """Get the size of the revisioned script file in bytes."""
+        return os.path.getsize(self._find_path(script_name))
+
+    def get_script(self, filepath: str, name: str, revision: str) -> RevisionedScript:
+        """Files are read directly, without the storage."""
+        return RevisionedScript(filepath=filepath, name=name, revision=revision)
+
+    def fingerprint(self) -> Optional[str]:
+        """
+        The modification times of the location and of its shards, they change whenever a file is
+        added, removed or renamed in them.
+        """
+
+        directories = [self.location]
+        if self.layout != FLAT:
+            directories.extend(self._iter_shards())
+        listing = []
+        for directory in sorted(directories):
+            try:
+                listing.append(f"{directory}:{os.stat(directory).st_mtime_ns}")
+            except FileNotFoundError:
+                continue
+        return hashlib.sha1("\n".join(listing).encode()).hexdigest()
+
+
+class SQLiteStorage(ScriptStorage):
+    """
+    Revisioned scripts are stored in a single SQLite database file, indexed by revision and name.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS revisioned_scripts (
+            script_name TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            revision TEXT NOT NULL,
+            timestamp REAL NOT NULL,
+            content TEXT NOT NULL,
+            fingerprint TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_revisioned_scripts_revision "
+        "ON revisioned_scripts (revision)",
+        "CREATE INDEX IF NOT EXISTS ix_revisioned_scripts_name ON revisioned_scripts (name)",
+    )
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection to the database, creating the schema if needed."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            ensure_dir(directory)
+        connection = sqlite3.connect(self.path)
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def iter_scripts(
+        self, revisions: Optional[Collection[str]] = None, names: Optional[Collection[str]] = None
+    ) -> Iterator[ScriptEntry]:
+        """
+        Yield (script_name, name, revision) tuples for the stored scripts. If `revisions` are
+        specified, only the scripts of these revisions are selected using the revision index.
+        """
+
+        with closing(self._connect()) as connection:
+            if revisions is None:
+                cursor = connection.execute(
+                    "SELECT script_name, name, revision FROM revisioned_scripts"
+                )
+            else:
+                connection.execute("CREATE TEMP TABLE selected_revisions (revision TEXT)")
+                connection.executemany(
+                    "INSERT INTO selected_revisions VALUES (?)", ((r,) for r in revisions)
+                )
+                cursor = connection.execute(
+                    "SELECT s.script_name, s.name, s.revision FROM revisioned_scripts s "
+                    "JOIN selected_revisions r ON s.revision = r.revision"
+                )
+            yield from cursor
+
+    def read(self, script_name: str) -> str:
+        """Get the source code of the revisioned script by its name."""
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT content FROM revisioned_scripts WHERE script_name = ?", (script_name,)
+            ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Script {script_name} not found in {self.path}")
+        return row[0]
+
+    def write(self, script_name: str, name: str, revision: str, time: datetime, sql: str) -> None:
+        """Save a new revisioned script into the database."""
+        fingerprint = hashlib.sha256(sql.encode()).hexdigest()
+        with closing(self._connect()) as connection:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO revisioned_scripts "
+                    "(script_name, name, revision, timestamp, content, fingerprint) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (script_name, name, revision, time.timestamp(), sql, fingerprint),
+                )
+
+    def delete(self, script_name: str) -> None:
+        """Remove the revisioned script from the database."""
+        with closing(self._connect()) as connection:
+            with connection:
+                connection.execute(
+                    "DELETE FROM revisioned_scripts WHERE script_name = ?", (script_name,)
+                )
+
+    def fingerprint(self) -> Optional[str]:
+        """The size and the modification time of the database file."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return ""
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def get_size(self, script_name: str) -> int:
+        """Get the size of the revisioned script source code in bytes."""
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT length(CAST(content AS BLOB)) FROM revisioned_scripts "
+                "WHERE script_name = ?",
+                (script_name,),
+            ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Script {script_name} not found in {self.path}")
+        return row[0]
+
+
+class PackageStorage(ScriptStorage):
+    """
+    Read-only storage for revisioned scripts shipped inside a Python package or a zip archive.
+    The scripts are read through importlib.resources or zipfile, without extracting them.
+
+    The location is either "package.name:path/inside/package" or "path/to/archive.zip:path/inside".
+    If the scripts directory contains an index file (see `write_index`), the scripts are listed
+    from it, otherwise the directory is listed and the file names are parsed.
+    """
+
+    def __init__(self, location: str) -> None:
+        self.location = location
+        self._root: Any = None
+
+    def _get_root(self) -> Any:
+        """Get the importlib.resources Traversable for the scripts directory."""
+        if self._root is None:
+            source, _, path = self.location.rpartition(":")
+            if not source:
+                raise ValueError(
+                    f'Package storage location should be "package:path", got {self.location!r}'
+                )
+            root: Any
+            if os.path.isfile(source):
+                root = zipfile.Path(source)
+            else:
+                try:
+                    from importlib.resources import files
+                except ImportError:  # Python 3.8
+                    from importlib_resources import files  # type: ignore
+                root = files(source)
+            for part in path.strip("/").split("/"):
+                if part:
+                    root = root.joinpath(part)
+            self._root = root
+        return self._root
+
+    def _read_index(self) -> Optional[List[ScriptEntry]]:
+        index = self._get_root().joinpath(INDEX_FILENAME)
+        if not index.is_file():
+            return None
+        data = json.loads(index.read_text())
+        if data.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported scripts index format in {self.location}")
+        return [tuple(entry) for entry in data["scripts"]]  # type: ignore
+
+    def iter_scripts(
+        self, revisions: Optional[Collection[str]] = None, names: Optional[Collection[str]] = None
+    ) -> Iterator[ScriptEntry]:
+        """Yield (script_name, name, revision) tuples from the index or the directory listing."""
+        index = self._read_index()
+        if index is not None:
+            yield from index
+            return
+        for entry in self._get_root().iterdir():
+            if entry.name.endswith(".sql"):
+                match = parse_filename(entry.name)
+                if match:
+                    yield (entry.name, *match)
+
+    def read(self, script_name: str) -> str:
+        """Get the source code of the revisioned script from the package."""
+        resource = self._get_root().joinpath(script_name)
+        if not resource.is_file():
+            raise FileNotFoundError(f"Script {script_name} not found in {self.location}")
+        return resource.read_text()
+
+    def write(self, script_name: str, name: str, revision: str, time: datetime, sql: str) -> None:
+        raise ReadOnlyStorageError(f"Can't write {script_name}, package storage is read-only")
+
+    def delete(self, script_name: str) -> None:
+        raise ReadOnlyStorageError(f"Can't delete {script_name}, package storage is read-only")
+
+    def get_size(self, script_name: str) -> int:
+        return len(self.read(script_name).encode())
+
+
+def write_index(storage: DirectoryStorage) -> int:
+    """
+    Save the index of the revisioned scripts in the scripts directory, so that they can be listed
+    without parsing the file names when they are shipped in a package. Return the number of
+    scripts. The package storage reads the scripts from the flat layout only.
+    """
+
+    if storage.layout != FLAT:
+        raise ValueError(
+            f"Scripts in the {storage.layout} layout can't be shipped in a package, convert them "
+            f'to the flat layout with "alembic-dddl reshard flat" first'
+        )
+    scripts = sorted(
+        [os.path.split(filepath)[-1], name, revision]
+        for filepath, name, revision in storage.iter_scripts()
+    )
+    data = {"version": INDEX_FORMAT_VERSION, "scripts": scripts}
+    with open(os.path.join(storage.location, INDEX_FILENAME), "w") as f:
+        json.dump(data, f)
+    return len(scripts)
+
+
+def get_storage(config: DDDLConfig) -> ScriptStorage:
+    """Create the storage backend, set up in the config."""
+    if config.storage == "directory":
+        return DirectoryStorage(config.scripts_location, layout=config.layout)
+    elif config.storage == "sqlite":
+        return SQLiteStorage(config.scripts_location)
+    elif config.storage == "package":
+        return PackageStorage(config.scripts_location)
+    raise ValueError(f"Unsupported storage: {config.storage!r}")
+
+
+def copy_scripts(source: ScriptStorage, target: ScriptStorage) -> int:
+    """Copy all revisioned scripts from one storage to another. Return the number of scripts."""
+    count = 0
+    for filepath, name, revision in source.iter_scripts():
+        script_name = os.path.split(filepath)[-1]
+        target.write(
+            script_name=script_name,
+            name=name,
+            revision=revision,
+            time=datetime.now(),
+            sql=source.read(script_name),
+        )
+        count += 1
+    return count
+
+
+def reshard_directory(location: str, layout: str) -> int:
+    """
+    Move the revisioned script files in the location directory, in any of the layouts, into the
+    subdirectories of the `layout`. Emptied subdirectories are removed. Return the number of
+    moved scripts.
+    """
+
+    source = DirectoryStorage(location, layout=FLAT)
+    target = DirectoryStorage(location, layout=layout)
+    scripts = [
+        (filepath, os.path.split(filepath)[-1])
+        for directory in [location, *source._iter_shards()]
+        for filepath, _, _ in DirectoryStorage(directory).iter_scripts()
+    ]
+    moved = 0
+    for filepath, script_name in scripts:
+        path = target.get_path(script_name)
+        if os.path.normpath(filepath) != os.path.normpath(path):
+            ensure_dir(os.path.dirname(path))
+            os.replace(filepath, path)
+            moved += 1
+    for directory in source._iter_shards():
+        if not os.listdir(directory):
+            os.rmdir(directory)
+    return moved
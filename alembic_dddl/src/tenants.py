@@ -0,0 +1,374 @@
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    ContextManager,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from alembic.config import Config
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy.engine import Connection
+
+from alembic_dddl.src.execution import (
+    AUTOCOMMIT,
+    PER_STATEMENT,
+    TRANSACTION,
+    execute_statements,
+)
+from alembic_dddl.src.file_format import parse_filename
+
+logger = logging.getLogger(f"alembic.{__name__}")
+
+SUBSTITUTE = "substitute"
+SEARCH_PATH = "search_path"
+
+TenantSchemas = Union[Sequence[str], Callable[[Connection], Sequence[str]]]
+
+
+class TenantFailure(NamedTuple):
+    schema: str
+    error: BaseException
+
+
+class TenantFanOutError(Exception):
+    """Raised when the script failed for some of the tenant schemas"""
+
+    def __init__(self, script_name: str, failures: List[TenantFailure]) -> None:
+        self.script_name = script_name
+        self.failures = failures
+        schemas = ", ".join(f.schema for f in failures)
+        super().__init__(f'Script "{script_name}" failed for {len(failures)} schemas: {schemas}')
+
+
+@dataclass
+class TenantFanOut:
+    """
+    Settings for running revisioned scripts once for each tenant schema.
+
+    Attributes:
+        schemas: a list of schema names, or a callable which receives the migration connection
+            and returns the list.
+        max_workers: number of worker threads, each of them uses its own connection.
+        mode: "substitute" to replace `placeholder` in the statements with the schema name, or
+            "search_path" to set PostgreSQL search_path to the schema before running the script.
+        placeholder: the string which is replaced by the schema name in "substitute" mode.
+        ddl_names: names of the DDLs, which scripts are run for each tenant, or None for all DDLs.
+            The scripts of the other DDLs are run as usual, in the migration transaction.
+    """
+
+    schemas: TenantSchemas
+    max_workers: int = 4
+    mode: str = SUBSTITUTE
+    placeholder: str = "{schema}"
+    ddl_names: Optional[Collection[str]] = None
+
+    def __post_init__(self) -> None:
+        if self.mode not in (SUBSTITUTE, SEARCH_PATH):
+            raise ValueError(f"Unsupported tenant fan-out mode: {self.mode!r}")
+        if self.max_workers < 1:
+            raise ValueError("max_workers must be positive")
+
+    def applies_to(self, script_name: str) -> bool:
+        """Check if the revisioned script should be run for each tenant."""
+        if self.ddl_names is None:
+            return True
+        match = parse_filename(script_name)
+        return (match[0] if match else script_name) in self.ddl_names
+
+    def get_schemas(self, connection: Optional[Connection]) -> List[str]:
+        """Get the list of tenant schemas."""
+        if callable(self.schemas):
+            if connection is None:
+                raise ValueError("Tenant schemas callable requires a database connection")
+            return list(self.schemas(connection))
+        return list(self.schemas)
+
+    def prepare(self, schema: str, statements: Sequence[str]) -> List[str]:
+        """Get the statements of the script to run for the schema."""
+        if self.mode == SEARCH_PATH:
+            return list(statements)
+        return [s.replace(self.placeholder, schema) for s in statements]
+
+    def set_search_path(self, schema: str, local: bool = True) -> List[str]:
+        """
+        Get the statements which switch the search_path to the schema. With `local`, the setting
+        only lasts until the end of the current transaction, so it doesn't stay on the pooled
+        connection.
+        """
+
+        if self.mode != SEARCH_PATH:
+            return []
+        return [f'SET {"LOCAL " if local else ""}search_path TO "{schema}"']
+
+    def reset_search_path(self) -> List[str]:
+        """Get the statements which restore the search_path changed outside of a transaction."""
+        return ["RESET search_path"] if self.mode == SEARCH_PATH else []
+
+
+class TenantRegistry:
+    """Keeps the tenant fan-out settings, if the scripts should be run for each tenant"""
+
+    def __init__(self) -> None:
+        self.fan_out: Optional[TenantFanOut] = None
+
+    def register(self, fan_out: Optional[TenantFanOut]) -> None:
+        self.fan_out = fan_out
+
+
+tenant_registry = TenantRegistry()
+
+# alembic config attribute with the tenant registry scoped to this config
+TENANTS_ATTRIBUTE = "alembic_dddl_tenants"
+
+# tenant registry of the current context, see `use_tenants`
+_current_tenants: ContextVar[Optional[TenantRegistry]] = ContextVar(
+    "alembic_dddl_tenants", default=None
+)
+_attributes_lock = threading.Lock()
+
+Scope = Union[Config, MigrationContext, None]
+
+
+def get_tenant_registry(scope: Scope = None, create: bool = False) -> TenantRegistry:
+    """
+    Get the tenant registry for the alembic config or migration context: the one scoped to the
+    config (see `register_tenants`), the registry of the current context (see `use_tenants`), or
+    the global registry, in this order. If `create` is True, a registry scoped to the config is
+    created if it doesn't exist.
+
+    Raises:
+        ValueError: if `create` is True and the scope is a migration context without a config.
+    """
+
+    config = scope.config if isinstance(scope, MigrationContext) else scope
+    if create and config is None and scope is not None:
+        raise ValueError(
+            "Can't scope tenants to a migration context without an alembic config, pass the "
+            "config instead"
+        )
+    if config is not None:
+        if create:
+            with _attributes_lock:
+                return config.attributes.setdefault(TENANTS_ATTRIBUTE, TenantRegistry())
+        registry = config.attributes.get(TENANTS_ATTRIBUTE)
+        if isinstance(registry, TenantRegistry):
+            return registry
+    return _current_tenants.get() or tenant_registry
+
+
+@contextmanager
+def use_tenants(registry: Optional[TenantRegistry] = None) -> Iterator[TenantRegistry]:
+    """
+    Make tenants registered without a scope go into a separate registry (a new one by default)
+    within the current thread or asyncio task, instead of the global registry.
+    """
+
+    registry = registry or TenantRegistry()
+    token = _current_tenants.set(registry)
+    try:
+        yield registry
+    finally:
+        _current_tenants.reset(token)
+
+
+def get_fan_out(migration_context: MigrationContext, script_name: str) -> Optional[TenantFanOut]:
+    """Get the tenant fan-out settings, if the revisioned script should be run for each tenant."""
+    fan_out = get_tenant_registry(migration_context).fan_out
+    if fan_out is not None and fan_out.applies_to(script_name):
+        return fan_out
+    return None
+
+
+def register_tenants(
+    schemas: TenantSchemas,
+    max_workers: int = 4,
+    mode: str = SUBSTITUTE,
+    placeholder: str = "{schema}",
+    ddl_names: Optional[Collection[str]] = None,
+    scope: Scope = None,
+) -> None:
+    """
+    Run the revisioned scripts once for each of the tenant schemas: the scripts of all DDLs, or
+    only of `ddl_names`. If the alembic config or migration context is passed as `scope` (e.g.
+    `context.config` in env.py), the tenants are registered only for this config.
+
+    The tenant schemas are updated by worker threads on their own connections, so the migration
+    transaction is committed before each of these scripts, in the middle of the migration.
+    """
+
+    get_tenant_registry(scope, create=scope is not None).register(
+        TenantFanOut(
+            schemas=schemas,
+            max_workers=max_workers,
+            mode=mode,
+            placeholder=placeholder,
+            ddl_names=ddl_names,
+        )
+    )
+
+
+def _apply_to_schema(
+    fan_out: TenantFanOut,
+    schema: str,
+    execute: Callable[[str], Any],
+    transaction: Callable[[], ContextManager],
+    run: Callable[[Callable[[str], Any], List[str]], Any],
+    statements: Sequence[str],
+    mode: str,
+) -> None:
+    """
+    Run the statements for the schema in the transactions of the execution mode. `transaction`
+    starts a transaction, `run` executes the statements of the script with the given callable.
+    """
+
+    prepared = fan_out.prepare(schema, statements)
+    if mode == PER_STATEMENT:
+
+        def execute_in_transaction(statement: str) -> None:
+            with transaction():
+                for set_statement in fan_out.set_search_path(schema):
+                    execute(set_statement)
+                execute(statement)
+
+        run(execute_in_transaction, prepared)
+    elif mode == AUTOCOMMIT:
+        for set_statement in fan_out.set_search_path(schema, local=False):
+            execute(set_statement)
+        try:
+            run(execute, prepared)
+        finally:
+            for reset_statement in fan_out.reset_search_path():
+                execute(reset_statement)
+    else:
+        with transaction():
+            for set_statement in fan_out.set_search_path(schema):
+                execute(set_statement)
+            run(execute, prepared)
+
+
+def run_for_tenants(
+    operations: Operations,
+    fan_out: TenantFanOut,
+    script_name: str,
+    statements: Sequence[str],
+    slow_statement_threshold: float = 0.0,
+    mode: str = TRANSACTION,
+    indexes: Optional[Sequence[int]] = None,
+) -> None:
+    """
+    Run the statements for each tenant schema. Online, the schemas are processed by a pool of
+    worker threads, each with its own connection, after the migration transaction is committed.
+    In the "autocommit" and "per_statement" modes the statements of each schema run in these
+    modes, otherwise each schema is updated in its own transaction. In the offline mode the
+    statements for all schemas are rendered one after another, in the transactions of the mode.
+
+    Raises:
+        TenantFanOutError: if the script failed for some of the schemas. The other schemas are
+            still processed.
+    """
+
+    from alembic_dddl.src.workers import run_with_connections
+
+    def run_for_schema(schema: str) -> Callable[[Callable[[str], Any], List[str]], Any]:
+        def run(execute: Callable[[str], Any], prepared: List[str]) -> None:
+            execute_statements(
+                execute=execute,
+                script_name=f"{script_name} [{schema}]",
+                statements=prepared,
+                slow_statement_threshold=slow_statement_threshold,
+                indexes=indexes,
+            )
+
+        return run
+
+    context = operations.get_context()
+    if context.as_sql:
+        impl = context.impl
+
+        @contextmanager
+        def emit_transaction() -> Iterator[None]:
+            impl.emit_begin()
+            yield
+            impl.emit_commit()
+
+        for schema in fan_out.get_schemas(None):
+            run = run_for_schema(schema)
+            if mode == TRANSACTION:
+                # in the migration transaction, SET LOCAL would last until its end
+                _apply_to_schema(
+                    fan_out,
+                    schema,
+                    operations.execute,
+                    emit_transaction,
+                    run,
+                    statements,
+                    AUTOCOMMIT,
+                )
+            else:
+                with context.autocommit_block():
+                    _apply_to_schema(
+                        fan_out,
+                        schema,
+                        operations.execute,
+                        emit_transaction,
+                        run,
+                        statements,
+                        mode,
+                    )
+        return
+
+    connection = operations.get_bind()
+    schemas = fan_out.get_schemas(connection)
+
+    def apply(worker_connection: Connection, schema: str) -> None:
+        if mode == AUTOCOMMIT:
+            worker_connection.execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            _apply_to_schema(
+                fan_out=fan_out,
+                schema=schema,
+                execute=worker_connection.exec_driver_sql,
+                transaction=worker_connection.begin,
+                run=run_for_schema(schema),
+                statements=statements,
+                mode=mode,
+            )
+        finally:
+            if mode == AUTOCOMMIT:
+                # end the transaction SQLAlchemy begins implicitly, the statements are committed
+                # by the database already
+                worker_connection.rollback()
+
+    start = perf_counter()
+    failures = []
+    with context.autocommit_block():
+        for schema, error in run_with_connections(
+            engine=connection.engine,
+            items=schemas,
+            max_workers=fan_out.max_workers,
+            work=apply,
+            thread_name="dddl-tenant",
+            transaction=False,
+        ):
+            logger.error(f'Script "{script_name}" failed for schema "{schema}": {error}')
+            failures.append(TenantFailure(schema=schema, error=error))
+
+    logger.info(
+        f'Applied "{script_name}" to {len(schemas) - len(failures)} of {len(schemas)} schemas '
+        f"in {perf_counter() - start:.3f}s"
+    )
+    if failures:
+        raise TenantFanOutError(script_name=script_name, failures=failures)
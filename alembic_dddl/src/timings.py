@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import weakref
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    inspect,
+    select,
+)
+from sqlalchemy.engine import Connection
+
+from alembic_dddl.src.config import DDDLConfig
+from alembic_dddl.src.utils import ensure_dir
+
+logger = logging.getLogger(f"alembic.{__name__}")
+
+FILE = "file"
+TABLE = "table"
+TIMINGS_FORMAT_VERSION = 1
+
+_histories: "weakref.WeakKeyDictionary[MigrationContext, TimingHistory]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class TimingHistory(ABC):
+    """Execution durations of the revisioned scripts, recorded on upgrades"""
+
+    @abstractmethod
+    def record(self, script_name: str, duration: float) -> None:
+        """Save the execution duration of the script in seconds."""
+
+    @abstractmethod
+    def get_durations(self) -> Dict[str, List[float]]:
+        """Get the recorded durations of each script, from the oldest to the newest."""
+
+
+class FileTimingHistory(TimingHistory):
+    """
+    Timing history in a local JSON file. Only the latest `max_samples` durations of each script
+    are kept.
+    """
+
+    def __init__(self, path: str, max_samples: int = 10) -> None:
+        self.path = path
+        self.max_samples = max_samples
+
+    def get_durations(self) -> Dict[str, List[float]]:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        if data.get("version") != TIMINGS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported timing history format in {self.path}")
+        return data["scripts"]
+
+    def record(self, script_name: str, duration: float) -> None:
+        scripts = self.get_durations()
+        durations = scripts.setdefault(script_name, [])
+        durations.append(round(duration, 6))
+        del durations[: -self.max_samples]
+        directory = os.path.dirname(self.path)
+        if directory:
+            ensure_dir(directory)
+        with open(self.path, "w") as f:
+            json.dump({"version": TIMINGS_FORMAT_VERSION, "scripts": scripts}, f, indent=1)
+
+
+class TableTimingHistory(TimingHistory):
+    """Timing history in a table of the migrated database, one row for each execution."""
+
+    def __init__(self, connection: Connection, table_name: str) -> None:
+        self.connection = connection
+        self.table = Table(
+            table_name,
+            MetaData(),
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("script_name", String(255), nullable=False, index=True),
+            Column("duration", Float, nullable=False),
+            Column("recorded_at", DateTime, nullable=False),
+        )
+
+    def create_table(self) -> None:
+        self.table.create(self.connection, checkfirst=True)
+
+    def get_durations(self) -> Dict[str, List[float]]:
+        query = select(self.table.c.script_name, self.table.c.duration).order_by(self.table.c.id)
+        result: Dict[str, List[float]] = {}
+        for script_name, duration in self.connection.execute(query):
+            result.setdefault(script_name, []).append(duration)
+        return result
+
+    def record(self, script_name: str, duration: float) -> None:
+        self.connection.execute(
+            self.table.insert().values(
+                script_name=script_name, duration=duration, recorded_at=datetime.now()
+            )
+        )
+
+
+def get_timing_history(
+    migration_context: MigrationContext, config: DDDLConfig
+) -> Optional[TimingHistory]:
+    """
+    Get the timing history to record the script durations into, according to the config. Returns
+    None if it's disabled, or in the offline mode, where nothing is executed.
+    """
+
+    if not config.timing_history or migration_context.as_sql:
+        return None
+    if config.timing_history == FILE:
+        return FileTimingHistory(config.timing_history_file)
+    if config.timing_history != TABLE:
+        raise ValueError(f"Unsupported timing history: {config.timing_history!r}")
+    if migration_context.connection is None:
+        return None
+    history = _histories.get(migration_context)
+    if history is None:
+        table_history = TableTimingHistory(
+            connection=migration_context.connection, table_name=config.timing_history_table
+        )
+        table_history.create_table()
+        _histories[migration_context] = history = table_history
+    return history
+
+
+def load_durations(config: DDDLConfig, url: Optional[str]) -> Dict[str, List[float]]:
+    """
+    Read the recorded durations outside of migrations. For the "table" timing history, the
+    database at `url` is queried.
+    """
+
+    if config.timing_history == FILE:
+        return FileTimingHistory(config.timing_history_file).get_durations()
+    if config.timing_history != TABLE:
+        raise ValueError("Timing history is not enabled, see the timing_history option")
+    if not url:
+        raise ValueError("sqlalchemy.url is required to read the timing history table")
+
+    engine = create_engine(url)
+    try:
+        with engine.connect() as connection:
+            if not inspect(connection).has_table(config.timing_history_table):
+                return {}
+            history = TableTimingHistory(connection, config.timing_history_table)
+            return history.get_durations()
+    finally:
+        engine.dispose()
@@ -1,5 +1,9 @@
 import logging
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from alembic.runtime.migration import MigrationContext
 
 logger = logging.getLogger(__name__)
 
@@ -15,3 +19,24 @@ def ensure_dir(dir: str) -> None:
 def escape_quotes(text: str) -> str:
     """Excape single quotes in text"""
     return text.replace("'", "\\'")
+
+
+def is_upgrade(migration_context: "MigrationContext") -> bool:
+    """
+    Check if the migration context is upgrading the database: the destination revision of the
+    alembic command descends from the current heads. False for downgrades, and whenever the
+    direction can't be determined from the context.
+    """
+
+    script_directory = migration_context.script
+    environment_context = migration_context.environment_context
+    if script_directory is None or environment_context is None:
+        return False
+    try:
+        destination = environment_context.get_revision_argument()
+        if not destination:
+            return False
+        current = migration_context.get_current_heads() or None
+        return any(True for _ in script_directory.iterate_revisions(destination, current))
+    except Exception:
+        return False
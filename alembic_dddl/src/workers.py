@@ -0,0 +1,62 @@
+import queue
+import threading
+from typing import Callable, List, Sequence, Tuple, TypeVar
+
+from sqlalchemy.engine import Connection, Engine
+
+T = TypeVar("T")
+
+
+def run_with_connections(
+    engine: Engine,
+    items: Sequence[T],
+    max_workers: int,
+    work: Callable[[Connection, T], None],
+    thread_name: str = "dddl-worker",
+    transaction: bool = True,
+) -> List[Tuple[T, BaseException]]:
+    """
+    Process the items by a pool of worker threads. Each thread uses its own connection from the
+    engine, so at most `max_workers` connections are open at the same time. Each item is processed
+    in its own transaction, unless `transaction` is False: then `work` manages the transactions
+    itself.
+
+    Returns:
+        A list of (item, error) pairs for the items which failed, in the order of the items. The
+        other items are still processed.
+    """
+
+    pending: "queue.SimpleQueue[Tuple[int, T]]" = queue.SimpleQueue()
+    for position, item in enumerate(items):
+        pending.put((position, item))
+    failures: List[Tuple[int, T, BaseException]] = []
+    failures_lock = threading.Lock()
+
+    def worker() -> None:
+        with engine.connect() as connection:
+            while True:
+                try:
+                    position, item = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    if transaction:
+                        with connection.begin():
+                            work(connection, item)
+                    else:
+                        work(connection, item)
+                except Exception as e:
+                    with failures_lock:
+                        failures.append((position, item, e))
+
+    threads = [
+        threading.Thread(target=worker, name=f"{thread_name}-{i}")
+        for i in range(min(max_workers, len(items)))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    failures.sort(key=lambda f: f[0])
+    return [(item, error) for _, item, error in failures]
@@ -0,0 +1,78 @@
+"""
+Memory benchmark for the revisioned scripts catalog built by DDLVersions.
+
+Compares peak memory of the previous approach (a RevisionedScript object for every file, grouped
+into a dict of lists) with the single-pass catalog, which keeps only the latest entry per name.
+
+Usage:
+    python -m benchmarks.catalog_memory [number of files]
+"""
+
+import sys
+import tracemalloc
+from typing import Callable, Dict, List
+from unittest.mock import patch
+
+from alembic_dddl.src.comparator import DDLVersions
+from alembic_dddl.src.file_format import DateTimeFileFormat, TimestampedFileFormat
+from alembic_dddl.src.models import RevisionedScript
+from alembic_dddl.src.storage import DirectoryStorage
+
+DDL_DIR = "/srv/app/migrations/versions/ddl"
+DDL_NAMES = 500
+
+
+def generate_listing(files: int) -> List[str]:
+    """Simulate a long history: every revision changes several DDLs."""
+    per_revision = 5
+    result = []
+    for i in range(files):
+        revision = f"{i // per_revision:012x}"
+        name = f"ddl_object_{i % DDL_NAMES}"
+        result.append(f"{1700000000 + i}_{name}_{revision}.sql")
+    return result
+
+
+def legacy_latest(listing: List[str], rev_order: List[str]) -> Dict[str, RevisionedScript]:
+    """The catalog as it was built before: all objects, grouped into lists by revision."""
+    scripts = []
+    for file in listing:
+        for format in (TimestampedFileFormat, DateTimeFileFormat):
+            script = format.get_script_if_matches(f"{DDL_DIR}/{file}")
+            if script:
+                scripts.append(script)
+                break
+    by_revision: Dict[str, List[RevisionedScript]] = {}
+    for script in scripts:
+        by_revision.setdefault(script.revision, []).append(script)
+    return {s.name: s for r in reversed(rev_order) if r in by_revision for s in by_revision[r]}
+
+
+def compact_latest(listing: List[str], rev_order: List[str]) -> Dict[str, RevisionedScript]:
+    with patch.object(DirectoryStorage, "_iter_filenames", return_value=listing):
+        return DDLVersions(DDL_DIR).get_latest_ddl_revisions(rev_order)
+
+
+def measure(func: Callable, listing: List[str], rev_order: List[str]) -> int:
+    tracemalloc.start()
+    result = func(listing, rev_order)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(result) == DDL_NAMES
+    return peak
+
+
+def main() -> None:
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    listing = generate_listing(files)
+    rev_order = sorted({file.rsplit("_", 1)[-1][:-4] for file in listing}, reverse=True)
+
+    legacy = measure(legacy_latest, listing, rev_order)
+    compact = measure(compact_latest, listing, rev_order)
+    print(f"files:   {files}")  # noqa: T201
+    print(f"legacy:  {legacy / 2**20:8.2f} MiB peak")  # noqa: T201
+    print(f"compact: {compact / 2**20:8.2f} MiB peak")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
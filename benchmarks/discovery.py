@@ -0,0 +1,87 @@
+"""
+Time benchmark for the discovery of revisioned scripts in the scripts directory.
+
+Compares the per-file cost of the previous approach (glob, then each file format tried in turn
+with `get_script_if_matches`) with DirectoryStorage, which lists the directory with os.scandir
+and matches each file name once against the combined pattern of all file formats. The directory
+is filled with files of both built-in formats and some unrelated files.
+
+Usage:
+    python -m benchmarks.discovery [number of files] [number of runs]
+"""
+
+import os
+import sys
+import tempfile
+from glob import glob
+from time import perf_counter
+from typing import Callable, List
+
+from alembic_dddl.src.file_format import DateTimeFileFormat, TimestampedFileFormat
+from alembic_dddl.src.models import RevisionedScript
+from alembic_dddl.src.storage import DirectoryStorage
+
+DDL_NAMES = 500
+
+
+def fill_directory(directory: str, files: int) -> None:
+    """Every third script uses the datetime format, every tenth file is not a script."""
+    for i in range(files):
+        revision = f"{i // 5:012x}"
+        name = f"ddl_object_{i % DDL_NAMES}"
+        if i % 10 == 9:
+            filename = f"notes_{i}.txt" if i % 20 == 9 else f"unrelated_{i}.sql"
+        elif i % 3 == 0:
+            filename = f"2023_01_01_{i % 2400:04d}_{name}_{revision}.sql"
+        else:
+            filename = f"{1700000000 + i}_{name}_{revision}.sql"
+        with open(os.path.join(directory, filename), "w"):
+            pass
+
+
+def legacy_discovery(directory: str) -> List[RevisionedScript]:
+    """The discovery as it was before: glob and a match attempt per file format."""
+    scripts = []
+    for file in glob(os.path.join(directory, "*.sql")):
+        for format in (TimestampedFileFormat, DateTimeFileFormat):
+            script = format.get_script_if_matches(file)
+            if script:
+                scripts.append(script)
+                break
+    return scripts
+
+
+def scandir_discovery(directory: str) -> List[RevisionedScript]:
+    storage = DirectoryStorage(directory)
+    return [
+        storage.get_script(filepath=filepath, name=name, revision=revision)
+        for filepath, name, revision in storage.iter_scripts()
+    ]
+
+
+def measure(func: Callable, directory: str, runs: int) -> float:
+    """Best time of the runs, the directory listing is in the OS cache after the first one."""
+    best = float("inf")
+    for _ in range(runs):
+        start = perf_counter()
+        func(directory)
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as directory:
+        fill_directory(directory, files)
+        assert len(legacy_discovery(directory)) == len(scandir_discovery(directory))
+
+        legacy = measure(legacy_discovery, directory, runs)
+        scandir = measure(scandir_discovery, directory, runs)
+    print(f"files:   {files}")  # noqa: T201
+    print(f"legacy:  {legacy * 1000:8.1f} ms, {legacy / files * 1e6:6.2f} us/file")  # noqa: T201
+    print(f"scandir: {scandir * 1000:8.1f} ms, {scandir / files * 1e6:6.2f} us/file")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+import os
+import sqlite3
+import zipfile
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from alembic_dddl.cli import main
+from alembic_dddl.commands import (
+    check,
+    diff,
+    export,
+    gc,
+    plan,
+    reshard,
+    squash,
+    state_at,
+)
+from alembic_dddl.dddl import ddl_registry
+from alembic_dddl.src.baseline import Baseline, get_baseline_path
+from alembic_dddl.src.config import load_config
+from alembic_dddl.src.tenants import tenant_registry
+
+X1 = "2023_01_01_0000_x_rev1.sql"
+Y1 = "2023_01_01_0000_y_rev1.sql"
+X2 = "2023_01_02_0000_x_rev2.sql"
+X3 = "2023_01_03_0000_x_rev3.sql"
+
+
+def _make_project(alembic_project: Callable[..., Config], **kwargs) -> Config:
+    return alembic_project(
+        revisions=[
+            ("rev1", None, f"op.run_ddl_script('{X1}')\nop.run_ddl_script('{Y1}')", ""),
+            ("rev2", "rev1", f"op.run_ddl_script('{X2}')", f"op.run_ddl_script('{X1}')"),
+            ("rev3", "rev2", f"op.run_ddl_script('{X3}')", f"op.run_ddl_script('{X2}')"),
+        ],
+        scripts={
+            # X1 and X2 can't be both executed
+            X1: "CREATE TABLE x (a INTEGER);",
+            Y1: "CREATE TABLE y (a INTEGER);",
+            X2: "CREATE TABLE x (b INTEGER);",
+            X3: "DROP TABLE x;\nCREATE TABLE x (c INTEGER);",
+        },
+        **kwargs,
+    )
+
+
+class TestSquash:
+    @staticmethod
+    def test_manifest(alembic_project: Callable[..., Config]) -> None:
+        config = _make_project(alembic_project)
+
+        baseline = squash(config, "rev3")
+
+        assert baseline == Baseline(
+            revision="rev3",
+            scripts={"x": X3, "y": Y1},
+            superseded=frozenset({X2}),
+            replaced={X1: X3},
+        )
+        assert Baseline.load(get_baseline_path(load_config(config))) == baseline
+
+    @staticmethod
+    def test_upgrade(alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+        config = _make_project(alembic_project)
+        squash(config, "rev2")
+
+        command.upgrade(config, "head")
+
+        connection = sqlite3.connect(tmp_path / "test.db")
+        try:
+            columns = [r[1] for r in connection.execute("PRAGMA table_info(x)")]
+        finally:
+            connection.close()
+        assert columns == ["c"]
+
+    @staticmethod
+    def test_intermediate_dependent(
+        alembic_project: Callable[..., Config], tmp_path: Path
+    ) -> None:
+        """The final script runs at the revision of the first one, before the migrations use it"""
+        config = alembic_project(
+            revisions=[
+                ("r1", None, "op.run_ddl_script('2023_01_01_0000_a_r1.sql')", ""),
+                ("r2", "r1", "op.execute('CREATE TABLE snap AS SELECT x FROM a')", ""),
+                ("r3", "r2", "op.run_ddl_script('2023_01_03_0000_a_r3.sql')", ""),
+            ],
+            scripts={
+                "2023_01_01_0000_a_r1.sql": "CREATE VIEW a AS SELECT 1 AS x;",
+                "2023_01_03_0000_a_r3.sql": (
+                    "DROP VIEW IF EXISTS a;\nCREATE VIEW a AS SELECT 2 AS x, 3 AS y;"
+                ),
+            },
+        )
+        squash(config, "r3")
+
+        command.upgrade(config, "head")
+
+        connection = sqlite3.connect(tmp_path / "test.db")
+        try:
+            assert connection.execute("SELECT x FROM snap").fetchall() == [(2,)]
+            assert connection.execute("SELECT x, y FROM a").fetchall() == [(2, 3)]
+        finally:
+            connection.close()
+
+    @staticmethod
+    def test_upgrade_from_squashed_range(
+        alembic_project: Callable[..., Config], tmp_path: Path
+    ) -> None:
+        """A database upgraded past the first script before squashing still gets the final one"""
+        config = _make_project(alembic_project)
+        command.upgrade(config, "rev1")
+        squash(config, "rev3")
+
+        command.upgrade(config, "head")
+
+        connection = sqlite3.connect(tmp_path / "test.db")
+        try:
+            columns = [r[1] for r in connection.execute("PRAGMA table_info(x)")]
+        finally:
+            connection.close()
+        assert columns == ["c"]
+
+    @staticmethod
+    def test_downgrade(alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+        """The scripts are only replaced and skipped on upgrade"""
+        v1 = "2023_01_01_0000_v_rev1.sql"
+        config = alembic_project(
+            revisions=[
+                ("rev1", None, f"op.run_ddl_script('{v1}')", "op.execute('DROP VIEW v')"),
+                (
+                    "rev2",
+                    "rev1",
+                    "op.run_ddl_script('2023_01_02_0000_v_rev2.sql')",
+                    f"op.run_ddl_script('{v1}')",
+                ),
+            ],
+            scripts={
+                v1: "DROP VIEW IF EXISTS v;\nCREATE VIEW v AS SELECT 1 AS a;",
+                "2023_01_02_0000_v_rev2.sql": (
+                    "DROP VIEW IF EXISTS v;\nCREATE VIEW v AS SELECT 2 AS a;"
+                ),
+            },
+        )
+        squash(config, "rev2")
+
+        command.upgrade(config, "head")
+        command.downgrade(config, "rev1")
+
+        connection = sqlite3.connect(tmp_path / "test.db")
+        try:
+            assert connection.execute("SELECT a FROM v").fetchone() == (1,)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def test_incremental(alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+        """The statements of the superseded script are not applied, the final one runs in full"""
+        config = alembic_project(
+            revisions=[
+                ("rev1", None, "op.run_ddl_script('2023_01_01_0000_v_rev1.sql')", ""),
+                (
+                    "rev2",
+                    "rev1",
+                    "op.run_ddl_script('2023_01_02_0000_v_rev2.sql', statements=[1])",
+                    "",
+                ),
+            ],
+            scripts={
+                "2023_01_01_0000_v_rev1.sql": (
+                    "CREATE VIEW v1 AS SELECT 1;\nCREATE VIEW v2 AS SELECT 2;"
+                ),
+                "2023_01_02_0000_v_rev2.sql": (
+                    "CREATE VIEW v1 AS SELECT 1;\nCREATE VIEW v2 AS SELECT 3;"
+                ),
+            },
+        )
+        squash(config, "rev2")
+
+        command.upgrade(config, "head")
+
+        connection = sqlite3.connect(tmp_path / "test.db")
+        try:
+            views = connection.execute("SELECT name FROM sqlite_master WHERE type = 'view'")
+            assert sorted(r[0] for r in views) == ["v1", "v2"]
+        finally:
+            connection.close()
+
+
+def test_cli(alembic_project: Callable[..., Config], capsys) -> None:
+    config = _make_project(alembic_project)
+    main(["-c", str(config.config_file_name), "squash", "rev3"])
+    assert "2 DDLs, 1 replaced and 1 superseded scripts" in capsys.readouterr().out
+
+
+class TestGC:
+    @staticmethod
+    def test_list(alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+        config = _make_project(alembic_project)
+        orphan = tmp_path / "migrations" / "versions" / "ddl" / "2023_01_04_0000_x_deleted.sql"
+        orphan.write_text("SELECT 1;")
+
+        report = gc(config)
+
+        assert report.orphans == [orphan.name]
+        assert report.total_scripts == 5
+        assert report.orphaned_bytes == 9
+        assert report.orphaned_scan_time <= report.scan_time
+        assert orphan.exists()
+
+    @staticmethod
+    def test_remove(alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+        config = _make_project(alembic_project)
+        orphan = tmp_path / "migrations" / "versions" / "ddl" / "2023_01_04_0000_x_deleted.sql"
+        orphan.write_text("SELECT 1;")
+
+        main(["-c", str(config.config_file_name), "gc", "--remove"])
+
+        assert not orphan.exists()
+        assert gc(config).orphans == []
+
+    @staticmethod
+    def test_remove_read_only(
+        alembic_project: Callable[..., Config], tmp_path: Path, capsys
+    ) -> None:
+        archive = tmp_path / "app.zip"
+        config = _make_project(
+            alembic_project, options={"storage": "package", "scripts_location": f"{archive}:ddl"}
+        )
+        with zipfile.ZipFile(archive, "w") as package:
+            package.writestr(f"ddl/{X1}", "CREATE TABLE x (a INTEGER);")
+            package.writestr("ddl/2023_01_04_0000_x_deleted.sql", "SELECT 1;")
+
+        with pytest.raises(SystemExit) as exc_info:
+            main(["-c", str(config.config_file_name), "gc", "--remove"])
+
+        assert exc_info.value.code == 1
+        assert "package storage is read-only" in capsys.readouterr().err
+        assert gc(config).orphans == ["2023_01_04_0000_x_deleted.sql"]
+
+
+REGISTER_X = """
+from alembic_dddl import DDL, register_ddl
+register_ddl(DDL(name="x", sql={sql!r}, down_sql="DROP TABLE x;"))
+"""
+
+
+def test_check(alembic_project: Callable[..., Config], tmp_path: Path, capsys) -> None:
+    revisions = [("rev1", None, f"op.run_ddl_script('{X1}')", "")]
+    scripts = {X1: "CREATE TABLE x (a INTEGER);"}
+    clean = alembic_project(
+        revisions=revisions,
+        scripts=scripts,
+        options={"scripts_location": "migrations/versions/ddl"},
+        env_code=REGISTER_X.format(sql="CREATE TABLE x\n    (a INTEGER);"),
+        root=tmp_path / "clean",
+    )
+    drifted = alembic_project(
+        revisions=revisions,
+        scripts=scripts,
+        env_code=REGISTER_X.format(sql="CREATE TABLE x (b INTEGER);")
+        + 'register_ddl(DDL(name="y", sql="SELECT 1;", down_sql=""))\n'
+        + "from alembic_dddl import register_tenants\n"
+        + "register_tenants(schemas=['tenant_a'])",
+        root=tmp_path / "drifted",
+    )
+    broken = tmp_path / "missing.ini"
+
+    report = check([str(clean.config_file_name), str(drifted.config_file_name), str(broken)])
+
+    clean_result, drifted_result, broken_result = report.results
+    assert clean_result.has_drift is False and clean_result.error is None
+    assert drifted_result.changed == ["x"]
+    assert drifted_result.new == ["y"]
+    assert broken_result.error is not None
+    assert report.has_drift is True
+    assert ddl_registry.ddls == []
+    assert tenant_registry.fan_out is None
+
+    with pytest.raises(SystemExit):
+        main(["check", str(clean.config_file_name), str(drifted.config_file_name)])
+    assert "changed DDL: x" in capsys.readouterr().out
+
+
+def test_check_relative_paths(
+    alembic_project: Callable[..., Config], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Relative paths are resolved against the config directory without changing the cwd"""
+    root = tmp_path / "project"
+    config = alembic_project(
+        revisions=[("rev1", None, f"op.run_ddl_script('{X1}')", "")],
+        scripts={X1: "CREATE TABLE x (a INTEGER);"},
+        options={
+            "scripts_location": "migrations/versions/ddl",
+            "revision_cache": "migrations/revisions.json",
+        },
+        env_code=REGISTER_X.format(sql="CREATE TABLE x (b INTEGER);"),
+        root=root,
+    )
+    ini = root / "alembic.ini"
+    ini.write_text(ini.read_text().replace(f"script_location = {root}/", "script_location = "))
+    assert "script_location = migrations\n" in ini.read_text()
+    other = tmp_path / "other"
+    other.mkdir()
+    monkeypatch.chdir(other)
+
+    def forbidden_chdir(path: str) -> None:
+        raise AssertionError("the working directory must not be changed")
+
+    monkeypatch.setattr(os, "chdir", forbidden_chdir)
+    report = check([os.path.relpath(str(config.config_file_name))])
+
+    (result,) = report.results
+    assert result.error is None
+    assert result.changed == ["x"]
+    assert (root / "migrations" / "revisions.json").exists()
+
+
+def test_state_and_diff(alembic_project: Callable[..., Config], capsys) -> None:
+    config = _make_project(alembic_project)
+
+    assert state_at(config, "rev2") == {"x": X2, "y": Y1}
+    assert [(c.name, c.before, c.after) for c in diff(config, "rev1")] == [("x", X1, X3)]
+
+    main(["-c", str(config.config_file_name), "diff", "base", "rev1"])
+    assert capsys.readouterr().out.splitlines() == [
+        f"added    x: - -> {X1}",
+        f"added    y: - -> {Y1}",
+        "2 DDLs differ between base and rev1",
+    ]
+
+
+@pytest.mark.parametrize("timing_history", ["file", "table"])
+def test_plan(
+    alembic_project: Callable[..., Config], tmp_path: Path, capsys, timing_history: str
+) -> None:
+    options = {
+        "timing_history": timing_history,
+        "timing_history_file": str(tmp_path / "timings.json"),
+    }
+    config = _make_project(alembic_project, options=options)
+    command.upgrade(config, "rev1")
+
+    upgrade_plan = plan(config, "base")
+
+    assert [s.script_name for s in upgrade_plan.scripts] == [X1, Y1, X2, X3]
+    assert [s.samples for s in upgrade_plan.scripts] == [1, 1, 0, 0]
+    assert upgrade_plan.missing == [X2, X3]
+    assert upgrade_plan.total == sum(s.duration or 0 for s in upgrade_plan.scripts) > 0
+    assert len(upgrade_plan.slowest(2)) == 2
+
+    main(["-c", str(config.config_file_name), "plan", "rev1"])
+    output = capsys.readouterr().out
+    assert output.startswith("2 scripts between rev1 and heads, estimated")
+    assert output.endswith(f"No timing data:\n  {X2}\n  {X3}\n")
+
+
+def test_plan_baseline(alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+    config = _make_project(
+        alembic_project,
+        options={"timing_history": "file", "timing_history_file": str(tmp_path / "t.json")},
+    )
+    squash(config, "rev3")
+
+    assert [s.script_name for s in plan(config, None).scripts] == [X3, Y1]
+
+
+def test_plan_reruns(alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+    config = alembic_project(
+        revisions=[
+            ("rev1", None, f"op.run_ddl_script('{X1}')\nop.run_ddl_script('{Y1}')", ""),
+            (
+                "rev2",
+                "rev1",
+                f"op.run_ddl_script('{X2}')\nop.run_ddl_batch(['{Y1}'], max_workers=2)",
+                "",
+            ),
+        ],
+        scripts={},
+        options={"timing_history": "file", "timing_history_file": str(tmp_path / "t.json")},
+    )
+
+    upgrade_plan = plan(config, None)
+
+    assert [s.script_name for s in upgrade_plan.scripts] == [X1, Y1, X2, Y1]
+    assert [s.script_name for s in plan(config, "rev1", None).scripts] == [X2, Y1]
+
+
+def test_export(alembic_project: Callable[..., Config], tmp_path: Path, capsys) -> None:
+    config = _make_project(alembic_project)
+    output = tmp_path / "upgrade.sql"
+
+    report = export(config, str(output))
+
+    assert report.scripts == [X3, Y1]
+    assert report.skipped == [X1, X2]
+    assert report.size == output.stat().st_size
+    sql = output.read_text()
+    assert "CREATE TABLE y (a INTEGER);" in sql
+    assert "CREATE TABLE x (c INTEGER);" in sql
+    assert "CREATE TABLE x (a INTEGER);" not in sql
+    assert "CREATE TABLE x (b INTEGER);" not in sql
+
+    main(["-c", str(config.config_file_name), "export", str(output), "--from", "rev1"])
+    assert capsys.readouterr().out.startswith("Exported 1 scripts to")
+    sql = output.read_text()
+    assert "CREATE TABLE y (a INTEGER);" not in sql
+    assert "CREATE TABLE x (b INTEGER);" not in sql
+    assert "CREATE TABLE x (c INTEGER);" in sql
+
+
+def test_export_intermediate_dependent(
+    alembic_project: Callable[..., Config], tmp_path: Path
+) -> None:
+    """The last script is exported at the revision of the first one, before migrations use it"""
+    config = alembic_project(
+        revisions=[
+            ("r1", None, "op.run_ddl_script('2023_01_01_0000_a_r1.sql')", ""),
+            ("r2", "r1", "op.execute('CREATE TABLE snap AS SELECT x FROM a')", ""),
+            ("r3", "r2", "op.run_ddl_script('2023_01_03_0000_a_r3.sql')", ""),
+        ],
+        scripts={
+            "2023_01_01_0000_a_r1.sql": "CREATE VIEW a AS SELECT 1 AS x;",
+            "2023_01_03_0000_a_r3.sql": "CREATE VIEW a AS SELECT 2 AS x, 3 AS y;",
+        },
+    )
+    output = tmp_path / "upgrade.sql"
+
+    report = export(config, str(output))
+
+    assert report.scripts == ["2023_01_03_0000_a_r3.sql"]
+    assert report.skipped == ["2023_01_01_0000_a_r1.sql"]
+    connection = sqlite3.connect(tmp_path / "exported.db")
+    try:
+        connection.executescript(output.read_text())
+        assert connection.execute("SELECT x FROM snap").fetchall() == [(2,)]
+        assert connection.execute("SELECT x, y FROM a").fetchall() == [(2, 3)]
+    finally:
+        connection.close()
+
+
+def test_export_incremental(alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+    """The last script runs in full, the statements of the skipped script were not applied"""
+    config = alembic_project(
+        revisions=[
+            ("r1", None, "op.run_ddl_script('2023_01_01_0000_f_r1.sql')", ""),
+            ("r2", "r1", "op.run_ddl_script('2023_01_02_0000_f_r2.sql', statements=[1])", ""),
+        ],
+        scripts={
+            "2023_01_01_0000_f_r1.sql": "CREATE VIEW f1 AS SELECT 1;\nCREATE VIEW f2 AS SELECT 2;",
+            "2023_01_02_0000_f_r2.sql": "CREATE VIEW f1 AS SELECT 1;\nCREATE VIEW f2 AS SELECT 3;",
+        },
+    )
+    output = tmp_path / "upgrade.sql"
+
+    export(config, str(output))
+
+    sql = output.read_text()
+    assert "CREATE VIEW f1 AS SELECT 1;" in sql
+    assert "CREATE VIEW f2 AS SELECT 3;" in sql
+    assert "CREATE VIEW f2 AS SELECT 2;" not in sql
+
+
+def test_reshard(alembic_project: Callable[..., Config], tmp_path: Path, capsys) -> None:
+    config = _make_project(alembic_project, options={"layout": "by_name"})
+    scripts_location = Path(load_config(config).scripts_location)
+
+    assert reshard(config) == 4
+    assert sorted(p.name for p in scripts_location.iterdir()) == ["x", "y"]
+
+    command.upgrade(config, "rev1")
+    assert state_at(config) == {"x": X3, "y": Y1}
+
+    main(["-c", str(config.config_file_name), "reshard", "flat"])
+    assert capsys.readouterr().out == "Moved 4 revisioned scripts\n"
+    assert len(list(scripts_location.iterdir())) == 4
@@ -1,6 +1,9 @@
+from pathlib import Path
 from textwrap import dedent
+from typing import Callable, Dict, Optional, Sequence, Tuple
 
 import pytest
+from alembic.config import Config
 
 from alembic_dddl import DDL
 from alembic_dddl.src.models import RevisionedScript
@@ -58,3 +61,97 @@ def sample_ddl3() -> DDL:
         ),
         down_sql="DROP VIEW sample_ddl3;",
     )
+
+
+ENV_PY = """\
+from alembic import context
+from sqlalchemy import MetaData, create_engine
+
+import alembic_dddl  # noqa: F401
+
+config = context.config
+target_metadata = MetaData()
+{env_code}
+if context.is_offline_mode():
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+else:
+    connectable = config.attributes.get("connection") or create_engine(
+        config.get_main_option("sqlalchemy.url")
+    )
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+"""
+
+REVISION_PY = """\
+from alembic import op
+
+revision = {revision!r}
+down_revision = {down_revision!r}
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+{upgrade}
+
+
+def downgrade() -> None:
+{downgrade}
+"""
+
+
+def _indent(code: str) -> str:
+    return "\n".join(f"    {line}" for line in code.splitlines()) or "    pass"
+
+
+@pytest.fixture
+def alembic_project(tmp_path: Path) -> Callable[..., Config]:
+    """
+    Factory of minimal alembic projects on SQLite. Revisions are passed as tuples
+    (revision, down_revision, upgrade code, downgrade code), revisioned scripts as a dictionary
+    filename: sql. `env_code` is added to env.py, e.g. to register DDLs.
+    """
+
+    def make(
+        revisions: Sequence[Tuple[str, Optional[str], str, str]],
+        scripts: Dict[str, str],
+        options: Optional[Dict[str, str]] = None,
+        env_code: str = "",
+        root: Optional[Path] = None,
+    ) -> Config:
+        root = root or tmp_path
+        migrations = root / "migrations"
+        versions = migrations / "versions"
+        ddl_dir = versions / "ddl"
+        ddl_dir.mkdir(parents=True)
+        (migrations / "env.py").write_text(ENV_PY.format(env_code=env_code))
+        for revision, down_revision, upgrade, downgrade in revisions:
+            (versions / f"{revision}_rev.py").write_text(
+                REVISION_PY.format(
+                    revision=revision,
+                    down_revision=down_revision,
+                    upgrade=_indent(upgrade),
+                    downgrade=_indent(downgrade),
+                )
+            )
+        for filename, sql in scripts.items():
+            (ddl_dir / filename).write_text(sql)
+
+        dddl_options = {"scripts_location": str(ddl_dir), **(options or {})}
+        ini = "[alembic]\n"
+        ini += f"script_location = {migrations}\n"
+        ini += f"sqlalchemy.url = sqlite:///{root / 'test.db'}\n\n"
+        ini += "[alembic_dddl]\n"
+        ini += "".join(f"{k} = {v}\n" for k, v in dddl_options.items())
+        (root / "alembic.ini").write_text(ini)
+        return Config(str(root / "alembic.ini"))
+
+    return make
@@ -1,11 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
 from unittest.mock import MagicMock, Mock, patch
 
+import pytest
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+
 from alembic_dddl import DDL
 from alembic_dddl.dddl import (
     DDLRegistry,
     compare_custom_ddl,
     ddl_registry,
+    get_registry,
     register_ddl,
+    use_registry,
 )
 from alembic_dddl.src.models import RevisionedScript
 
@@ -30,6 +38,73 @@ def test_register_ddl(sample_ddl1: DDL) -> None:
     assert ddl_registry.ddls == [sample_ddl1]
 
 
+class TestScopedRegistries:
+    @staticmethod
+    @pytest.fixture(autouse=True)
+    def empty_global_registry() -> Iterator[None]:
+        with patch.object(ddl_registry, "ddls", []):
+            yield
+
+    @staticmethod
+    def test_config_scope(sample_ddl1: DDL, sample_ddl2: DDL) -> None:
+        config = Config()
+        register_ddl(sample_ddl1, scope=config)
+        register_ddl(sample_ddl2, scope=Mock(spec=MigrationContext, config=config))
+
+        assert get_registry(config).ddls == [sample_ddl1, sample_ddl2]
+        assert get_registry(Config()) is ddl_registry
+        assert ddl_registry.ddls == []
+
+    @staticmethod
+    def test_context_without_config(sample_ddl1: DDL) -> None:
+        context = MigrationContext.configure(dialect_name="sqlite", opts={})
+        with pytest.raises(ValueError):
+            register_ddl(sample_ddl1, scope=context)
+        assert get_registry(context) is ddl_registry
+        assert ddl_registry.ddls == []
+
+    @staticmethod
+    def test_use_registry(sample_ddl1: DDL, sample_ddl2: DDL) -> None:
+        config = Config()
+        register_ddl(sample_ddl1, scope=config)
+        with use_registry() as registry:
+            register_ddl(sample_ddl2)
+            assert get_registry() is registry
+            assert get_registry(config).ddls == [sample_ddl1]
+
+        assert registry.ddls == [sample_ddl2]
+        assert ddl_registry.ddls == []
+
+    @staticmethod
+    def test_threads(sample_ddl1: DDL) -> None:
+        shared = DDLRegistry()
+
+        def register(_: int) -> int:
+            with use_registry() as registry:
+                for _ in range(100):
+                    register_ddl(sample_ddl1)
+                    shared.register([sample_ddl1])
+                return len(registry.ddls)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            assert list(pool.map(register, range(8))) == [100] * 8
+        assert len(shared.ddls) == 800
+        assert ddl_registry.ddls == []
+
+    @staticmethod
+    def test_compare_custom_ddl(sample_ddl1: DDL, sample_ddl2: DDL) -> None:
+        config = Config()
+        register_ddl(sample_ddl2, scope=config)
+        autogen_context = MagicMock(opts={"template_args": {"config": config}})
+        comparator_mock = Mock(return_value=Mock(get_changed_ddls=Mock(return_value=[])))
+        with patch.object(ddl_registry, "ddls", [sample_ddl1]):
+            with patch("alembic_dddl.src.comparator.CustomDDLComparator", comparator_mock):
+                compare_custom_ddl(
+                    autogen_context=autogen_context, upgrade_ops=Mock(ops=[]), _=None
+                )
+        assert comparator_mock.call_args.kwargs["ddls"] == [sample_ddl2]
+
+
 def test_compare_custom_ddl(
     sample_ddl1: DDL, sample_ddl2: DDL, sample_ddl3: DDL, rev_script: RevisionedScript
 ) -> None:
@@ -37,7 +112,7 @@ def test_compare_custom_ddl(
     get_changed_ddls_mock = Mock(return_value=changed_ddls)
     upgrade_ops = Mock(ops=[])
     with patch(
-        "alembic_dddl.dddl.CustomDDLComparator",
+        "alembic_dddl.src.comparator.CustomDDLComparator",
         Mock(return_value=Mock(get_changed_ddls=get_changed_ddls_mock)),
     ):
         compare_custom_ddl(autogen_context=MagicMock(), upgrade_ops=upgrade_ops, _=None)
@@ -52,3 +127,49 @@ def test_compare_custom_ddl(
     assert upgrade_ops.ops[2].down_script == sample_ddl3.down_sql
 
     assert upgrade_ops.ops[0].time == upgrade_ops.ops[1].time == upgrade_ops.ops[2].time
+
+
+def test_compare_custom_ddl_scoped(sample_ddl1: DDL, sample_ddl2: DDL) -> None:
+    autogen_context = MagicMock()
+    autogen_context.opts["template_args"]["config"].cmd_opts = Mock(x=["dddl_scope=*2"])
+    comparator_mock = Mock(return_value=Mock(get_changed_ddls=Mock(return_value=[])))
+    with patch.object(ddl_registry, "ddls", [sample_ddl1, sample_ddl2]):
+        with patch("alembic_dddl.src.comparator.CustomDDLComparator", comparator_mock):
+            compare_custom_ddl(autogen_context=autogen_context, upgrade_ops=Mock(ops=[]), _=None)
+    assert comparator_mock.call_args.kwargs["ddls"] == [sample_ddl2]
+
+
+class TestDependencies:
+    @staticmethod
+    def test_registry_graph(sample_ddl1: DDL, sample_ddl2: DDL) -> None:
+        sample_ddl1.depends_on = ("sample_ddl2",)
+        registry = DDLRegistry()
+        registry.register([sample_ddl1, sample_ddl2])
+        assert registry.get_graph().order == ["sample_ddl2", "sample_ddl1"]
+
+    @staticmethod
+    def test_rebuild_dependents(
+        sample_ddl1: DDL, sample_ddl2: DDL, sample_ddl3: DDL, rev_script: RevisionedScript
+    ) -> None:
+        # sample_ddl1 <- sample_ddl2 <- sample_ddl3
+        sample_ddl2.depends_on = ("sample_ddl1",)
+        sample_ddl3.depends_on = ("sample_ddl2",)
+        comparator = Mock(
+            get_changed_ddls=Mock(return_value=[(sample_ddl1, rev_script)]),
+            latest_revisions={"sample_ddl2": rev_script},
+        )
+        upgrade_ops = Mock(ops=[])
+        with patch.object(ddl_registry, "ddls", [sample_ddl3, sample_ddl2, sample_ddl1]):
+            with patch(
+                "alembic_dddl.src.comparator.CustomDDLComparator", Mock(return_value=comparator)
+            ) as comparator_class:
+                compare_custom_ddl(autogen_context=MagicMock(), upgrade_ops=upgrade_ops, _=None)
+
+        assert comparator_class.call_args.kwargs["ddls"] == [sample_ddl1, sample_ddl2, sample_ddl3]
+        assert comparator_class.call_args.kwargs["extra_names"] == []
+        assert len(upgrade_ops.ops) == 1
+        batches = upgrade_ops.ops[0].batches
+        assert len(batches) == 2
+        assert batches[0][0].up_script == sample_ddl1
+        # sample_ddl3 has no revisions, so it's not rebuilt
+        assert batches[1][0].script == rev_script
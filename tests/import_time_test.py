@@ -0,0 +1,129 @@
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Set
+
+import alembic
+from alembic import command
+from alembic.config import Config
+
+LAZY_MODULES = {
+    "sqlite3",
+    "sqlparse",
+    "alembic_dddl.src.baseline",
+    "alembic_dddl.src.comparator",
+    "alembic_dddl.src.data",
+    "alembic_dddl.src.ledger",
+    "alembic_dddl.src.prefetch",
+    "alembic_dddl.src.renderer",
+    "alembic_dddl.src.revision_cache",
+    "alembic_dddl.src.sql",
+    "alembic_dddl.src.storage",
+    "alembic_dddl.src.timings",
+    "alembic_dddl.src.workers",
+}
+
+X1 = "2023_01_01_0000_x_rev1.sql"
+
+REGISTER_X = """
+from alembic_dddl import DDL, register_ddl
+register_ddl(DDL(name="x", sql="CREATE TABLE x (b INTEGER);", down_sql="DROP TABLE x;"))
+"""
+
+# run in a fresh interpreter: the lazy modules loaded after `import alembic_dddl` and after the
+# alembic command, which runs the entry point of alembic_dddl
+PROBE = """
+import json
+import sys
+
+lazy_modules = {lazy_modules!r}
+
+import alembic_dddl
+
+before = sorted(lazy_modules & set(sys.modules))
+
+from alembic import command
+from alembic.config import Config
+
+config = Config({config_path!r})
+{call}
+print(json.dumps({{"before": before, "after": sorted(lazy_modules & set(sys.modules))}}))
+"""
+
+
+def get_imported_modules(statement: str) -> Set[str]:
+    """Run the statement in a fresh interpreter and collect modules from `-X importtime` output."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and line.count("|") == 2:
+            modules.add(line.rsplit("|", 1)[-1].strip())
+    return modules
+
+
+def probe_lazy_modules(config: Config, call: str) -> Dict[str, List[str]]:
+    """Run the alembic command in a fresh interpreter and report the loaded lazy modules."""
+    probe = PROBE.format(
+        lazy_modules=LAZY_MODULES, config_path=str(config.config_file_name), call=call
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_package_import_does_not_load_heavy_modules() -> None:
+    modules = get_imported_modules("import alembic_dddl")
+    assert "alembic_dddl.dddl" in modules
+    assert modules.isdisjoint(LAZY_MODULES)
+
+
+def test_run_ddl_script_loads_lazy_modules(alembic_project: Callable[..., Config]) -> None:
+    config = alembic_project(
+        revisions=[("rev1", None, f"op.run_ddl_script('{X1}')", "")],
+        scripts={X1: "CREATE TABLE x (a INTEGER);"},
+    )
+
+    loaded = probe_lazy_modules(config, "command.upgrade(config, 'head')")
+
+    assert loaded["before"] == []
+    assert {"sqlparse", "alembic_dddl.src.sql", "alembic_dddl.src.storage"} <= set(loaded["after"])
+    # autogenerate modules are not needed to run the migrations
+    assert "alembic_dddl.src.comparator" not in loaded["after"]
+    assert "alembic_dddl.src.renderer" not in loaded["after"]
+
+
+def test_autogenerate_loads_lazy_modules(alembic_project: Callable[..., Config]) -> None:
+    config = alembic_project(
+        revisions=[("rev1", None, f"op.run_ddl_script('{X1}')", "")],
+        scripts={X1: "CREATE TABLE x (a INTEGER);"},
+        env_code=REGISTER_X,
+    )
+    command.upgrade(config, "head")
+    script_location = Path(str(config.get_main_option("script_location")))
+    shutil.copy(
+        Path(alembic.__file__).parent / "templates/generic/script.py.mako", script_location
+    )
+
+    loaded = probe_lazy_modules(
+        config, "command.revision(config, message='sync', autogenerate=True, rev_id='rev2')"
+    )
+
+    assert loaded["before"] == []
+    # the changed DDL was detected by compare_custom_ddl
+    assert "_x_rev2.sql" in (script_location / "versions" / "rev2_sync.py").read_text()
+    assert {
+        "sqlparse",
+        "alembic_dddl.src.comparator",
+        "alembic_dddl.src.renderer",
+        "alembic_dddl.src.revision_cache",
+        "alembic_dddl.src.sql",
+        "alembic_dddl.src.storage",
+    } <= set(loaded["after"])
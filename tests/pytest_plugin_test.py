@@ -0,0 +1,50 @@
+from typing import Callable
+
+import pytest
+from alembic.config import Config
+
+from alembic_dddl import DDL
+from alembic_dddl.pytest_plugin import assert_no_ddl_drift
+
+pytest_plugins = ["pytester"]
+
+SCRIPT_NAME = "2023_01_01_0000_items_rev1.sql"
+SQL = "CREATE TABLE items (id INTEGER);"
+
+TESTS = """
+from sqlalchemy import inspect, text
+
+
+def test_first(dddl_engine):
+    assert inspect(dddl_engine).get_table_names() == ["alembic_version", "items"]
+    with dddl_engine.begin() as connection:
+        connection.execute(text("DROP TABLE items"))
+
+
+def test_second(dddl_engine, dddl_database, dddl_template_database):
+    assert dddl_database != dddl_template_database
+    assert "items" in inspect(dddl_engine).get_table_names()
+"""
+
+
+@pytest.fixture
+def project(alembic_project: Callable[..., Config]) -> Config:
+    return alembic_project(
+        revisions=[("rev1", None, f"op.run_ddl_script('{SCRIPT_NAME}')", "")],
+        scripts={SCRIPT_NAME: SQL},
+    )
+
+
+def test_fixtures(project: Config, pytester: pytest.Pytester) -> None:
+    pytester.makeconftest("pytest_plugins = ['alembic_dddl.pytest_plugin']")
+    pytester.makepyfile(TESTS)
+    result = pytester.runpytest_inprocess(
+        f"--dddl-alembic-config={project.config_file_name}", "-p", "no:cacheprovider"
+    )
+    result.assert_outcomes(passed=2)
+
+
+def test_assert_no_ddl_drift(project: Config) -> None:
+    assert_no_ddl_drift(project, ddls=[DDL(name="items", sql=SQL, down_sql="")])
+    with pytest.raises(AssertionError, match="changed DDL: items"):
+        assert_no_ddl_drift(project, ddls=[DDL(name="items", sql="SELECT 1;", down_sql="")])
@@ -2,18 +2,19 @@ import os
 from collections import namedtuple
 from pathlib import Path
 from textwrap import dedent
-from typing import Dict, List, Union
+from typing import Dict, Iterable, List, Union
 from unittest.mock import Mock, patch
 
 import pytest
 
-from alembic_dddl import DDL
+from alembic_dddl import DDL, DataScript
 from alembic_dddl.src.comparator import (
     CustomDDLComparator,
     DDLVersions,
     RevisionManager,
 )
 from alembic_dddl.src.models import RevisionedScript
+from alembic_dddl.src.storage import DirectoryStorage
 
 MockScript = namedtuple("MockScript", "revision down_revision")
 
@@ -71,6 +72,46 @@ class TestRevisionManager:
         assert rev_man.heads == [rev_tree_simple[0].revision]
         assert rev_man.cur_head == "head"
 
+    @staticmethod
+    def test_init_with_cache(rev_tree_simple: List[MockScript], tmp_path: Path) -> None:
+        autogen_context = gen_autogen_context(rev_tree_simple)
+        script_directory = autogen_context.opts["script"]
+        script_directory.configure_mock(
+            dir=str(tmp_path), version_locations=None, recursive_version_locations=False
+        )
+        cache_path = str(tmp_path / "revisions.json")
+
+        RevisionManager(autogen_context=autogen_context, revision_cache=cache_path)
+        rev_man = RevisionManager(autogen_context=autogen_context, revision_cache=cache_path)
+
+        assert script_directory.walk_revisions.call_count == 1
+        assert script_directory.get_heads.called is False
+        assert rev_man.heads == [rev_tree_simple[0].revision]
+        expected = ["a8f2b6e146a3", "181ce9418692", "4b550063ade3", "a4d24c99c672"]
+        assert rev_man.get_ordered_revisions() == expected
+        assert rev_man.scripts_by_revision is None
+
+    @staticmethod
+    def test_init_with_cached_scripts(rev_tree_simple: List[MockScript], tmp_path: Path) -> None:
+        autogen_context = gen_autogen_context(rev_tree_simple)
+        autogen_context.opts["script"].configure_mock(
+            dir=str(tmp_path), version_locations=None, recursive_version_locations=False
+        )
+        storage = DirectoryStorage(str(DDL_DIR))
+
+        rev_man = RevisionManager(
+            autogen_context=autogen_context,
+            revision_cache=str(tmp_path / "revisions.json"),
+            storage=storage,
+        )
+
+        assert rev_man.scripts_by_revision is not None
+        assert set(rev_man.scripts_by_revision) == {"4b550063ade3", "181ce9418692"}
+        assert [name for _, name in rev_man.scripts_by_revision["181ce9418692"]] == [
+            "sample_ddl2",
+            "sample_ddl4",
+        ]
+
     @staticmethod
     def test_get_ordered_revisions_simple(rev_tree_simple: List[MockScript]) -> None:
         autogen_context = gen_autogen_context(rev_tree_simple)
@@ -118,63 +159,13 @@ class TestRevisionManager:
 
 @pytest.fixture
 def ddl_versions() -> DDLVersions:
-    return DDLVersions(os.path.split(__file__)[0])
-
-
-class TestDDLVersions:
-    @staticmethod
-    def test_get_all_scripts(ddl_versions: DDLVersions) -> None:
-        scripts = {
-            "/2023_01_01_0915_calculate_totals_02d083a6d802.sql",
-            "/2023_02_02_0915_calculate_totals_a6043c53a101.sql",
-            "/2023_02_02_0915_summary_view_a6043c53a101.sql",
-            "/1699860266_check_tax_id_a8f2b6e146a3.sql",
-            "/1703860266_report_a6043c53a101.sql",
-        }
-        not_scripts = {"wrong_script_format.sql", "not_a_script.sql", "skipped.sql"}
-        with patch(
-            "alembic_dddl.src.comparator.glob", Mock(return_value=[*not_scripts, *scripts])
-        ):
-            result = ddl_versions._get_all_scripts()
+    return DDLVersions("/")
 
-        assert set(r.filepath for r in result) == scripts
-
-    @staticmethod
-    def test_group_by_revision(ddl_versions: DDLVersions) -> None:
-        script1 = RevisionedScript(
-            filepath="/2023_01_01_0915_calculate_totals_02d083a6d802.sql",
-            name="calculate_totals",
-            revision="02d083a6d802",
-        )
-        script2 = RevisionedScript(
-            filepath="/2023_02_02_0915_calculate_totals_a6043c53a101.sql",
-            name="calculate_totals",
-            revision="a6043c53a101",
-        )
-        script3 = RevisionedScript(
-            filepath="/2023_02_02_0915_summary_view_a6043c53a101.sql",
-            name="summary_view",
-            revision="a6043c53a101",
-        )
-        script4 = RevisionedScript(
-            filepath="/1699860266_check_tax_id_a8f2b6e146a3.sql",
-            name="check_tax_id",
-            revision="a8f2b6e146a3",
-        )
-        script5 = RevisionedScript(
-            filepath="/1703860266_report_a6043c53a101.sql", name="report", revision="a6043c53a101"
-        )
-        scripts = [script1, script2, script3, script4, script5]
 
-        expected = {
-            "02d083a6d802": [script1],
-            "a6043c53a101": [script2, script3, script5],
-            "a8f2b6e146a3": [script4],
-        }
-
-        result = ddl_versions._group_by_revision(scripts)
-
-        assert result == expected
+def patch_listing(files: Iterable[str]):
+    """Patch the directory listing of the storage with the file names of the paths."""
+    names = [os.path.split(f)[-1] for f in files]
+    return patch.object(DirectoryStorage, "_iter_filenames", Mock(return_value=names))
 
 
 class TestDDLVersionsGetLatestDDLRevisions:
@@ -199,10 +190,39 @@ class TestDDLVersionsGetLatestDDLRevisions:
             ),
         }
 
-        with patch("alembic_dddl.src.comparator.glob", Mock(return_value=scripts)):
+        with patch_listing(scripts):
             result = ddl_versions.get_latest_ddl_revisions(rev_order=rev_order)
         assert result == expected
 
+    @staticmethod
+    def test_cached_scripts(ddl_versions: DDLVersions) -> None:
+        """The cached scripts are used instead of the listing, until all names are found"""
+        scripts_by_revision = {
+            "rev3": (("/1700000000_script2_rev3.sql", "script2"),),
+            "rev2": (
+                ("/1700000000_script1_rev2.sql", "script1"),
+                ("/1700000000_script2_rev2.sql", "script2"),
+            ),
+        }
+        rev_order = ["rev3", "rev2", "rev1"]
+
+        with patch.object(DirectoryStorage, "iter_scripts") as iter_scripts:
+            result = ddl_versions.get_latest_ddl_revisions(
+                rev_order=rev_order,
+                names={"script1", "script2"},
+                scripts_by_revision=scripts_by_revision,
+            )
+
+        assert iter_scripts.called is False
+        assert result == {
+            "script1": RevisionedScript(
+                filepath="/1700000000_script1_rev2.sql", name="script1", revision="rev2"
+            ),
+            "script2": RevisionedScript(
+                filepath="/1700000000_script2_rev3.sql", name="script2", revision="rev3"
+            ),
+        }
+
     @staticmethod
     def test_several_scripts_per_revision(ddl_versions: DDLVersions) -> None:
         rev_order = ["rev3", "rev2", "rev1"]
@@ -226,7 +246,7 @@ class TestDDLVersionsGetLatestDDLRevisions:
             ),
         }
 
-        with patch("alembic_dddl.src.comparator.glob", Mock(return_value=scripts)):
+        with patch_listing(scripts):
             result = ddl_versions.get_latest_ddl_revisions(rev_order=rev_order)
         assert result == expected
 
@@ -249,7 +269,7 @@ class TestDDLVersionsGetLatestDDLRevisions:
             ),
         }
 
-        with patch("alembic_dddl.src.comparator.glob", Mock(return_value=scripts)):
+        with patch_listing(scripts):
             result = ddl_versions.get_latest_ddl_revisions(rev_order=rev_order)
         assert result == expected
 
@@ -270,6 +290,11 @@ def empty_comparator(mock_autogen_context) -> CustomDDLComparator:
 
 
 class TestComparatorScriptsDiffer:
+    @staticmethod
+    @pytest.fixture(autouse=True, params=[False, True], ids=["formatted", "streaming"])
+    def streaming(request: pytest.FixtureRequest, empty_comparator: CustomDDLComparator) -> None:
+        empty_comparator.streaming = request.param
+
     @staticmethod
     def test_same_script(empty_comparator: CustomDDLComparator) -> None:
         script = "SELECT * FROM Customers WHERE customer_name LIKE 'John%';"
@@ -396,6 +421,19 @@ class TestComparatorGetChangedDDLs:
         )
         assert result[2][1] is None
 
+    def test_data_script_compared_exactly(self, empty_comparator: CustomDDLComparator) -> None:
+        script = Mock(read=Mock(return_value="code,name\nDE,Germany\n"))
+        empty_comparator.latest_revisions = {"countries": script}
+        empty_comparator.ddls = {
+            "countries": DataScript(
+                name="countries", sql="code,name\nDE,GERMANY\n", down_sql="", table="countries"
+            )
+        }
+        assert len(empty_comparator.get_changed_ddls()) == 1
+
+        empty_comparator.ddls["countries"].sql = "code,name\nDE,Germany\n"
+        assert empty_comparator.get_changed_ddls() == []
+
 
 class TestComparatorGetLatestRevisions:
     def test_ok(
@@ -405,8 +443,23 @@ class TestComparatorGetLatestRevisions:
         empty_comparator: CustomDDLComparator,
     ) -> None:
         autogen_context = gen_autogen_context(rev_tree_simple)
+        empty_comparator.ddls = {name: Mock() for name in latest_revisions}
         result = empty_comparator._get_latest_revisions(
             ddl_dir=DDL_DIR, autogen_context=autogen_context
         )
 
         assert result == latest_revisions
+
+    def test_unregistered_skipped(
+        self,
+        rev_tree_simple: List[MockScript],
+        rev_script2_new: RevisionedScript,
+        empty_comparator: CustomDDLComparator,
+    ) -> None:
+        autogen_context = gen_autogen_context(rev_tree_simple)
+        empty_comparator.ddls = {"sample_ddl2": Mock()}
+        result = empty_comparator._get_latest_revisions(
+            ddl_dir=DDL_DIR, autogen_context=autogen_context
+        )
+
+        assert result == {"sample_ddl2": rev_script2_new}
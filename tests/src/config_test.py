@@ -35,6 +35,21 @@ def test_process_bools(sample_config_dict: Dict[str, Any]) -> None:
     assert result == expected
 
 
+def test_process_numbers() -> None:
+    config_dict = {
+        "slow_statement_threshold": "0.5",
+        "prefetch_buffer_size": "1024",
+        "scripts_location": "ddl",
+    }
+    expected = {
+        "slow_statement_threshold": 0.5,
+        "prefetch_buffer_size": 1024,
+        "scripts_location": "ddl",
+    }
+    assert DDDLConfig._process_numbers(config_dict) == expected
+    assert DDDLConfig._process_numbers({"slow_statement_threshold": ""}) == {}
+
+
 def test_from_config(mock_alembic_config: Mock) -> None:
     expected = DDDLConfig(
         scripts_location="migrations/versions/ddl_revisions",
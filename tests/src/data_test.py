@@ -0,0 +1,50 @@
+import pytest
+
+from alembic_dddl import DataScript
+from alembic_dddl.src.data import iter_chunks, parse_rows
+
+
+class TestParseRows:
+    @staticmethod
+    def test_csv() -> None:
+        data = "code,name\nDE,Germany\nXX,\n"
+        assert parse_rows(data, "csv") == (
+            ["code", "name"],
+            [{"code": "DE", "name": "Germany"}, {"code": "XX", "name": None}],
+        )
+
+    @staticmethod
+    def test_json() -> None:
+        data = '[{"code": "DE", "population": 84}, {"code": "XX", "name": "Unknown"}]'
+        assert parse_rows(data, "json") == (
+            ["code", "population", "name"],
+            [
+                {"code": "DE", "population": 84, "name": None},
+                {"code": "XX", "population": None, "name": "Unknown"},
+            ],
+        )
+
+    @staticmethod
+    def test_json_not_list() -> None:
+        with pytest.raises(ValueError):
+            parse_rows('{"code": "DE"}', "json")
+
+
+def test_iter_chunks() -> None:
+    rows = [{"x": i} for i in range(5)]
+    assert [len(chunk) for chunk in iter_chunks(rows, 2)] == [2, 2, 1]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"table": ""},
+        {"table": "t", "format": "xml"},
+        {"table": "t", "chunk_size": 0},
+        {"table": "t", "incremental": True},
+        {"table": "t", "execution_mode": "autocommit"},
+    ],
+)
+def test_data_script_validation(kwargs) -> None:
+    with pytest.raises(ValueError):
+        DataScript(name="countries", sql="", down_sql="", **kwargs)
@@ -0,0 +1,83 @@
+import logging
+from typing import List
+from unittest.mock import Mock, patch
+
+import pytest
+
+from alembic_dddl.src.execution import (
+    ExecutionHooks,
+    ScriptSummary,
+    StatementEvent,
+    execute_statements,
+)
+
+STATEMENTS = ["DROP VIEW IF EXISTS v;", "CREATE VIEW v AS SELECT 1;", "SELECT 2;"]
+
+
+@pytest.fixture
+def hooks() -> ExecutionHooks:
+    return ExecutionHooks()
+
+
+def test_executes_all_statements(hooks: ExecutionHooks) -> None:
+    execute = Mock()
+    summary = execute_statements(
+        execute=execute, script_name="script.sql", statements=STATEMENTS, hooks=hooks
+    )
+
+    assert [c.args[0] for c in execute.call_args_list] == STATEMENTS
+    assert summary.script_name == "script.sql"
+    assert summary.statements == 3
+    assert summary.slowest_index is not None
+
+
+def test_hooks(hooks: ExecutionHooks) -> None:
+    before: List[StatementEvent] = []
+    after: List[StatementEvent] = []
+    scripts: List[ScriptSummary] = []
+    hooks.on_before_statement(lambda e: before.append(e.duration))  # type: ignore
+    hooks.on_after_statement(after.append)
+    hooks.on_after_script(scripts.append)
+
+    summary = execute_statements(
+        execute=Mock(), script_name="script.sql", statements=STATEMENTS, hooks=hooks
+    )
+
+    assert before == [None, None, None]
+    assert [e.index for e in after] == [0, 1, 2]
+    assert [e.statement for e in after] == STATEMENTS
+    assert all(e.duration is not None for e in after)
+    assert scripts == [summary]
+
+    hooks.clear()
+    assert not hooks.before_statement and not hooks.after_statement and not hooks.after_script
+
+
+def test_slow_statements_logged(hooks: ExecutionHooks, caplog: pytest.LogCaptureFixture) -> None:
+    # each statement "takes" one second
+    timer = Mock(side_effect=range(100))
+    with patch("alembic_dddl.src.execution.perf_counter", timer):
+        with caplog.at_level(logging.INFO, logger="alembic.alembic_dddl.src.execution"):
+            summary = execute_statements(
+                execute=Mock(),
+                script_name="script.sql",
+                statements=STATEMENTS,
+                slow_statement_threshold=0.5,
+                hooks=hooks,
+            )
+
+    warnings = [r.getMessage() for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(warnings) == 3
+    assert (
+        warnings[1] == 'Slow statement #1 in "script.sql" took 1.000s: CREATE VIEW v AS SELECT 1;'
+    )
+    assert summary.duration == 7
+    assert any("3 statements in 7.000s" in r.getMessage() for r in caplog.records)
+
+
+def test_slow_statements_disabled(hooks: ExecutionHooks, caplog: pytest.LogCaptureFixture) -> None:
+    with caplog.at_level(logging.WARNING, logger="alembic.alembic_dddl.src.execution"):
+        execute_statements(
+            execute=Mock(), script_name="script.sql", statements=STATEMENTS, hooks=hooks
+        )
+    assert not caplog.records
@@ -1,10 +1,21 @@
 import re
-from datetime import datetime
+import sys
+from datetime import datetime, timezone
+from typing import Iterator
 from unittest.mock import patch
 
 import pytest
 
-from alembic_dddl.src.file_format import DateTimeFileFormat, TimestampedFileFormat
+from alembic_dddl.src import file_format
+from alembic_dddl.src.file_format import (
+    FILE_FORMATS,
+    DateTimeFileFormat,
+    FileFormatBase,
+    TimestampedFileFormat,
+    parse_filename,
+    parse_time,
+    register_file_format,
+)
 from alembic_dddl.src.models import RevisionedScript
 
 
@@ -72,3 +83,61 @@ class TestDateTimeFileFormat:
 
         result = DateTimeFileFormat.generate_filename(name=name, revision=revision, time=time)
         assert result == expected
+
+
+def test_match_filename() -> None:
+    result = DateTimeFileFormat.match_filename("2023_01_01_0915_sample_script_name_c7526352.sql")
+
+    assert result == ("sample_script_name", "c7526352")
+    assert result[1] is sys.intern("c7526352")
+    assert DateTimeFileFormat.match_filename("1703860266_name_c7526352.sql") is None
+
+
+class PrefixedFileFormat(FileFormatBase):
+    pattern = re.compile(r"ddl-(?P<revision>[0-9a-f]+)-(?P<name>\w+?)\.sql")
+
+    @staticmethod
+    def generate_filename(name: str, revision: str, time: datetime) -> str:
+        return f"ddl-{revision}-{name}.sql"
+
+
+@pytest.fixture
+def restore_file_formats(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    formats = list(FILE_FORMATS)
+    monkeypatch.setattr(file_format, "_combined_pattern", None)
+    yield
+    FILE_FORMATS[:] = formats
+
+
+def test_parse_time() -> None:
+    assert parse_time("2023_01_01_0915_name_c7526352.sql") == datetime(2023, 1, 1, 9, 15)
+    assert parse_time("1703860266_name_c7526352.sql") == datetime(
+        2023, 12, 29, 14, 31, 6, tzinfo=timezone.utc
+    )
+    assert parse_time("wrong_filename.sql") is None
+
+
+class TestParseFilename:
+    @staticmethod
+    def test_builtin_formats() -> None:
+        assert parse_filename("1703860266_name_c7526352.sql") == ("name", "c7526352")
+        assert parse_filename("2023_01_01_0915_name_c7526352.sql") == ("name", "c7526352")
+        assert parse_filename("ddl-c7526352-name.sql") is None
+        assert parse_filename("wrong_filename.sql") is None
+
+    @staticmethod
+    @pytest.mark.usefixtures("restore_file_formats")
+    def test_register_file_format() -> None:
+        register_file_format(PrefixedFileFormat)
+        register_file_format(PrefixedFileFormat)
+
+        assert FILE_FORMATS.count(PrefixedFileFormat) == 1
+        assert parse_filename("ddl-c7526352-name.sql") == ("name", "c7526352")
+        assert parse_filename("1703860266_name_c7526352.sql") == ("name", "c7526352")
+
+    @staticmethod
+    def test_register_wrong_pattern() -> None:
+        with patch.object(PrefixedFileFormat, "pattern", re.compile(r"ddl-(?P<name>\w+)\.sql")):
+            with pytest.raises(ValueError, match="revision"):
+                register_file_format(PrefixedFileFormat)
+        assert PrefixedFileFormat not in FILE_FORMATS
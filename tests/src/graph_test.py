@@ -0,0 +1,59 @@
+import pytest
+
+from alembic_dddl import DDL
+from alembic_dddl.src.graph import DDLGraph, DDLGraphError
+
+
+def _ddl(name: str, *depends_on: str) -> DDL:
+    return DDL(name=name, sql="", down_sql="", depends_on=depends_on)
+
+
+@pytest.fixture
+def graph() -> DDLGraph:
+    # base <- summary <- report, base <- details, other
+    return DDLGraph(
+        [
+            _ddl("report", "summary"),
+            _ddl("summary", "base"),
+            _ddl("other"),
+            _ddl("details", "base"),
+            _ddl("base"),
+        ]
+    )
+
+
+class TestDDLGraph:
+    @staticmethod
+    def test_order(graph: DDLGraph) -> None:
+        assert graph.order == ["other", "base", "summary", "report", "details"]
+
+    @staticmethod
+    def test_registration_order_kept() -> None:
+        graph = DDLGraph([_ddl("b"), _ddl("a"), _ddl("c")])
+        assert graph.order == ["b", "a", "c"]
+        assert graph.has_dependencies is False
+
+    @staticmethod
+    def test_unknown_dependency() -> None:
+        with pytest.raises(DDLGraphError, match="unknown"):
+            DDLGraph([_ddl("a", "missing")])
+
+    @staticmethod
+    def test_cycle() -> None:
+        with pytest.raises(DDLGraphError, match="a, b"):
+            DDLGraph([_ddl("a", "b"), _ddl("b", "a"), _ddl("c")])
+
+    @staticmethod
+    def test_dependents(graph: DDLGraph) -> None:
+        assert graph.get_dependents(["base"]) == ["summary", "report", "details"]
+        assert graph.get_dependents(["summary", "report"]) == []
+        assert graph.get_dependents(["other"]) == []
+
+    @staticmethod
+    def test_batches(graph: DDLGraph) -> None:
+        assert graph.get_batches(graph.order) == [
+            ["other", "base"],
+            ["summary", "details"],
+            ["report"],
+        ]
+        assert graph.get_batches(["report", "base"]) == [["base"], ["report"]]
@@ -0,0 +1,109 @@
+import pytest
+
+from alembic_dddl.src.history import DDLChange, DDLHistory
+from alembic_dddl.src.revision_cache import CachedRevision
+
+# base <- a1 <- b2 <- merge
+#            <- c3 <-
+REVISIONS = [
+    CachedRevision("d4merge", ("b2", "c3")),
+    CachedRevision("c3", "a1"),
+    CachedRevision("b2", "a1"),
+    CachedRevision("a1", None),
+]
+SCRIPTS = [
+    ("/ddl/2023_01_01_0000_x_a1.sql", "x", "a1"),
+    ("/ddl/2023_01_01_0000_y_a1.sql", "y", "a1"),
+    ("/ddl/2023_01_02_0000_x_b2.sql", "x", "b2"),
+    ("/ddl/2023_01_03_0000_z_c3.sql", "z", "c3"),
+    ("/ddl/2023_01_04_0000_y_d4merge.sql", "y", "d4merge"),
+]
+
+
+@pytest.fixture
+def history() -> DDLHistory:
+    return DDLHistory(revisions=REVISIONS, scripts=SCRIPTS)
+
+
+class TestDDLHistory:
+    @staticmethod
+    def test_resolve(history: DDLHistory) -> None:
+        assert history.resolve("heads") == ["d4merge"]
+        assert history.resolve("base") == []
+        assert history.resolve("d4") == ["d4merge"]
+        with pytest.raises(ValueError, match="unknown"):
+            history.resolve("e5")
+
+    @staticmethod
+    def test_state_at(history: DDLHistory) -> None:
+        assert history.state_at("a1") == {
+            "x": "2023_01_01_0000_x_a1.sql",
+            "y": "2023_01_01_0000_y_a1.sql",
+        }
+        assert history.state_at("c3") == {
+            "x": "2023_01_01_0000_x_a1.sql",
+            "y": "2023_01_01_0000_y_a1.sql",
+            "z": "2023_01_03_0000_z_c3.sql",
+        }
+        assert history.state_at("heads") == {
+            "x": "2023_01_02_0000_x_b2.sql",
+            "y": "2023_01_04_0000_y_d4merge.sql",
+            "z": "2023_01_03_0000_z_c3.sql",
+        }
+        assert history.state_at("base") == {}
+
+    @staticmethod
+    def test_diff(history: DDLHistory) -> None:
+        changes = history.diff("b2", "c3")
+        assert changes == [
+            DDLChange(
+                name="x", before="2023_01_02_0000_x_b2.sql", after="2023_01_01_0000_x_a1.sql"
+            ),
+            DDLChange(name="z", before=None, after="2023_01_03_0000_z_c3.sql"),
+        ]
+        assert [c.status for c in changes] == ["changed", "added"]
+        assert [c.status for c in history.diff("heads", "base")] == ["removed"] * 3
+        assert history.diff("heads", "d4merge") == []
+
+    @staticmethod
+    def test_get_scripts_between(history: DDLHistory) -> None:
+        assert history.get_scripts_between("b2", "heads") == [
+            "2023_01_03_0000_z_c3.sql",
+            "2023_01_04_0000_y_d4merge.sql",
+        ]
+        assert history.get_scripts_between("base", "a1") == [
+            "2023_01_01_0000_x_a1.sql",
+            "2023_01_01_0000_y_a1.sql",
+        ]
+        assert history.get_scripts_between("heads", "heads") == []
+
+    @staticmethod
+    def test_get_replacements_between(history: DDLHistory) -> None:
+        assert history.get_replacements_between("base", "heads") == {
+            "2023_01_01_0000_x_a1.sql": "2023_01_02_0000_x_b2.sql",
+            "2023_01_01_0000_y_a1.sql": "2023_01_04_0000_y_d4merge.sql",
+        }
+        assert history.get_replacements_between("a1", "heads") == {}
+        assert history.get_replacements_between("base", "a1") == {}
+
+    @staticmethod
+    def test_get_replacements_between_skips_intermediate() -> None:
+        history = DDLHistory(
+            revisions=[
+                CachedRevision("c", "b"),
+                CachedRevision("b", "a"),
+                CachedRevision("a", None),
+            ],
+            scripts=[
+                ("/ddl/2023_01_01_0000_x_a.sql", "x", "a"),
+                ("/ddl/2023_01_02_0000_x_b.sql", "x", "b"),
+                ("/ddl/2023_01_03_0000_x_c.sql", "x", "c"),
+            ],
+        )
+        assert history.get_replacements_between("base", "heads") == {
+            "2023_01_01_0000_x_a.sql": "2023_01_03_0000_x_c.sql",
+            "2023_01_02_0000_x_b.sql": None,
+        }
+        assert history.get_replacements_between("a", "heads") == {
+            "2023_01_02_0000_x_b.sql": "2023_01_03_0000_x_c.sql",
+        }
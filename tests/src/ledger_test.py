@@ -0,0 +1,134 @@
+import sqlite3
+from pathlib import Path
+from typing import Callable
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+
+from alembic_dddl.src.ledger import Ledger, content_hash, get_ddl_name
+
+SCRIPT_NAME = "2023_01_01_0000_items_rev1.sql"
+
+
+def test_get_ddl_name() -> None:
+    assert get_ddl_name(SCRIPT_NAME) == "items"
+    assert get_ddl_name("1703585962_report_uptime_8ffde7d40185.sql") == "report_uptime"
+    assert get_ddl_name("custom.sql") == "custom.sql"
+
+
+def test_content_hash() -> None:
+    assert content_hash(["SELECT 1;", "SELECT 2;"]) == content_hash(["SELECT 1;", "SELECT 2;"])
+    assert content_hash(["SELECT 1;", "SELECT 2;"]) != content_hash(["SELECT 1;SELECT 2;"])
+
+
+def test_ledger(tmp_path: Path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    with engine.begin() as connection:
+        ledger = Ledger(connection=connection, table_name="ledger")
+        ledger.create_table()
+        ledger.create_table()
+        assert ledger.get_hash("items") is None
+
+        ledger.record(name="items", script_name="a.sql", hash="1")
+        ledger.record(name="items", script_name="b.sql", hash="2")
+        assert ledger.get_hash("items") == "2"
+
+        ledger.forget("items")
+        assert ledger.get_hash("items") is None
+
+
+def _count_tables(tmp_path: Path) -> int:
+    connection = sqlite3.connect(tmp_path / "test.db")
+    try:
+        return connection.execute(
+            "SELECT count(*) FROM sqlite_master WHERE name = 'items'"
+        ).fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_skip_applied(alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+    config = alembic_project(
+        revisions=[
+            (
+                "rev1",
+                None,
+                f"op.run_ddl_script('{SCRIPT_NAME}', skip_applied=True)",
+                "op.execute('DROP TABLE items')\nop.forget_ddl_script('items')",
+            )
+        ],
+        # fails if executed twice
+        scripts={SCRIPT_NAME: "CREATE TABLE items (id INTEGER);"},
+        options={"use_ledger": "true"},
+    )
+
+    command.upgrade(config, "head")
+    command.stamp(config, "base")
+    command.upgrade(config, "head")
+    assert _count_tables(tmp_path) == 1
+
+    command.downgrade(config, "base")
+    assert _count_tables(tmp_path) == 0
+    command.upgrade(config, "head")
+    assert _count_tables(tmp_path) == 1
+
+
+def test_not_skipped_without_skip_applied(
+    alembic_project: Callable[..., Config], tmp_path: Path
+) -> None:
+    """Old migrations may drop the DDL without forgetting it, the ledger can't be trusted"""
+    config = alembic_project(
+        revisions=[
+            ("rev1", None, f"op.run_ddl_script('{SCRIPT_NAME}')", "op.execute('DROP TABLE items')")
+        ],
+        scripts={SCRIPT_NAME: "CREATE TABLE items (id INTEGER);"},
+        options={"use_ledger": "true"},
+    )
+
+    command.upgrade(config, "head")
+    command.downgrade(config, "base")
+    assert _count_tables(tmp_path) == 0
+    command.upgrade(config, "head")
+    assert _count_tables(tmp_path) == 1
+
+
+def test_rebuild_after_applied_script(
+    alembic_project: Callable[..., Config], tmp_path: Path
+) -> None:
+    """The rebuild re-runs the script of the dependent, which was dropped with its dependency"""
+    b_script = "2023_01_01_0000_b_rev1.sql"
+    config = alembic_project(
+        revisions=[
+            (
+                "rev1",
+                None,
+                f"op.run_ddl_script('{SCRIPT_NAME}', skip_applied=True)\n"
+                f"op.run_ddl_script('{b_script}', skip_applied=True)",
+                "",
+            ),
+            (
+                "rev2",
+                "rev1",
+                "op.run_ddl_script('2023_01_02_0000_items_rev2.sql', skip_applied=True)\n"
+                f"op.run_ddl_script('{b_script}')",
+                "",
+            ),
+        ],
+        scripts={
+            SCRIPT_NAME: "CREATE TABLE items (id INTEGER);",
+            b_script: "CREATE VIEW b AS SELECT id FROM items;",
+            "2023_01_02_0000_items_rev2.sql": (
+                "DROP VIEW b;\nDROP TABLE items;\nCREATE TABLE items (id INTEGER, name TEXT);"
+            ),
+        },
+        options={"use_ledger": "true"},
+    )
+
+    command.upgrade(config, "head")
+
+    connection = sqlite3.connect(tmp_path / "test.db")
+    try:
+        assert connection.execute("SELECT count(*) FROM b").fetchone() == (0,)
+    finally:
+        connection.close()
@@ -1,16 +1,27 @@
 from datetime import datetime
 from pathlib import Path
-from typing import Generator
+from typing import Callable, Generator, Tuple
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine
 
-from alembic_dddl import DDL
+from alembic_dddl import DDL, DataScript
 from alembic_dddl.src.models import RevisionedScript
 from alembic_dddl.src.ops import (
+    DDLBatchError,
+    LoadDataScriptOp,
+    RebuildDDLOp,
+    RunDDLBatchOp,
     RunDDLScriptOp,
+    SyncDDLGraphOp,
     SyncDDLOp,
     render_create_ddl,
+    render_ddl_graph,
+    run_ddl_batch,
     run_ddl_script,
 )
 
@@ -36,19 +47,28 @@ def test_sync_ddl_op(sample_ddl1: DDL, rev_script: RevisionedScript) -> None:
 
 @pytest.fixture
 def mock_revision_script_renderer() -> Generator:
-    with patch("alembic_dddl.src.ops.RevisionedScriptRenderer") as mock_renderer:
+    with patch("alembic_dddl.src.renderer.RevisionedScriptRenderer") as mock_renderer:
         yield mock_renderer
 
 
 @pytest.fixture
 def mock_ddl_renderer() -> Generator:
-    with patch("alembic_dddl.src.ops.DDLRenderer") as mock_renderer:
+    with patch("alembic_dddl.src.renderer.DDLRenderer") as mock_renderer:
         yield mock_renderer
 
 
+@pytest.fixture
+def mock_incremental_renderers() -> Generator:
+    with patch("alembic_dddl.src.renderer.IncrementalDDLRenderer") as mock_ddl_renderer:
+        with patch(
+            "alembic_dddl.src.renderer.IncrementalRevisionedScriptRenderer"
+        ) as mock_script_renderer:
+            yield mock_ddl_renderer, mock_script_renderer
+
+
 @pytest.fixture
 def mock_sql_renderer() -> Generator:
-    with patch("alembic_dddl.src.ops.SQLRenderer") as mock_renderer:
+    with patch("alembic_dddl.src.renderer.SQLRenderer") as mock_renderer:
         yield mock_renderer
 
 
@@ -83,6 +103,43 @@ class TestRenderCreateDDL:
         assert mock_ddl_renderer.called is True
         assert mock_sql_renderer.called is False
 
+    @staticmethod
+    def test_incremental(
+        mock_revision_script_renderer: Mock,
+        mock_ddl_renderer: Mock,
+        mock_incremental_renderers: Tuple[Mock, Mock],
+        sample_ddl1: DDL,
+        rev_script: RevisionedScript,
+    ) -> None:
+        (
+            mock_incremental_ddl_renderer,
+            mock_incremental_script_renderer,
+        ) = mock_incremental_renderers
+        sample_ddl1.incremental = True
+        op = SyncDDLOp(up_script=sample_ddl1, down_script=rev_script, time=datetime.now())
+
+        render_create_ddl(autogen_context=MagicMock(), op=op)
+        render_create_ddl(autogen_context=MagicMock(), op=op.reverse())
+        assert mock_incremental_ddl_renderer.called is True
+        assert mock_incremental_script_renderer.called is True
+        assert mock_revision_script_renderer.called is False
+        assert mock_ddl_renderer.called is False
+
+    @staticmethod
+    def test_incremental_new_ddl(
+        mock_ddl_renderer: Mock,
+        mock_incremental_renderers: Tuple[Mock, Mock],
+        sample_ddl1: DDL,
+    ) -> None:
+        sample_ddl1.incremental = True
+        op = SyncDDLOp(
+            up_script=sample_ddl1, down_script=sample_ddl1.down_sql, time=datetime.now()
+        )
+
+        render_create_ddl(autogen_context=MagicMock(), op=op)
+        assert mock_ddl_renderer.called is True
+        assert mock_incremental_renderers[0].called is False
+
     @staticmethod
     def test_sql(
         mock_revision_script_renderer: Mock,
@@ -116,7 +173,9 @@ class TestRenderCreateDDL:
 
 @pytest.fixture
 def mock_operations() -> Mock:
-    mock_config = Mock(get_section=Mock(return_value={"scripts_location": str(DDL_DIR)}))
+    mock_config = Mock(
+        get_section=Mock(return_value={"scripts_location": str(DDL_DIR)}), attributes={}
+    )
     operations = Mock(get_context=Mock(return_value=Mock(config=mock_config)))
     return operations
 
@@ -140,3 +199,404 @@ class TestRunDDLScript:
         run_ddl_script(operations=mock_operations, operation=op)
 
         assert mock_operations.execute.call_count == 2
+
+    @staticmethod
+    def test_selected_statements(mock_operations: Mock) -> None:
+        op = RunDDLScriptOp(script_name="sample_script_two_stmts.sql", statements=[1])
+        run_ddl_script(operations=mock_operations, operation=op)
+
+        assert mock_operations.execute.call_count == 1
+        assert mock_operations.execute.call_args.args[0].startswith("CREATE")
+
+
+class TestSyncDDLGraphOp:
+    @staticmethod
+    def test_reverse(sample_ddl1: DDL, sample_ddl2: DDL, rev_script: RevisionedScript) -> None:
+        time = datetime.now()
+        base = SyncDDLOp(up_script=sample_ddl1, down_script=rev_script, time=time)
+        dependent = SyncDDLOp(up_script=sample_ddl2, down_script=sample_ddl2.down_sql, time=time)
+        rebuild = RebuildDDLOp(script=rev_script)
+        op = SyncDDLGraphOp(batches=[[base], [dependent, rebuild]])
+
+        reversed_op = op.reverse()
+
+        assert len(reversed_op.batches) == 3
+        assert reversed_op.batches[0][0].up_script == sample_ddl2.down_sql
+        assert reversed_op.batches[1][0].up_script == rev_script
+        assert reversed_op.batches[2][0].script == rev_script
+
+    @staticmethod
+    def test_render_parallel(rev_script: RevisionedScript) -> None:
+        other_script = RevisionedScript(
+            filepath="/path/to/2023_10_06_1522_other_4b550063ade3.sql",
+            name="other",
+            revision="4b550063ade3",
+        )
+        op = SyncDDLGraphOp(
+            batches=[[RebuildDDLOp(script=rev_script), RebuildDDLOp(script=other_script)]]
+        )
+        autogen_context = MagicMock()
+
+        autogen_context.opts["template_args"]["config"].get_section.return_value = {}
+        assert render_ddl_graph(autogen_context, op) == (
+            "op.run_ddl_script('2023_10_06_1522_sample_ddl_4b550063ade3.sql')\n"
+            "op.run_ddl_script('2023_10_06_1522_other_4b550063ade3.sql')"
+        )
+
+        autogen_context.opts["template_args"]["config"].get_section.return_value = {
+            "parallel_batches": "4"
+        }
+        assert render_ddl_graph(autogen_context, op) == (
+            "op.run_ddl_batch(['2023_10_06_1522_sample_ddl_4b550063ade3.sql', "
+            "'2023_10_06_1522_other_4b550063ade3.sql'], max_workers=4)"
+        )
+
+    @staticmethod
+    def test_render_parallel_only_rebuilds(sample_ddl1: DDL, rev_script: RevisionedScript) -> None:
+        other_script = RevisionedScript(
+            filepath="/path/to/2023_10_06_1522_other_4b550063ade3.sql",
+            name="other",
+            revision="4b550063ade3",
+        )
+        changed = SyncDDLOp(up_script=rev_script, down_script=sample_ddl1, time=datetime.now())
+        op = SyncDDLGraphOp(batches=[[changed, RebuildDDLOp(script=other_script)]])
+        autogen_context = MagicMock()
+        autogen_context.opts["template_args"]["config"].get_section.return_value = {
+            "parallel_batches": "4"
+        }
+
+        assert render_ddl_graph(autogen_context, op) == (
+            "op.run_ddl_script('2023_10_06_1522_sample_ddl_4b550063ade3.sql')\n"
+            "op.run_ddl_script('2023_10_06_1522_other_4b550063ade3.sql')"
+        )
+
+
+class TestRunDDLBatch:
+    @staticmethod
+    def test_offline(mock_operations: Mock) -> None:
+        op = RunDDLBatchOp(script_names=["a.sql", "b.sql"])
+        run_ddl_batch(operations=mock_operations, operation=op)
+        assert [c.args[0].script_name for c in mock_operations.invoke.call_args_list] == [
+            "a.sql",
+            "b.sql",
+        ]
+
+    @staticmethod
+    def test_concurrent(mock_operations: Mock, tmp_path: Path) -> None:
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+        mock_operations.get_context.return_value.as_sql = False
+        mock_operations.get_context.return_value.autocommit_block = MagicMock()
+        mock_operations.get_bind.return_value.engine = engine
+        storage = Mock(
+            read=lambda name: {
+                "a.sql": "CREATE TABLE a (x INTEGER);",
+                "b.sql": "CREATE TABLE b (x INTEGER);",
+                "c.sql": "CREATE TABLE a (x INTEGER);",
+            }[name]
+        )
+        op = RunDDLBatchOp(script_names=["a.sql", "b.sql", "c.sql"], max_workers=2)
+
+        with patch("alembic_dddl.src.storage.get_storage", Mock(return_value=storage)):
+            with pytest.raises(DDLBatchError) as e:
+                run_ddl_batch(operations=mock_operations, operation=op)
+
+        assert [name for name, _ in e.value.failures] in (["a.sql"], ["c.sql"])
+        assert set(inspect(engine).get_table_names()) == {"a", "b"}
+        assert mock_operations.execute.called is False
+
+    @staticmethod
+    def test_after_migration_statements(alembic_project: Callable[..., Config]) -> None:
+        """The batch doesn't wait for the locks of the changes made in the migration transaction"""
+        config = alembic_project(
+            revisions=[
+                (
+                    "rev1",
+                    None,
+                    "op.run_ddl_script('2024_01_01_0000_t_rev1.sql')\n"
+                    "op.run_ddl_batch(['2024_01_01_0000_a_rev1.sql', "
+                    "'2024_01_01_0000_b_rev1.sql'], max_workers=2)",
+                    "pass",
+                )
+            ],
+            scripts={
+                "2024_01_01_0000_t_rev1.sql": "CREATE TABLE t (x INTEGER);\n"
+                "INSERT INTO t VALUES (1);",
+                "2024_01_01_0000_a_rev1.sql": "CREATE VIEW a AS SELECT x FROM t;",
+                "2024_01_01_0000_b_rev1.sql": "CREATE VIEW b AS SELECT x FROM t;",
+            },
+        )
+        command.upgrade(config, "head")
+
+        engine = create_engine(config.get_main_option("sqlalchemy.url"))
+        assert set(inspect(engine).get_view_names()) == {"a", "b"}
+
+
+@pytest.mark.parametrize("use_ledger", ["true", "false"])
+def test_render_drop_forgets_ledger(sample_ddl1: DDL, use_ledger: str) -> None:
+    autogen_context = MagicMock()
+    autogen_context.opts["template_args"]["config"].get_section.return_value = {
+        "use_ledger": use_ledger
+    }
+    op = SyncDDLOp(up_script=sample_ddl1.down_sql, down_script=sample_ddl1, time=datetime.now())
+    assert render_create_ddl(autogen_context=autogen_context, op=op) == (
+        "op.execute('DROP VIEW sample_ddl1;')\nop.forget_ddl_script('sample_ddl1')"
+    )
+
+
+def test_render_skip_applied(sample_ddl1: DDL, rev_script: RevisionedScript) -> None:
+    autogen_context = MagicMock()
+    autogen_context.opts["template_args"]["config"].get_section.return_value = {
+        "use_ledger": "true"
+    }
+    op = SyncDDLOp(up_script=rev_script, down_script=sample_ddl1, time=datetime.now())
+    assert render_create_ddl(autogen_context=autogen_context, op=op) == (
+        "op.run_ddl_script('2023_10_06_1522_sample_ddl_4b550063ade3.sql', skip_applied=True)"
+    )
+
+    rebuild = SyncDDLGraphOp(batches=[[RebuildDDLOp(script=rev_script, ddl=sample_ddl1)]])
+    assert render_ddl_graph(autogen_context, rebuild) == (
+        "op.run_ddl_script('2023_10_06_1522_sample_ddl_4b550063ade3.sql')"
+    )
+
+
+class TestExecutionModes:
+    SCRIPT = "2024_01_01_0000_inserts_b.sql"
+
+    @classmethod
+    def make_project(cls, alembic_project: Callable[..., Config], mode: str) -> Config:
+        return alembic_project(
+            revisions=[
+                ("a", None, "op.execute('CREATE TABLE t (x INTEGER)')", "pass"),
+                ("b", "a", f"op.run_ddl_script({cls.SCRIPT!r}, mode={mode!r})", "pass"),
+            ],
+            scripts={cls.SCRIPT: "INSERT INTO t VALUES (1);\nINSERT INTO missing VALUES (2);"},
+        )
+
+    @staticmethod
+    def test_invalid_mode() -> None:
+        with pytest.raises(ValueError):
+            RunDDLScriptOp(script_name="a.sql", mode="unknown")
+        with pytest.raises(ValueError):
+            DDL(name="a", sql="", down_sql="", execution_mode="unknown")
+
+    @classmethod
+    @pytest.mark.parametrize(
+        "mode, rows",
+        [("transaction", 0), ("autocommit", 1), ("per_statement", 1), ("per_script", 0)],
+    )
+    def test_failed_script(
+        cls, alembic_project: Callable[..., Config], tmp_path: Path, mode: str, rows: int
+    ) -> None:
+        config = cls.make_project(alembic_project, mode)
+
+        with pytest.raises(Exception, match="missing"):
+            command.upgrade(config, "head")
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT count(*) FROM t")).scalar() == rows
+        engine.dispose()
+
+    @classmethod
+    @pytest.mark.parametrize(
+        "mode, transactions", [("autocommit", 0), ("per_statement", 2), ("per_script", 1)]
+    )
+    def test_offline(
+        cls,
+        alembic_project: Callable[..., Config],
+        capsys: pytest.CaptureFixture,
+        mode: str,
+        transactions: int,
+    ) -> None:
+        config = cls.make_project(alembic_project, mode)
+
+        command.upgrade(config, "head", sql=True)
+
+        output = capsys.readouterr().out
+        assert "INSERT INTO missing VALUES (2);" in output
+        assert output.count("BEGIN;") == output.count("COMMIT;") == transactions
+
+
+class TestLoadDataScript:
+    SCRIPT = "2024_01_01_0000_countries_b.sql"
+
+    @classmethod
+    def make_project(cls, alembic_project: Callable[..., Config], chunk_size: int) -> Config:
+        upgrade = (
+            f"op.load_data_script({cls.SCRIPT!r}, table='countries', chunk_size={chunk_size})"
+        )
+        return alembic_project(
+            revisions=[
+                ("a", None, "op.execute('CREATE TABLE countries (code TEXT, name TEXT)')", "pass"),
+                ("b", "a", "op.execute(\"INSERT INTO countries VALUES ('XX', 'old')\")", "pass"),
+                ("c", "b", upgrade, "pass"),
+            ],
+            scripts={cls.SCRIPT: "code,name\nDE,Germany\nFR,France\nIT,\n"},
+        )
+
+    @staticmethod
+    def test_op() -> None:
+        operations = Mock()
+        LoadDataScriptOp.load_data_script(operations, "a.sql", table="t", chunk_size=10)
+        op = operations.invoke.call_args.args[0]
+        assert (op.script_name, op.table, op.format, op.chunk_size) == ("a.sql", "t", "csv", 10)
+
+    @classmethod
+    def test_online(cls, alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+        config = cls.make_project(alembic_project, chunk_size=2)
+
+        command.upgrade(config, "head")
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+        with engine.connect() as connection:
+            rows = connection.execute(text("SELECT * FROM countries ORDER BY code")).all()
+        engine.dispose()
+        assert rows == [("DE", "Germany"), ("FR", "France"), ("IT", None)]
+
+    @classmethod
+    def test_chunks(cls, alembic_project: Callable[..., Config]) -> None:
+        config = cls.make_project(alembic_project, chunk_size=2)
+        command.upgrade(config, "b")
+
+        with patch("alembic.ddl.impl.DefaultImpl.bulk_insert", autospec=True) as bulk_insert:
+            command.upgrade(config, "head")
+
+        assert [len(c.args[2]) for c in bulk_insert.call_args_list] == [2, 1]
+
+    @classmethod
+    def test_offline(
+        cls, alembic_project: Callable[..., Config], capsys: pytest.CaptureFixture
+    ) -> None:
+        config = cls.make_project(alembic_project, chunk_size=2)
+
+        command.upgrade(config, "head", sql=True)
+
+        output = capsys.readouterr().out
+        assert "DELETE FROM countries;" in output
+        assert "INSERT INTO countries (code, name) VALUES ('DE', 'Germany');" in output
+        assert "INSERT INTO countries (code, name) VALUES ('IT', NULL);" in output
+
+
+class TestLoadDataScriptByKey:
+    SCRIPT = "2024_01_01_0000_countries_b.sql"
+
+    @classmethod
+    def make_project(
+        cls, alembic_project: Callable[..., Config], countries: str, key: str = ""
+    ) -> Config:
+        upgrade = f"op.load_data_script({cls.SCRIPT!r}, table='countries', chunk_size=1{key})"
+        return alembic_project(
+            revisions=[
+                (
+                    "a",
+                    None,
+                    f"op.execute('CREATE TABLE countries ({countries})')\n"
+                    "op.execute('CREATE TABLE cities (name TEXT, country TEXT "
+                    "REFERENCES countries (code))')\n"
+                    "op.execute(\"INSERT INTO countries VALUES ('DE', 'old'), ('XX', 'old')\")\n"
+                    "op.execute(\"INSERT INTO cities VALUES ('Berlin', 'DE')\")",
+                    "pass",
+                ),
+                ("b", "a", upgrade, "pass"),
+            ],
+            scripts={cls.SCRIPT: "code,name\nDE,Germany\nFR,France\nIT,\n"},
+        )
+
+    @staticmethod
+    def connect(tmp_path: Path) -> Engine:
+        """Engine enforcing the foreign keys"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+        @event.listens_for(engine, "connect")
+        def enable_foreign_keys(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA foreign_keys = ON")
+
+        return engine
+
+    @classmethod
+    def test_referenced_table(cls, alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+        """The referenced rows are updated in place instead of being deleted"""
+        config = cls.make_project(alembic_project, "code TEXT PRIMARY KEY, name TEXT")
+        engine = cls.connect(tmp_path)
+        config.attributes["connection"] = engine
+
+        command.upgrade(config, "head")
+
+        with engine.connect() as connection:
+            countries = connection.execute(text("SELECT * FROM countries ORDER BY code")).all()
+            cities = connection.execute(text("SELECT * FROM cities")).all()
+        engine.dispose()
+        assert countries == [("DE", "Germany"), ("FR", "France"), ("IT", None)]
+        assert cities == [("Berlin", "DE")]
+
+    @classmethod
+    def test_key_columns(cls, alembic_project: Callable[..., Config], tmp_path: Path) -> None:
+        config = cls.make_project(
+            alembic_project, "code TEXT UNIQUE, name TEXT", key=", key=['code']"
+        )
+        engine = cls.connect(tmp_path)
+        config.attributes["connection"] = engine
+
+        command.upgrade(config, "head")
+
+        with engine.connect() as connection:
+            countries = connection.execute(text("SELECT * FROM countries ORDER BY code")).all()
+        engine.dispose()
+        assert countries == [("DE", "Germany"), ("FR", "France"), ("IT", None)]
+
+    @classmethod
+    def test_referenced_without_key(
+        cls, alembic_project: Callable[..., Config], tmp_path: Path
+    ) -> None:
+        config = cls.make_project(alembic_project, "code TEXT UNIQUE, name TEXT")
+        engine = cls.connect(tmp_path)
+        config.attributes["connection"] = engine
+
+        with pytest.raises(ValueError, match="referenced by cities"):
+            command.upgrade(config, "head")
+        engine.dispose()
+
+    @classmethod
+    def test_missing_key_column(cls, alembic_project: Callable[..., Config]) -> None:
+        config = cls.make_project(
+            alembic_project, "code TEXT PRIMARY KEY, name TEXT", key=", key=['id']"
+        )
+        with pytest.raises(ValueError, match="no key columns: id"):
+            command.upgrade(config, "head")
+
+    @classmethod
+    def test_offline(
+        cls, alembic_project: Callable[..., Config], capsys: pytest.CaptureFixture
+    ) -> None:
+        config = cls.make_project(
+            alembic_project, "code TEXT PRIMARY KEY, name TEXT", key=", key=['code']"
+        )
+
+        command.upgrade(config, "head", sql=True)
+
+        output = capsys.readouterr().out
+        assert "DELETE FROM countries WHERE (countries.code NOT IN ('DE', 'FR', 'IT'));" in output
+        assert "UPDATE countries SET name='Germany' WHERE countries.code = 'DE';" in output
+        assert "INSERT INTO countries (code, name) SELECT 'IT' AS anon_1, NULL AS anon_2" in output
+        assert "DELETE FROM countries;" not in output
+
+
+def test_render_data_script(rev_script: RevisionedScript) -> None:
+    data_script = DataScript(name="sample_ddl", sql="", down_sql="", table="t", chunk_size=10)
+    autogen_context = MagicMock()
+    autogen_context.opts["template_args"]["config"].get_section.return_value = {}
+    expected = (
+        "op.load_data_script('2023_10_06_1522_sample_ddl_4b550063ade3.sql', table='t', "
+        "format='csv', chunk_size=10)"
+    )
+
+    op = SyncDDLOp(up_script=rev_script, down_script=data_script, time=datetime.now())
+    assert render_create_ddl(autogen_context=autogen_context, op=op) == expected
+    op = RebuildDDLOp(script=rev_script, ddl=data_script)
+    assert render_ddl_graph(autogen_context, SyncDDLGraphOp(batches=[[op]])) == expected
+
+    keyed = DataScript(name="sample_ddl", sql="", down_sql="", table="t", key=("a", "b"))
+    op = SyncDDLOp(up_script=rev_script, down_script=keyed, time=datetime.now())
+    assert render_create_ddl(autogen_context=autogen_context, op=op).endswith(
+        "chunk_size=1000, key=['a', 'b'])"
+    )
@@ -0,0 +1,224 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List
+from unittest.mock import Mock
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from alembic_dddl.src.prefetch import (
+    ScriptPrefetcher,
+    find_data_scripts,
+    find_executed_scripts,
+    get_prefetcher,
+)
+
+
+class MemoryStorage(Mock):
+    """Storage stub which counts reads"""
+
+    def __init__(self, scripts: Dict[str, str]) -> None:
+        super().__init__()
+        self.scripts = scripts
+        self.reads: List[str] = []
+        self.read_lock = threading.Lock()
+
+    def read(self, script_name: str) -> str:  # type: ignore
+        with self.read_lock:
+            self.reads.append(script_name)
+        return self.scripts[script_name]
+
+
+@pytest.fixture
+def storage() -> MemoryStorage:
+    return MemoryStorage(
+        {
+            "a.sql": "SELECT 1; SELECT 2;",
+            "b.sql": "SELECT 3;",
+            "c.sql": "SELECT 4;",
+        }
+    )
+
+
+class TestScriptPrefetcher:
+    @staticmethod
+    def test_in_order(storage: MemoryStorage) -> None:
+        prefetcher = ScriptPrefetcher(storage, ["a.sql", "b.sql", "c.sql"], 1024).start()
+        assert prefetcher.get("a.sql") == ["SELECT 1;", "SELECT 2;"]
+        assert prefetcher.get("b.sql") == ["SELECT 3;"]
+        assert prefetcher.get("c.sql") == ["SELECT 4;"]
+        assert storage.reads == ["a.sql", "b.sql", "c.sql"]
+
+    @staticmethod
+    def test_unknown_script(storage: MemoryStorage) -> None:
+        prefetcher = ScriptPrefetcher(storage, ["a.sql"], 1024).start()
+        assert prefetcher.get("b.sql") is None
+
+    @staticmethod
+    def test_skipped_scripts(storage: MemoryStorage) -> None:
+        prefetcher = ScriptPrefetcher(storage, ["a.sql", "b.sql", "c.sql"], 1024).start()
+        assert prefetcher.get("c.sql") == ["SELECT 4;"]
+        # already behind the consumer
+        assert prefetcher.get("a.sql") is None
+        assert prefetcher._buffer_size == 0
+
+    @staticmethod
+    def test_buffer_limit(storage: MemoryStorage) -> None:
+        prefetcher = ScriptPrefetcher(storage, ["a.sql", "b.sql", "c.sql"], 1).start()
+        assert prefetcher.get("a.sql") == ["SELECT 1;", "SELECT 2;"]
+        prefetcher._thread.join(timeout=0.2)
+        # only one script is buffered at a time
+        assert prefetcher._thread.is_alive()
+        assert len(prefetcher._buffer) == 1
+        assert prefetcher.get("b.sql") == ["SELECT 3;"]
+        assert prefetcher.get("c.sql") == ["SELECT 4;"]
+        prefetcher._thread.join(timeout=1)
+        assert not prefetcher._thread.is_alive()
+
+    @staticmethod
+    def test_read_error(storage: MemoryStorage) -> None:
+        prefetcher = ScriptPrefetcher(storage, ["missing.sql", "a.sql"], 1024).start()
+        assert prefetcher.get("missing.sql") is None
+        assert prefetcher.get("a.sql") == ["SELECT 1;", "SELECT 2;"]
+
+    @staticmethod
+    def test_data_scripts(storage: MemoryStorage) -> None:
+        prefetcher = ScriptPrefetcher(storage, ["a.sql", "b.sql"], 1024, data_scripts=["a.sql"])
+        prefetcher.start()
+        # data scripts are not split into statements
+        assert prefetcher.get_source("a.sql") == "SELECT 1; SELECT 2;"
+        assert prefetcher.get_source("b.sql") is None
+        assert storage.reads == ["a.sql", "b.sql"]
+
+    @staticmethod
+    def test_close(storage: MemoryStorage) -> None:
+        prefetcher = ScriptPrefetcher(storage, ["a.sql", "b.sql", "c.sql"], 1).start()
+        prefetcher.close()
+        prefetcher._thread.join(timeout=1)
+        assert not prefetcher._thread.is_alive()
+        assert prefetcher.get("c.sql") is None
+
+
+def test_find_data_scripts(tmp_path: Path) -> None:
+    revision = tmp_path / "rev.py"
+    revision.write_text(
+        "def upgrade():\n"
+        "    op.run_ddl_script('a.sql')\n"
+        "    op.load_data_script('b.csv', table='b')\n"
+        "\n\n"
+        "def downgrade():\n"
+        "    op.load_data_script('c.csv', table='c')\n"
+    )
+    assert find_data_scripts(str(revision)) == ["b.csv"]
+    assert find_data_scripts(str(tmp_path / "missing.py")) == []
+
+
+def test_find_executed_scripts(tmp_path: Path) -> None:
+    revision = tmp_path / "rev.py"
+    revision.write_text(
+        "def upgrade():\n"
+        "    op.run_ddl_script('a.sql')\n"
+        "    op.run_ddl_batch(['b.sql', \"c.sql\"], max_workers=2)\n"
+        "    op.load_data_script('d.csv', table='d')\n"
+        "    op.run_ddl_script('a.sql', statements=[1])\n"
+        "\n\n"
+        "def downgrade():\n"
+        "    op.run_ddl_script('e.sql')\n"
+    )
+    assert find_executed_scripts(str(revision)) == ["a.sql", "b.sql", "c.sql", "d.csv", "a.sql"]
+    assert find_executed_scripts(str(tmp_path / "missing.py")) == []
+
+
+def test_get_prefetcher_failed_plan(storage: MemoryStorage) -> None:
+    context = Mock(script=Mock(iterate_revisions=Mock(side_effect=ValueError)))
+    assert get_prefetcher(context, storage, 1024) is None
+    assert get_prefetcher(context, storage, 1024) is None
+    assert context.script.iterate_revisions.call_count == 1
+
+
+# records the plan of the running migration in the config attributes
+RECORD_PLAN = (
+    "from alembic_dddl.src.prefetch import plan_upgrade_scripts\n"
+    "op.get_context().config.attributes.setdefault('plans', []).append(\n"
+    "    plan_upgrade_scripts(op.get_context())\n"
+    ")"
+)
+
+
+def make_planned_project(alembic_project: Callable[..., Config]) -> Config:
+    return alembic_project(
+        revisions=[
+            ("aaaa", None, RECORD_PLAN + "\nop.run_ddl_script('2024_01_01_0000_v_aaaa.sql')", ""),
+            (
+                "bbbb",
+                "aaaa",
+                "op.run_ddl_batch(['2024_01_02_0000_v_bbbb.sql', '2024_01_02_0000_w_bbbb.sql'])\n"
+                "op.execute('CREATE TABLE d (id INTEGER PRIMARY KEY, v TEXT)')\n"
+                "op.load_data_script('2024_01_02_0000_d_bbbb.sql', table='d')",
+                RECORD_PLAN,
+            ),
+        ],
+        scripts={
+            "2024_01_01_0000_v_aaaa.sql": "CREATE VIEW v AS SELECT 1 AS x;",
+            "2024_01_02_0000_v_bbbb.sql": "DROP VIEW v; CREATE VIEW v AS SELECT 2 AS x;",
+            "2024_01_02_0000_w_bbbb.sql": "CREATE VIEW w AS SELECT 3 AS x;",
+            "2024_01_02_0000_d_bbbb.sql": "id,v\n1,a\n2,b\n",
+        },
+        options={"prefetch": "true"},
+    )
+
+
+def test_plan_upgrade_scripts(alembic_project: Callable[..., Config]) -> None:
+    config = make_planned_project(alembic_project)
+    command.upgrade(config, "head")
+
+    assert config.attributes["plans"] == [
+        [
+            ("2024_01_01_0000_v_aaaa.sql", False),
+            ("2024_01_02_0000_v_bbbb.sql", False),
+            ("2024_01_02_0000_w_bbbb.sql", False),
+            ("2024_01_02_0000_d_bbbb.sql", True),
+        ]
+    ]
+    url = config.get_main_option("sqlalchemy.url")
+    with sqlite3.connect(url[len("sqlite:///") :]) as connection:
+        assert connection.execute("SELECT x FROM v").fetchone() == (2,)
+        assert connection.execute("SELECT id, v FROM d ORDER BY id").fetchall() == [
+            (1, "a"),
+            (2, "b"),
+        ]
+
+
+def test_plan_upgrade_scripts_downgrade(alembic_project: Callable[..., Config]) -> None:
+    config = make_planned_project(alembic_project)
+    command.upgrade(config, "head")
+    config.attributes["plans"] = []
+
+    command.downgrade(config, "aaaa")
+
+    assert config.attributes["plans"] == [[]]
+
+
+def test_upgrade_with_prefetch(alembic_project: Callable[..., Config]) -> None:
+    config = alembic_project(
+        revisions=[
+            ("aaaa", None, "op.run_ddl_script('2024_01_01_0000_v_aaaa.sql')", "pass"),
+            (
+                "bbbb",
+                "aaaa",
+                "op.run_ddl_script('2024_01_02_0000_v_bbbb.sql')",
+                "op.run_ddl_script('2024_01_01_0000_v_aaaa.sql')",
+            ),
+        ],
+        scripts={
+            "2024_01_01_0000_v_aaaa.sql": "DROP VIEW IF EXISTS v; CREATE VIEW v AS SELECT 1 AS x;",
+            "2024_01_02_0000_v_bbbb.sql": "DROP VIEW IF EXISTS v; CREATE VIEW v AS SELECT 2 AS x;",
+        },
+        options={"prefetch": "true"},
+    )
+    command.upgrade(config, "head")
+    url = config.get_main_option("sqlalchemy.url")
+    with sqlite3.connect(url[len("sqlite:///") :]) as connection:
+        assert connection.execute("SELECT x FROM v").fetchone() == (2,)
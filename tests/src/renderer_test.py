@@ -3,13 +3,19 @@ from pathlib import Path
 from textwrap import dedent
 from unittest.mock import mock_open, patch
 
-from alembic_dddl import DDL
+import pytest
+
+from alembic_dddl import DDL, DataScript
 from alembic_dddl.src.file_format import TimestampedFileFormat
 from alembic_dddl.src.renderer import (
+    DataScriptRenderer,
     DDLRenderer,
+    IncrementalDDLRenderer,
+    IncrementalRevisionedScriptRenderer,
     RevisionedScript,
     RevisionedScriptRenderer,
     SQLRenderer,
+    render_run_ddl_script,
 )
 
 DDL_DIR = Path(__file__).parent / "ddl"
@@ -22,6 +28,25 @@ def test_revisioned_script_renderer(rev_script: RevisionedScript) -> None:
     assert renderer.render() == expected
 
 
+@pytest.mark.parametrize(
+    "statements, mode, expected",
+    [
+        (None, "transaction", "op.run_ddl_script('a.sql')"),
+        ([1, 2], "transaction", "op.run_ddl_script('a.sql', statements=[1, 2])"),
+        (None, "autocommit", "op.run_ddl_script('a.sql', mode='autocommit')"),
+        ([0], "per_script", "op.run_ddl_script('a.sql', statements=[0], mode='per_script')"),
+    ],
+)
+def test_render_run_ddl_script(statements, mode: str, expected: str) -> None:
+    assert render_run_ddl_script("a.sql", statements=statements, mode=mode) == expected
+
+
+def test_render_run_ddl_script_skip_applied() -> None:
+    assert render_run_ddl_script("a.sql", statements=[1], skip_applied=True) == (
+        "op.run_ddl_script('a.sql', statements=[1], skip_applied=True)"
+    )
+
+
 class TestSQLRenderer:
     @staticmethod
     def test_render_oneline() -> None:
@@ -85,8 +110,8 @@ class TestDDLRenderer:
         expected_filepath = str(DDL_DIR / expected_filename)
         expected_result = f"op.run_ddl_script('{expected_filename}')"
 
-        with patch("alembic_dddl.src.renderer.ensure_dir") as mock_ensure_dir:
-            with patch("alembic_dddl.src.renderer.open", mock_open()) as mopen:
+        with patch("alembic_dddl.src.storage.ensure_dir") as mock_ensure_dir:
+            with patch("alembic_dddl.src.storage.open", mock_open()) as mopen:
                 result = renderer.render()
                 assert mock_ensure_dir.called is True
                 mopen.assert_called_once_with(expected_filepath, "w")
@@ -107,10 +132,98 @@ class TestDDLRenderer:
         expected_filepath = str(DDL_DIR / expected_filename)
         expected_result = f"op.run_ddl_script('{expected_filename}')"
 
-        with patch("alembic_dddl.src.renderer.ensure_dir") as mock_ensure_dir:
-            with patch("alembic_dddl.src.renderer.open", mock_open()) as mopen:
+        with patch("alembic_dddl.src.storage.ensure_dir") as mock_ensure_dir:
+            with patch("alembic_dddl.src.storage.open", mock_open()) as mopen:
                 result = renderer.render()
                 assert mock_ensure_dir.called is True
                 mopen.assert_called_once_with(expected_filepath, "w")
 
         assert result == expected_result
+
+
+OLD_LIBRARY = """\
+CREATE OR REPLACE FUNCTION func_a() RETURNS int AS $$ SELECT 1 $$ LANGUAGE sql;
+CREATE OR REPLACE FUNCTION func_b() RETURNS int AS $$ SELECT 2 $$ LANGUAGE sql;
+CREATE OR REPLACE FUNCTION func_c() RETURNS int AS $$ SELECT 3 $$ LANGUAGE sql;
+"""
+
+NEW_LIBRARY = """\
+CREATE OR REPLACE FUNCTION func_a() RETURNS int AS $$ SELECT 1 $$ LANGUAGE sql;
+CREATE OR REPLACE FUNCTION func_b() RETURNS int AS $$ SELECT 22 $$ LANGUAGE sql;
+"""
+
+
+class TestIncrementalDDLRenderer:
+    @staticmethod
+    def render(old: str, new: str) -> str:
+        ddl = DDL(name="library", sql=new, down_sql="", incremental=True)
+        previous = RevisionedScript(
+            filepath="/2023_01_01_1215_library_0123456789ab.sql",
+            name="library",
+            revision="0123456789ab",
+        )
+        renderer = IncrementalDDLRenderer(
+            ddl=ddl,
+            previous=previous,
+            scripts_location=str(DDL_DIR),
+            revision_id="abcdef123",
+            time=datetime(2023, 1, 1, 12, 15),
+            use_timestamps=False,
+            ignore_comments=False,
+        )
+        with patch.object(RevisionedScript, "read", return_value=old):
+            with patch("alembic_dddl.src.storage.ensure_dir"):
+                with patch("alembic_dddl.src.storage.open", mock_open()) as mopen:
+                    result = renderer.render()
+                    mopen().write.assert_called_once_with(new)
+        return result
+
+    def test_changed_statements(self) -> None:
+        expected = (
+            "op.execute('DROP FUNCTION IF EXISTS func_c();')\n"
+            "op.run_ddl_script('2023_01_01_1215_library_abcdef123.sql', statements=[1])"
+        )
+        assert self.render(old=OLD_LIBRARY, new=NEW_LIBRARY) == expected
+
+    def test_full_script_fallback(self) -> None:
+        old = "DROP VIEW IF EXISTS v; CREATE VIEW v AS SELECT 1;"
+        new = "DROP VIEW IF EXISTS v; CREATE VIEW v AS SELECT 2;"
+        expected = "op.run_ddl_script('2023_01_01_1215_library_abcdef123.sql')"
+        assert self.render(old=old, new=new) == expected
+
+    def test_nothing_to_execute(self) -> None:
+        reformatted = NEW_LIBRARY.replace(" AS", "\n    AS")
+        assert self.render(old=NEW_LIBRARY, new=reformatted) == "pass"
+
+
+def test_incremental_revisioned_script_renderer(rev_script: RevisionedScript) -> None:
+    ddl = DDL(name="sample_ddl", sql=NEW_LIBRARY, down_sql="", incremental=True)
+    renderer = IncrementalRevisionedScriptRenderer(
+        script=rev_script, ddl=ddl, ignore_comments=False
+    )
+    expected = (
+        "op.run_ddl_script('2023_10_06_1522_sample_ddl_4b550063ade3.sql', statements=[1, 2])"
+    )
+    with patch.object(RevisionedScript, "read", return_value=OLD_LIBRARY):
+        assert renderer.render() == expected
+
+
+def test_data_script_renderer() -> None:
+    data_script = DataScript(
+        name="countries", sql="code\nDE\n", down_sql="", table="ref.countries", format="csv"
+    )
+    renderer = DataScriptRenderer(
+        ddl=data_script,
+        scripts_location=str(DDL_DIR),
+        revision_id="abcdef123",
+        time=datetime(2023, 1, 1, 12, 15),
+        use_timestamps=False,
+    )
+    expected = (
+        "op.load_data_script('2023_01_01_1215_countries_abcdef123.sql', table='ref.countries', "
+        "format='csv', chunk_size=1000)"
+    )
+    with patch("alembic_dddl.src.storage.ensure_dir"):
+        with patch("alembic_dddl.src.storage.open", mock_open()) as mopen:
+            assert renderer.render() == expected
+            mopen().write.assert_called_once_with("code\nDE\n")
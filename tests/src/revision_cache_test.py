@@ -0,0 +1,171 @@
+import os
+from collections import namedtuple
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from alembic_dddl.src.revision_cache import (
+    CachedRevision,
+    RevisionCache,
+    get_heads,
+    get_scripts_by_revision,
+)
+from alembic_dddl.src.storage import DirectoryStorage
+
+MockScript = namedtuple("MockScript", "revision down_revision")
+
+
+@pytest.fixture
+def versions_dir(tmp_path: Path) -> Path:
+    versions = tmp_path / "versions"
+    versions.mkdir()
+    (versions / "a4d24c99c672_initial.py").write_text("# initial")
+    (versions / "4b550063ade3_second.py").write_text("# second")
+    return versions
+
+
+@pytest.fixture
+def script_directory(versions_dir: Path) -> Mock:
+    return Mock(
+        dir=str(versions_dir.parent),
+        version_locations=None,
+        recursive_version_locations=False,
+        walk_revisions=Mock(
+            return_value=[
+                MockScript("d07f839a619e", ("1e1166bc4bfb", "02d083a6d802")),
+                MockScript("4b550063ade3", "a4d24c99c672"),
+                MockScript("a4d24c99c672", None),
+            ]
+        ),
+    )
+
+
+@pytest.fixture
+def cache(tmp_path: Path, script_directory: Mock) -> RevisionCache:
+    return RevisionCache(
+        cache_path=str(tmp_path / "cache" / "revisions.json"), script_directory=script_directory
+    )
+
+
+class TestRevisionCache:
+    @staticmethod
+    def test_miss_then_hit(cache: RevisionCache, script_directory: Mock) -> None:
+        expected = [
+            CachedRevision("d07f839a619e", ("1e1166bc4bfb", "02d083a6d802")),
+            CachedRevision("4b550063ade3", "a4d24c99c672"),
+            CachedRevision("a4d24c99c672", None),
+        ]
+        assert cache.get_revisions() == expected
+        assert script_directory.walk_revisions.call_count == 1
+
+        assert cache.get_revisions() == expected
+        assert script_directory.walk_revisions.call_count == 1
+
+    @staticmethod
+    def test_invalidated_by_new_file(
+        cache: RevisionCache, script_directory: Mock, versions_dir: Path
+    ) -> None:
+        cache.get_revisions()
+        (versions_dir / "181ce9418692_third.py").write_text("# third")
+        cache.get_revisions()
+        assert script_directory.walk_revisions.call_count == 2
+
+    @staticmethod
+    def test_invalidated_by_mtime(
+        cache: RevisionCache, script_directory: Mock, versions_dir: Path
+    ) -> None:
+        cache.get_revisions()
+        path = versions_dir / "4b550063ade3_second.py"
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        cache.get_revisions()
+        assert script_directory.walk_revisions.call_count == 2
+
+    @staticmethod
+    def test_corrupted_cache(cache: RevisionCache, script_directory: Mock) -> None:
+        os.makedirs(os.path.dirname(cache.cache_path))
+        with open(cache.cache_path, "w") as f:
+            f.write("not json")
+        assert len(cache.get_revisions()) == 3
+        assert script_directory.walk_revisions.call_count == 1
+
+
+class TestCachedScripts:
+    @staticmethod
+    @pytest.fixture
+    def storage(tmp_path: Path) -> DirectoryStorage:
+        ddl_dir = tmp_path / "ddl"
+        ddl_dir.mkdir()
+        (ddl_dir / "2023_01_01_0000_x_a4d24c99c672.sql").write_text("SELECT 1;")
+        (ddl_dir / "2023_01_02_0000_x_4b550063ade3.sql").write_text("SELECT 2;")
+        (ddl_dir / "2023_01_02_0000_orphan_0123456789ab.sql").write_text("SELECT 3;")
+        return DirectoryStorage(str(ddl_dir))
+
+    @staticmethod
+    def test_miss_then_hit(
+        tmp_path: Path, script_directory: Mock, storage: DirectoryStorage, monkeypatch
+    ) -> None:
+        cache = RevisionCache(
+            cache_path=str(tmp_path / "revisions.json"),
+            script_directory=script_directory,
+            storage=storage,
+        )
+        expected = {
+            "4b550063ade3": ((f"{storage.location}/2023_01_02_0000_x_4b550063ade3.sql", "x"),),
+            "a4d24c99c672": ((f"{storage.location}/2023_01_01_0000_x_a4d24c99c672.sql", "x"),),
+        }
+        assert get_scripts_by_revision(cache.get_revisions()) == expected
+
+        iter_scripts = Mock(side_effect=AssertionError("the storage is listed"))
+        monkeypatch.setattr(storage, "iter_scripts", iter_scripts)
+        assert get_scripts_by_revision(cache.get_revisions()) == expected
+        assert script_directory.walk_revisions.call_count == 1
+
+    @staticmethod
+    def test_invalidated_by_new_script(
+        tmp_path: Path, script_directory: Mock, storage: DirectoryStorage
+    ) -> None:
+        cache = RevisionCache(
+            cache_path=str(tmp_path / "revisions.json"),
+            script_directory=script_directory,
+            storage=storage,
+        )
+        cache.get_revisions()
+        os.utime(storage.location, ns=(0, 0))
+        (Path(storage.location) / "2023_01_03_0000_y_4b550063ade3.sql").write_text("SELECT 4;")
+
+        scripts = get_scripts_by_revision(cache.get_revisions())
+
+        assert scripts is not None
+        assert [name for _, name in scripts["4b550063ade3"]] == ["x", "y"]
+        assert script_directory.walk_revisions.call_count == 2
+
+    @staticmethod
+    def test_not_cached_without_storage(cache: RevisionCache) -> None:
+        assert get_scripts_by_revision(cache.get_revisions()) is None
+        assert get_scripts_by_revision(cache.get_revisions()) is None
+
+    @staticmethod
+    def test_not_cached_without_fingerprint(
+        tmp_path: Path, script_directory: Mock, storage: DirectoryStorage, monkeypatch
+    ) -> None:
+        monkeypatch.setattr(storage, "fingerprint", Mock(return_value=None))
+        cache = RevisionCache(
+            cache_path=str(tmp_path / "revisions.json"),
+            script_directory=script_directory,
+            storage=storage,
+        )
+        assert get_scripts_by_revision(cache.get_revisions()) is None
+
+
+def test_get_heads() -> None:
+    revisions = [
+        CachedRevision("fa60c3c43112", "d07f839a619e"),
+        CachedRevision("d07f839a619e", ("1e1166bc4bfb", "02d083a6d802")),
+        CachedRevision("b3a1c0ffee00", "02d083a6d802"),
+        CachedRevision("1e1166bc4bfb", "a4d24c99c672"),
+        CachedRevision("02d083a6d802", "a4d24c99c672"),
+        CachedRevision("a4d24c99c672", None),
+    ]
+    assert get_heads(revisions) == ["fa60c3c43112", "b3a1c0ffee00"]
@@ -0,0 +1,62 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from alembic_dddl import DDL
+from alembic_dddl.src.scope import DDLScope
+
+
+@pytest.fixture
+def ddl() -> DDL:
+    return DDL(name="report_sales", sql="", down_sql="", tags=("reports", "sales"))
+
+
+@pytest.mark.parametrize(
+    "scope, expected",
+    [
+        (DDLScope(), True),
+        (DDLScope(patterns=("report_*",)), True),
+        (DDLScope(patterns=("orders", "report_s*")), True),
+        (DDLScope(patterns=("orders",)), False),
+        (DDLScope(tags=("sales",)), True),
+        (DDLScope(tags=("billing",)), False),
+        (DDLScope(patterns=("report_*",), tags=("billing",)), False),
+        (DDLScope(patterns=("report_*",), tags=("billing", "reports")), True),
+    ],
+)
+def test_matches(ddl: DDL, scope: DDLScope, expected: bool) -> None:
+    assert scope.matches(ddl) is expected
+
+
+def test_is_limited() -> None:
+    assert DDLScope().is_limited is False
+    assert DDLScope(tags=("reports",)).is_limited is True
+
+
+class TestFromConfig:
+    @staticmethod
+    def test_x_arguments() -> None:
+        config = Mock(cmd_opts=Mock(x=["dddl_scope=report_*, orders", "dddl_tags=sales", "a"]))
+        assert DDLScope.from_config(config) == DDLScope(
+            patterns=("report_*", "orders"), tags=("sales",)
+        )
+
+    @staticmethod
+    def test_env_variables() -> None:
+        config = Mock(cmd_opts=None)
+        env = {"ALEMBIC_DDDL_SCOPE": "report_*", "ALEMBIC_DDDL_TAGS": "sales,reports"}
+        with patch.dict("os.environ", env):
+            assert DDLScope.from_config(config) == DDLScope(
+                patterns=("report_*",), tags=("sales", "reports")
+            )
+
+    @staticmethod
+    def test_x_arguments_override_env() -> None:
+        config = Mock(cmd_opts=Mock(x=["dddl_scope=orders"]))
+        with patch.dict("os.environ", {"ALEMBIC_DDDL_SCOPE": "report_*"}):
+            assert DDLScope.from_config(config).patterns == ("orders",)
+
+    @staticmethod
+    def test_empty() -> None:
+        with patch.dict("os.environ", {}, clear=True):
+            assert DDLScope.from_config(Mock(cmd_opts=Mock(x=None))) == DDLScope()
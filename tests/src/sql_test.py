@@ -0,0 +1,195 @@
+from textwrap import dedent
+
+import pytest
+
+from alembic_dddl.src.sql import (
+    StatementsDiff,
+    diff_statements,
+    get_drop_statement,
+    iter_normalized_statements,
+    normalize,
+    normalize_cache,
+    normalized_differ,
+    split_statements,
+)
+
+FUNC_A = "CREATE OR REPLACE FUNCTION func_a() RETURNS int AS $$ SELECT 1 $$ LANGUAGE sql;"
+FUNC_B = "CREATE OR REPLACE FUNCTION func_b(x int) RETURNS int AS $$ SELECT x $$ LANGUAGE sql;"
+FUNC_B_CHANGED = (
+    "create or replace function func_b(x int) returns int as $$ select x + 1 $$ language sql;"
+)
+FUNC_C = "CREATE OR REPLACE FUNCTION func_c() RETURNS int AS $$ SELECT 3 $$ LANGUAGE sql;"
+
+
+def test_split_statements() -> None:
+    assert split_statements("SELECT 1; SELECT 2;") == ["SELECT 1;", "SELECT 2;"]
+
+
+def test_normalize() -> None:
+    assert normalize("select  *\nfrom T -- comment", strip_comments=True) == "SELECT *\n  FROM t"
+
+
+def test_iter_normalized_statements() -> None:
+    sql = "select  *\nfrom T -- comment\n;\nselect 1;"
+    statements = list(iter_normalized_statements(sql, strip_comments=True))
+    assert len(statements) == 2
+    assert "".join(statements) == normalize(sql, strip_comments=True)
+
+
+@pytest.mark.parametrize(
+    "one, two, expected",
+    [
+        ("SELECT a FROM t;", "select a\n  from T;", False),
+        ("SELECT a FROM t;", "SELECT b FROM t;", True),
+        ("SELECT a FROM t;", "SELECT a FROM t; SELECT 1;", True),
+        ("SELECT a FROM t; -- comment", "SELECT a FROM t;", False),
+    ],
+)
+def test_normalized_differ(one: str, two: str, expected: bool) -> None:
+    assert normalized_differ(one, two, strip_comments=True) is expected
+
+
+@pytest.mark.parametrize(
+    "one, two",
+    [
+        ("SELECT a::text FROM t", "SELECT a :: text FROM t"),
+        ("SELECT a::text FROM t", "SELECT a::text FROM t"),
+        ("SELECT a FROM t;", "select a\n  from T;"),
+        ("SELECT a FROM t;", "SELECT b FROM t;"),
+        ("SELECT a FROM t ORDER BY a;", "SELECT a FROM t ORDER\n  BY a;"),
+        ("CREATE VIEW s.v AS SELECT a+b FROM t;", "create view s . v as select a + b from t;"),
+        ("CREATE VIEW s.v AS SELECT 1;", "CREATE VIEW s.w AS SELECT 1;"),
+        ("SELECT 1 -- comment\n, 2;", "SELECT 1, 2;"),
+        ("SELECT 1; /* a */ SELECT 2;", "SELECT 1;\n/* a */\nSELECT 2;"),
+        ("SELECT 'a  b';", "SELECT 'a b';"),
+        ("SELECT f(a, b);", "SELECT f ( a , b );"),
+        (FUNC_A, FUNC_A.lower()),
+        (FUNC_A, FUNC_B),
+    ],
+)
+@pytest.mark.parametrize("strip_comments", [True, False])
+def test_streaming_agrees_with_normalize(one: str, two: str, strip_comments: bool) -> None:
+    normalized_equal = normalize(one, strip_comments) == normalize(two, strip_comments)
+    assert normalized_differ(one, two, strip_comments) is not normalized_equal
+    assert normalized_differ(two, one, strip_comments) is not normalized_equal
+
+
+def test_normalize_keeps_original_formatting() -> None:
+    """Normalization is the plain sqlparse reformatting of the script"""
+    import sqlparse
+
+    sql = "  select a::text, b\nfrom T;\n"
+    expected = sqlparse.format(
+        sql.strip(),
+        reindent_aligned=True,
+        strip_comments=False,
+        keyword_case="upper",
+        identifier_case="lower",
+        use_space_around_operators=True,
+    )
+    assert normalize(sql, strip_comments=False) == expected
+
+
+def test_normalize_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    import sqlparse
+
+    calls = []
+    format_sql = sqlparse.format
+
+    def counting_format(sql, *args, **kwargs):
+        calls.append(sql)
+        return format_sql(sql, *args, **kwargs)
+
+    monkeypatch.setattr(sqlparse, "format", counting_format)
+
+    normalize("SELECT 1;", strip_comments=False)
+    normalize("SELECT 1;", strip_comments=False)
+    assert len(calls) == 2
+
+    with normalize_cache():
+        assert normalize("SELECT 1;", strip_comments=False) == "SELECT 1;"
+        assert normalize("SELECT 1;", strip_comments=False) == "SELECT 1;"
+        normalize("SELECT 1;", strip_comments=True)
+    assert len(calls) == 4
+
+    # the cache is dropped after the block
+    normalize("SELECT 1;", strip_comments=False)
+    assert len(calls) == 5
+
+
+def test_normalized_differ_stops_at_first_difference(monkeypatch: pytest.MonkeyPatch) -> None:
+    from sqlparse import lexer
+
+    consumed = []
+    tokenize = lexer.tokenize
+
+    def counting_tokenize(sql, *args, **kwargs):
+        for token in tokenize(sql, *args, **kwargs):
+            consumed.append(token)
+            yield token
+
+    monkeypatch.setattr(lexer, "tokenize", counting_tokenize)
+    tail = "SELECT 1;\n" * 1000
+    assert normalized_differ("SELECT a;\n" + tail, "SELECT b;\n" + tail, strip_comments=False)
+    assert len(consumed) < 30
+
+
+@pytest.mark.parametrize(
+    "statement, expected",
+    [
+        ("CREATE VIEW v AS SELECT 1", "DROP VIEW IF EXISTS v;"),
+        ("create or replace view s.v as select 1", "DROP VIEW IF EXISTS s.v;"),
+        (
+            'CREATE MATERIALIZED VIEW IF NOT EXISTS "My View" AS SELECT 1',
+            'DROP MATERIALIZED VIEW IF EXISTS "My View";',
+        ),
+        (
+            "-- comment\nCREATE FUNCTION f (a numeric(10, 2), b text) RETURNS int AS $$ $$",
+            "DROP FUNCTION IF EXISTS f(a numeric(10, 2), b text);",
+        ),
+        ("CREATE PROCEDURE p() AS $$ $$", "DROP PROCEDURE IF EXISTS p();"),
+        ("CREATE FUNCTION f RETURNS int", None),
+        ("CREATE TABLE t (a int)", None),
+        ("DROP VIEW IF EXISTS v", None),
+    ],
+)
+def test_get_drop_statement(statement: str, expected: str) -> None:
+    assert get_drop_statement(statement) == expected
+
+
+class TestDiffStatements:
+    @staticmethod
+    def test_changed_added_removed() -> None:
+        old = "\n".join([FUNC_A, FUNC_B, FUNC_C])
+        new = "\n".join([FUNC_A, FUNC_B_CHANGED])
+        expected = StatementsDiff(changed=[1], drops=["DROP FUNCTION IF EXISTS func_c();"])
+        assert diff_statements(old=old, new=new, strip_comments=False) == expected
+
+        expected = StatementsDiff(changed=[1, 2], drops=[])
+        assert diff_statements(old=new, new=old, strip_comments=False) == expected
+
+    @staticmethod
+    def test_reformatted() -> None:
+        old = "\n".join([FUNC_A, FUNC_B])
+        new = dedent(
+            """\
+            -- library of functions
+            create or replace function func_a() returns int as $$ SELECT 1 $$ language sql;
+            CREATE OR REPLACE FUNCTION func_b(x int)
+                RETURNS int AS $$ SELECT x $$ LANGUAGE sql;
+            """
+        )
+        expected = StatementsDiff(changed=[], drops=[])
+        assert diff_statements(old=old, new=new, strip_comments=True) == expected
+
+    @staticmethod
+    def test_not_replaceable() -> None:
+        old = "DROP VIEW IF EXISTS v; CREATE VIEW v AS SELECT 1;"
+        new = "DROP VIEW IF EXISTS v; CREATE VIEW v AS SELECT 2;"
+        assert diff_statements(old=old, new=new, strip_comments=False) is None
+
+    @staticmethod
+    def test_unknown_removed_statement() -> None:
+        old = f"{FUNC_A}\nCOMMENT ON FUNCTION func_a() IS 'one';"
+        new = FUNC_A
+        assert diff_statements(old=old, new=new, strip_comments=False) is None
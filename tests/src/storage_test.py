@@ -0,0 +1,274 @@
+import os
+import sys
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List
+from unittest.mock import patch
+
+import pytest
+
+from alembic_dddl.src.comparator import DDLVersions
+from alembic_dddl.src.config import DDDLConfig
+from alembic_dddl.src.models import RevisionedScript
+from alembic_dddl.src.storage import (
+    BY_NAME,
+    BY_YEAR,
+    FLAT,
+    DirectoryStorage,
+    PackageStorage,
+    ReadOnlyStorageError,
+    ScriptStorage,
+    SQLiteStorage,
+    copy_scripts,
+    get_shard,
+    get_storage,
+    reshard_directory,
+    write_index,
+)
+
+DDL_DIR = Path(__file__).parent / "ddl"
+
+TIME = datetime(2023, 10, 26, 10, 28)
+
+
+def fill(storage: ScriptStorage) -> None:
+    storage.write("1700000000_script1_rev1.sql", "script1", "rev1", TIME, "SELECT 1;")
+    storage.write("1700000000_script1_rev2.sql", "script1", "rev2", TIME, "SELECT 12;")
+    storage.write("1700000000_script2_rev2.sql", "script2", "rev2", TIME, "SELECT 2;")
+
+
+@pytest.fixture
+def directory_storage(tmp_path: Path) -> DirectoryStorage:
+    return DirectoryStorage(str(tmp_path / "ddl"))
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path: Path) -> SQLiteStorage:
+    return SQLiteStorage(str(tmp_path / "ddl" / "scripts.sqlite"))
+
+
+class TestDirectoryStorage:
+    @staticmethod
+    def test_iter_scripts() -> None:
+        storage = DirectoryStorage(str(DDL_DIR))
+        expected = {
+            (str(DDL_DIR / "2023_10_06_1522_sample_ddl1_4b550063ade3.sql"), "sample_ddl1"),
+            (str(DDL_DIR / "2023_10_06_1522_sample_ddl2_4b550063ade3.sql"), "sample_ddl2"),
+            (str(DDL_DIR / "2023_10_26_1028_sample_ddl2_181ce9418692.sql"), "sample_ddl2"),
+            (str(DDL_DIR / "2023_10_26_1028_sample_ddl4_181ce9418692.sql"), "sample_ddl4"),
+        }
+        assert {(f, n) for f, n, _ in storage.iter_scripts()} == expected
+
+    @staticmethod
+    def test_write_read(directory_storage: DirectoryStorage) -> None:
+        fill(directory_storage)
+        assert directory_storage.read("1700000000_script1_rev2.sql") == "SELECT 12;"
+        assert len(list(directory_storage.iter_scripts())) == 3
+
+    @staticmethod
+    def test_iter_scripts_skips_directories(tmp_path: Path) -> None:
+        (tmp_path / "1700000000_script1_rev1.sql").mkdir()
+        (tmp_path / "1700000000_script2_rev1.sql").write_text("SELECT 2;")
+
+        storage = DirectoryStorage(str(tmp_path))
+
+        assert [n for _, n, _ in storage.iter_scripts()] == ["script2"]
+        assert list(DirectoryStorage(str(tmp_path / "missing")).iter_scripts()) == []
+
+    @staticmethod
+    def test_get_script(directory_storage: DirectoryStorage) -> None:
+        script = directory_storage.get_script("/path/1700000000_s_rev1.sql", "s", "rev1")
+        assert script.storage is None
+
+
+class TestDirectoryLayouts:
+    @staticmethod
+    @pytest.mark.parametrize(
+        "layout, shards", [(BY_NAME, ["script1", "script2"]), (BY_YEAR, ["2023"])]
+    )
+    def test_write_read(tmp_path: Path, layout: str, shards: List[str]) -> None:
+        storage = DirectoryStorage(str(tmp_path), layout=layout)
+        fill(storage)
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == shards
+        assert storage.read("1700000000_script1_rev2.sql") == "SELECT 12;"
+        assert storage.get_size("1700000000_script2_rev2.sql") == 9
+        assert sorted((os.path.relpath(f, tmp_path), n) for f, n, _ in storage.iter_scripts()) == [
+            (os.path.join(shards[0], "1700000000_script1_rev1.sql"), "script1"),
+            (os.path.join(shards[0], "1700000000_script1_rev2.sql"), "script1"),
+            (os.path.join(shards[-1], "1700000000_script2_rev2.sql"), "script2"),
+        ]
+
+    @staticmethod
+    def test_iter_scripts_by_names(tmp_path: Path) -> None:
+        storage = DirectoryStorage(str(tmp_path), layout=BY_NAME)
+        fill(storage)
+        listed = []
+        iter_filenames = storage._iter_filenames
+
+        def spy(directory: str) -> Iterator[str]:
+            listed.append(os.path.relpath(directory, tmp_path))
+            return iter_filenames(directory)
+
+        with patch.object(storage, "_iter_filenames", spy):
+            result = list(storage.iter_scripts(names=["script1", "script3"]))
+
+        assert listed == ["script1", "script3"]
+        assert sorted(n for _, n, _ in result) == ["script1", "script1"]
+
+    @staticmethod
+    def test_get_shard() -> None:
+        assert get_shard("2023_01_01_0915_name_c7526352.sql", FLAT) == ""
+        assert get_shard("2023_01_01_0915_name_c7526352.sql", BY_NAME) == "name"
+        assert get_shard("2023_01_01_0915_name_c7526352.sql", BY_YEAR) == "2023"
+        with pytest.raises(ValueError):
+            get_shard("wrong_filename.sql", BY_YEAR)
+        with pytest.raises(ValueError):
+            DirectoryStorage("ddl", layout="by_month")
+
+    @staticmethod
+    def test_year_shard_in_utc(monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("TZ", "Asia/Tokyo")
+        time.tzset()
+        try:
+            # 2023-12-31 23:59:59 UTC, already 2024 in Tokyo
+            assert get_shard("1704067199_name_c7526352.sql", BY_YEAR) == "2023"
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+    @staticmethod
+    def test_read_from_other_shard(tmp_path: Path) -> None:
+        storage = DirectoryStorage(str(tmp_path), layout=BY_YEAR)
+        (tmp_path / "2024").mkdir()
+        (tmp_path / "2024" / "1704067199_name_c7526352.sql").write_text("SELECT 1;")
+
+        assert storage.read("1704067199_name_c7526352.sql") == "SELECT 1;"
+        assert storage.get_size("1704067199_name_c7526352.sql") == 9
+
+    @staticmethod
+    def test_reshard_directory(tmp_path: Path) -> None:
+        fill(DirectoryStorage(str(tmp_path)))
+        (tmp_path / "notes.txt").write_text("")
+
+        assert reshard_directory(str(tmp_path), BY_NAME) == 3
+        assert reshard_directory(str(tmp_path), BY_NAME) == 0
+        assert reshard_directory(str(tmp_path), BY_YEAR) == 3
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["2023", "notes.txt"]
+        assert reshard_directory(str(tmp_path), FLAT) == 3
+
+        assert len(list(DirectoryStorage(str(tmp_path)).iter_scripts())) == 3
+        assert not [p for p in tmp_path.iterdir() if p.is_dir()]
+
+
+class TestSQLiteStorage:
+    @staticmethod
+    def test_write_read(sqlite_storage: SQLiteStorage) -> None:
+        fill(sqlite_storage)
+        assert sqlite_storage.read("1700000000_script1_rev2.sql") == "SELECT 12;"
+        with pytest.raises(FileNotFoundError):
+            sqlite_storage.read("1700000000_script3_rev2.sql")
+
+    @staticmethod
+    def test_iter_scripts(sqlite_storage: SQLiteStorage) -> None:
+        fill(sqlite_storage)
+        assert set(sqlite_storage.iter_scripts()) == {
+            ("1700000000_script1_rev1.sql", "script1", "rev1"),
+            ("1700000000_script1_rev2.sql", "script1", "rev2"),
+            ("1700000000_script2_rev2.sql", "script2", "rev2"),
+        }
+        assert set(sqlite_storage.iter_scripts(revisions=["rev1", "rev3"])) == {
+            ("1700000000_script1_rev1.sql", "script1", "rev1"),
+        }
+
+    @staticmethod
+    def test_get_script_reads_from_storage(sqlite_storage: SQLiteStorage) -> None:
+        fill(sqlite_storage)
+        script = sqlite_storage.get_script("1700000000_script2_rev2.sql", "script2", "rev2")
+        assert script.read() == "SELECT 2;"
+
+    @staticmethod
+    def test_ddl_versions(sqlite_storage: SQLiteStorage) -> None:
+        fill(sqlite_storage)
+        versions = DDLVersions(ddl_dir=sqlite_storage.path, storage=sqlite_storage)
+        result = versions.get_latest_ddl_revisions(rev_order=["rev2", "rev1"])
+        assert result == {
+            "script1": RevisionedScript("1700000000_script1_rev2.sql", "script1", "rev2"),
+            "script2": RevisionedScript("1700000000_script2_rev2.sql", "script2", "rev2"),
+        }
+
+
+def test_get_storage() -> None:
+    assert isinstance(get_storage(DDDLConfig()), DirectoryStorage)
+    assert isinstance(get_storage(DDDLConfig(storage="sqlite")), SQLiteStorage)
+    with pytest.raises(ValueError):
+        get_storage(DDDLConfig(storage="unknown"))
+
+
+def test_copy_scripts(directory_storage: DirectoryStorage, sqlite_storage: SQLiteStorage) -> None:
+    fill(directory_storage)
+    assert copy_scripts(source=directory_storage, target=sqlite_storage) == 3
+    assert sqlite_storage.read("1700000000_script1_rev1.sql") == "SELECT 1;"
+
+
+@pytest.mark.parametrize("storage_fixture", ["directory_storage", "sqlite_storage"])
+def test_delete(storage_fixture: str, request: pytest.FixtureRequest) -> None:
+    storage: ScriptStorage = request.getfixturevalue(storage_fixture)
+    fill(storage)
+    assert storage.get_size("1700000000_script1_rev2.sql") == 10
+
+    storage.delete("1700000000_script1_rev2.sql")
+
+    assert len(list(storage.iter_scripts())) == 2
+    with pytest.raises(FileNotFoundError):
+        storage.read("1700000000_script1_rev2.sql")
+
+
+def _make_archive(directory_storage: DirectoryStorage, path: Path, index: bool) -> None:
+    fill(directory_storage)
+    if index:
+        assert write_index(directory_storage) == 3
+    with zipfile.ZipFile(path, "w") as archive:
+        for file in Path(directory_storage.location).iterdir():
+            archive.write(file, f"myapp/migrations/ddl/{file.name}")
+        archive.writestr("myapp/__init__.py", "")
+
+
+class TestPackageStorage:
+    @staticmethod
+    @pytest.mark.parametrize("index", [True, False])
+    def test_zip(directory_storage: DirectoryStorage, tmp_path: Path, index: bool) -> None:
+        archive = tmp_path / "app.zip"
+        _make_archive(directory_storage, archive, index=index)
+        storage = PackageStorage(f"{archive}:myapp/migrations/ddl")
+
+        assert sorted(storage.iter_scripts()) == [
+            ("1700000000_script1_rev1.sql", "script1", "rev1"),
+            ("1700000000_script1_rev2.sql", "script1", "rev2"),
+            ("1700000000_script2_rev2.sql", "script2", "rev2"),
+        ]
+        assert storage.read("1700000000_script1_rev2.sql") == "SELECT 12;"
+        with pytest.raises(FileNotFoundError):
+            storage.read("missing.sql")
+        with pytest.raises(ReadOnlyStorageError):
+            storage.write("x.sql", "x", "rev", TIME, "")
+        with pytest.raises(ReadOnlyStorageError):
+            storage.delete("1700000000_script1_rev1.sql")
+
+    @staticmethod
+    def test_zipimported_package(
+        directory_storage: DirectoryStorage, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        archive = tmp_path / "app.zip"
+        _make_archive(directory_storage, archive, index=True)
+        monkeypatch.syspath_prepend(str(archive))
+        storage = get_storage(
+            DDDLConfig(storage="package", scripts_location="myapp:migrations/ddl")
+        )
+
+        versions = DDLVersions(ddl_dir="unused", storage=storage)
+        latest = versions.get_latest_ddl_revisions(["rev2", "rev1"])
+        assert latest["script1"].read() == "SELECT 12;"
+        sys.modules.pop("myapp", None)
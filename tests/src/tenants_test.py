@@ -0,0 +1,286 @@
+import sqlite3
+from pathlib import Path
+from typing import Callable, Iterator, List
+from unittest.mock import MagicMock, Mock
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+from alembic_dddl.src.tenants import (
+    TenantFanOut,
+    TenantFanOutError,
+    get_fan_out,
+    get_tenant_registry,
+    register_tenants,
+    run_for_tenants,
+    tenant_registry,
+    use_tenants,
+)
+
+TENANTS = ["tenant_a", "tenant_b", "tenant_c"]
+
+
+@pytest.fixture(autouse=True)
+def reset_tenants() -> Iterator[None]:
+    yield
+    tenant_registry.register(None)
+
+
+@pytest.fixture
+def attached_engine(tmp_path: Path) -> Engine:
+    """Engine on SQLite with a separate attached database for each tenant"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+    @event.listens_for(engine, "connect")
+    def attach(dbapi_connection, connection_record):
+        for tenant in TENANTS:
+            dbapi_connection.execute(f"ATTACH DATABASE '{tmp_path / tenant}.db' AS {tenant}")
+
+    return engine
+
+
+class TestTenantFanOut:
+    @staticmethod
+    def test_substitute() -> None:
+        fan_out = TenantFanOut(schemas=TENANTS)
+        assert fan_out.prepare("t1", ["CREATE VIEW {schema}.v AS SELECT 1;"]) == [
+            "CREATE VIEW t1.v AS SELECT 1;"
+        ]
+
+    @staticmethod
+    def test_search_path() -> None:
+        fan_out = TenantFanOut(schemas=TENANTS, mode="search_path")
+        assert fan_out.prepare("t1", ["CREATE VIEW v AS SELECT 1;"]) == [
+            "CREATE VIEW v AS SELECT 1;"
+        ]
+        assert fan_out.set_search_path("t1") == ['SET LOCAL search_path TO "t1"']
+        assert fan_out.set_search_path("t1", local=False) == ['SET search_path TO "t1"']
+        assert fan_out.reset_search_path() == ["RESET search_path"]
+
+    @staticmethod
+    def test_substitute_search_path() -> None:
+        fan_out = TenantFanOut(schemas=TENANTS)
+        assert fan_out.set_search_path("t1") == []
+        assert fan_out.reset_search_path() == []
+
+    @staticmethod
+    def test_schemas_callable() -> None:
+        connection = Mock()
+        fan_out = TenantFanOut(schemas=lambda c: ["t1", "t2"] if c is connection else [])
+        assert fan_out.get_schemas(connection) == ["t1", "t2"]
+        with pytest.raises(ValueError):
+            fan_out.get_schemas(None)
+
+    @staticmethod
+    def test_applies_to() -> None:
+        fan_out = TenantFanOut(schemas=TENANTS, ddl_names=["items"])
+        assert fan_out.applies_to("2023_01_01_0000_items_rev1.sql")
+        assert not fan_out.applies_to("2023_01_01_0000_other_rev1.sql")
+        assert TenantFanOut(schemas=TENANTS).applies_to("2023_01_01_0000_other_rev1.sql")
+
+    @staticmethod
+    def test_invalid_mode() -> None:
+        with pytest.raises(ValueError):
+            TenantFanOut(schemas=TENANTS, mode="unknown")
+
+
+def _tables(tmp_path: Path, tenant: str) -> List[str]:
+    connection = sqlite3.connect(tmp_path / f"{tenant}.db")
+    try:
+        rows = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        return [r[0] for r in rows]
+    finally:
+        connection.close()
+
+
+class TestTenantRegistry:
+    @staticmethod
+    def test_scoped() -> None:
+        config, other = Config(), Config()
+        register_tenants(schemas=TENANTS, scope=config)
+
+        assert get_tenant_registry(config).fan_out is not None
+        assert get_tenant_registry(other).fan_out is None
+        assert tenant_registry.fan_out is None
+        context = Mock(spec=MigrationContext, config=config)
+        assert get_fan_out(context, "2023_01_01_0000_items_rev1.sql") is not None
+
+    @staticmethod
+    def test_use_tenants() -> None:
+        with use_tenants() as registry:
+            register_tenants(schemas=TENANTS)
+        assert registry.fan_out is not None
+        assert tenant_registry.fan_out is None
+
+    @staticmethod
+    def test_migration_context_without_config() -> None:
+        context = Mock(spec=MigrationContext, config=None)
+        with pytest.raises(ValueError):
+            register_tenants(schemas=TENANTS, scope=context)
+
+
+class TestRunForTenants:
+    @staticmethod
+    def test_offline() -> None:
+        operations = Mock()
+        operations.get_context.return_value.as_sql = True
+        fan_out = TenantFanOut(schemas=["t1", "t2"])
+        run_for_tenants(operations, fan_out, "script.sql", ["SELECT * FROM {schema}.x;"])
+        assert [c.args[0] for c in operations.execute.call_args_list] == [
+            "SELECT * FROM t1.x;",
+            "SELECT * FROM t2.x;",
+        ]
+
+    @staticmethod
+    def test_offline_search_path() -> None:
+        operations = Mock()
+        operations.get_context.return_value.as_sql = True
+        fan_out = TenantFanOut(schemas=["t1"], mode="search_path")
+        run_for_tenants(operations, fan_out, "script.sql", ["SELECT 1;"])
+        assert [c.args[0] for c in operations.execute.call_args_list] == [
+            'SET search_path TO "t1"',
+            "SELECT 1;",
+            "RESET search_path",
+        ]
+
+    @staticmethod
+    def test_offline_per_statement() -> None:
+        operations = Mock()
+        context = operations.get_context.return_value = MagicMock(as_sql=True)
+        context.impl.emit_begin.side_effect = lambda: operations.execute("BEGIN")
+        context.impl.emit_commit.side_effect = lambda: operations.execute("COMMIT")
+        fan_out = TenantFanOut(schemas=["t1"], mode="search_path")
+
+        run_for_tenants(
+            operations, fan_out, "script.sql", ["SELECT 1;", "SELECT 2;"], mode="per_statement"
+        )
+
+        assert context.autocommit_block.called is True
+        assert [c.args[0] for c in operations.execute.call_args_list] == [
+            "BEGIN",
+            'SET LOCAL search_path TO "t1"',
+            "SELECT 1;",
+            "COMMIT",
+            "BEGIN",
+            'SET LOCAL search_path TO "t1"',
+            "SELECT 2;",
+            "COMMIT",
+        ]
+
+    @staticmethod
+    def test_failures_reported(attached_engine: Engine, tmp_path: Path) -> None:
+        operations = Mock()
+        operations.get_context.return_value = MagicMock(as_sql=False)
+        operations.get_bind.return_value.engine = attached_engine
+        fan_out = TenantFanOut(schemas=[*TENANTS, "missing"], max_workers=2)
+
+        with pytest.raises(TenantFanOutError) as e:
+            run_for_tenants(operations, fan_out, "script.sql", ["CREATE TABLE {schema}.t (x);"])
+
+        assert [f.schema for f in e.value.failures] == ["missing"]
+        for tenant in TENANTS:
+            assert _tables(tmp_path, tenant) == ["t"]
+        assert operations.get_context.return_value.autocommit_block.called is True
+
+    @staticmethod
+    @pytest.mark.parametrize("mode", ["transaction", "autocommit", "per_statement", "per_script"])
+    def test_modes(attached_engine: Engine, tmp_path: Path, mode: str) -> None:
+        operations = Mock()
+        operations.get_context.return_value = MagicMock(as_sql=False)
+        operations.get_bind.return_value.engine = attached_engine
+        fan_out = TenantFanOut(schemas=TENANTS, max_workers=2)
+        statements = ["CREATE TABLE {schema}.t (x);", "CREATE TABLE {schema}.u (x);"]
+
+        run_for_tenants(operations, fan_out, "script.sql", statements, mode=mode)
+
+        for tenant in TENANTS:
+            assert _tables(tmp_path, tenant) == ["t", "u"]
+
+
+def test_upgrade_selected_statements(
+    alembic_project: Callable[..., Config], attached_engine: Engine, tmp_path: Path
+) -> None:
+    config = alembic_project(
+        revisions=[
+            (
+                "rev1",
+                None,
+                "op.run_ddl_script('2023_01_01_0000_items_rev1.sql', statements=[1], "
+                "mode='per_statement')",
+                "",
+            )
+        ],
+        scripts={
+            "2023_01_01_0000_items_rev1.sql": (
+                "CREATE TABLE {schema}.items (id INTEGER);\n"
+                "CREATE TABLE {schema}.other (id INTEGER);\n"
+            )
+        },
+    )
+    config.attributes["connection"] = attached_engine
+    register_tenants(schemas=TENANTS, max_workers=2)
+
+    command.upgrade(config, "head")
+
+    for tenant in TENANTS:
+        assert _tables(tmp_path, tenant) == ["other"]
+
+
+def test_upgrade(
+    alembic_project: Callable[..., Config], attached_engine: Engine, tmp_path: Path
+) -> None:
+    config = alembic_project(
+        revisions=[("rev1", None, "op.run_ddl_script('2023_01_01_0000_items_rev1.sql')", "")],
+        scripts={
+            "2023_01_01_0000_items_rev1.sql": (
+                "CREATE TABLE {schema}.items (id INTEGER);\n"
+                "CREATE VIEW {schema}.item_count AS SELECT count(*) AS n FROM items;\n"
+            )
+        },
+    )
+    config.attributes["connection"] = attached_engine
+    register_tenants(schemas=TENANTS, max_workers=2)
+
+    command.upgrade(config, "head")
+
+    for tenant in TENANTS:
+        connection = sqlite3.connect(tmp_path / f"{tenant}.db")
+        try:
+            assert connection.execute("SELECT n FROM item_count").fetchone() == (0,)
+        finally:
+            connection.close()
+    assert _tables(tmp_path, "test") == ["alembic_version"]
+
+
+def test_upgrade_selected_ddls(
+    alembic_project: Callable[..., Config], attached_engine: Engine, tmp_path: Path
+) -> None:
+    """Only the scripts of the listed DDLs are run for each tenant"""
+    config = alembic_project(
+        revisions=[
+            (
+                "rev1",
+                None,
+                "op.run_ddl_script('2023_01_01_0000_items_rev1.sql')\n"
+                "op.run_ddl_script('2023_01_01_0000_shared_rev1.sql')",
+                "",
+            )
+        ],
+        scripts={
+            "2023_01_01_0000_items_rev1.sql": "CREATE TABLE {schema}.items (id INTEGER);",
+            "2023_01_01_0000_shared_rev1.sql": "CREATE TABLE shared (id INTEGER);",
+        },
+    )
+    config.attributes["connection"] = attached_engine
+    register_tenants(schemas=TENANTS, max_workers=2, ddl_names=["items"], scope=config)
+
+    command.upgrade(config, "head")
+
+    for tenant in TENANTS:
+        assert _tables(tmp_path, tenant) == ["items"]
+    assert _tables(tmp_path, "test") == ["alembic_version", "shared"]
+    assert tenant_registry.fan_out is None
@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy import create_engine
+
+from alembic_dddl.src.config import DDDLConfig
+from alembic_dddl.src.timings import (
+    FileTimingHistory,
+    TableTimingHistory,
+    get_timing_history,
+    load_durations,
+)
+
+
+def test_file_history(tmp_path: Path) -> None:
+    path = tmp_path / "timings" / "dddl_timings.json"
+    history = FileTimingHistory(str(path), max_samples=2)
+    assert history.get_durations() == {}
+
+    for duration in (1.0, 2.0, 3.0):
+        history.record("a.sql", duration)
+    history.record("b.sql", 0.5)
+
+    assert history.get_durations() == {"a.sql": [2.0, 3.0], "b.sql": [0.5]}
+    assert json.loads(path.read_text())["version"] == 1
+
+
+def test_table_history(tmp_path: Path) -> None:
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        history = TableTimingHistory(connection, "timings")
+        history.create_table()
+        history.record("a.sql", 1.0)
+        history.record("a.sql", 2.0)
+    engine.dispose()
+
+    config = DDDLConfig(timing_history="table", timing_history_table="timings")
+    assert load_durations(config, url) == {"a.sql": [1.0, 2.0]}
+
+
+class TestGetTimingHistory:
+    @staticmethod
+    def test_disabled() -> None:
+        assert get_timing_history(Mock(as_sql=False), DDDLConfig()) is None
+
+    @staticmethod
+    def test_offline() -> None:
+        config = DDDLConfig(timing_history="file")
+        assert get_timing_history(Mock(as_sql=True), config) is None
+
+    @staticmethod
+    def test_unsupported() -> None:
+        config = DDDLConfig(timing_history="redis")
+        with pytest.raises(ValueError):
+            get_timing_history(Mock(as_sql=False), config)
@@ -1,6 +1,15 @@
+from typing import Callable
+from unittest.mock import Mock
+
 import pytest
+from alembic import command
+from alembic.config import Config
+
+from alembic_dddl.src.utils import ensure_dir, escape_quotes, is_upgrade
 
-from alembic_dddl.src.utils import ensure_dir, escape_quotes
+PROBE = (
+    "from alembic_dddl.src.utils import is_upgrade\nprint('{step}', is_upgrade(op.get_context()))"
+)
 
 
 @pytest.mark.parametrize(
@@ -29,3 +38,44 @@ def test_ensure_dir_existing_directory(tmp_path):
     existing_dir.mkdir()
     ensure_dir(str(existing_dir))
     assert existing_dir.is_dir()
+
+
+@pytest.mark.parametrize(
+    "start, cmd, revision, sql, expected",
+    [
+        (None, "upgrade", "heads", False, ["up r1 True", "up r2 True", "up r3 True"]),
+        ("r1", "upgrade", "+1", False, ["up r2 True"]),
+        ("r3", "downgrade", "-1", False, ["down r3 False"]),
+        ("r3", "downgrade", "base", False, ["down r3 False", "down r2 False", "down r1 False"]),
+        (None, "upgrade", "r1:r3", True, ["up r2 True", "up r3 True"]),
+        (None, "downgrade", "r3:r1", True, ["down r3 False", "down r2 False"]),
+    ],
+)
+def test_is_upgrade(
+    alembic_project: Callable[..., Config],
+    capsys,
+    start,
+    cmd: str,
+    revision: str,
+    sql: bool,
+    expected,
+) -> None:
+    revisions = [
+        (rev, down, PROBE.format(step=f"up {rev}"), PROBE.format(step=f"down {rev}"))
+        for rev, down in [("r1", None), ("r2", "r1"), ("r3", "r2")]
+    ]
+    config = alembic_project(revisions=revisions, scripts={})
+    if start:
+        command.upgrade(config, start)
+    capsys.readouterr()
+
+    getattr(command, cmd)(config, revision, sql=sql)
+
+    output = capsys.readouterr().out.splitlines()
+    assert [line for line in output if line.startswith(("up ", "down "))] == expected
+
+
+def test_is_upgrade_without_environment() -> None:
+    assert not is_upgrade(Mock(script=None, environment_context=None))
+    context = Mock(environment_context=Mock(get_revision_argument=Mock(side_effect=KeyError)))
+    assert not is_upgrade(context)